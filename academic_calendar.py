@@ -0,0 +1,96 @@
+"""
+UChicago quarter and break boundaries for /daysinquarter.
+
+Quarters are listed in academic_calendar.csv (Quarter,Start,End, with inclusive
+YYYY-MM-DD dates). Its Source column records where each row came from. Every
+row is currently "hardcoded": the month/day windows bot.py used to hard-code,
+repeated for each year until the registrar's published dates replace them.
+
+Breaks are the gaps between consecutive quarters. The calendar is loaded into
+a sorted array of period start times, so finding the current period is a
+single bisect.
+"""
+import csv
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+CALENDAR_TZ = ZoneInfo("America/Chicago")
+BREAK = "Break"
+
+
+class Period(NamedTuple):
+    name: str            # quarter name, or BREAK
+    start: datetime      # midnight of the first day
+    end: datetime        # midnight after the last day (exclusive)
+
+    @property
+    def is_break(self):
+        return self.name == BREAK
+
+
+class Position(NamedTuple):
+    period: Period
+    day: int                     # 1 on the period's first day
+    remaining: timedelta         # until period.end
+    next_quarter: Optional[Period]
+
+
+def _midnight(day):
+    return datetime.combine(day, time(), CALENDAR_TZ)
+
+
+class AcademicCalendar:
+    """Consecutive quarter and break periods with bisect lookup."""
+
+    def __init__(self, quarters):
+        quarters = sorted(quarters, key=lambda q: q.start)
+        periods = []
+        for quarter in quarters:
+            if quarter.end <= quarter.start:
+                raise ValueError(f"{quarter.name} starting {quarter.start:%Y-%m-%d} ends before it starts")
+            if periods:
+                previous = periods[-1]
+                if quarter.start < previous.end:
+                    raise ValueError(f"{quarter.name} starting {quarter.start:%Y-%m-%d} overlaps {previous.name}")
+                if quarter.start > previous.end:
+                    periods.append(Period(BREAK, previous.end, quarter.start))
+            periods.append(quarter)
+        self.items = periods
+        self._starts = [p.start.timestamp() for p in periods]
+        # Index of the first quarter at or after each period, for "next quarter" lookups
+        self._next_quarter = [None] * len(periods)
+        following = None
+        for i in range(len(periods) - 1, -1, -1):
+            if not periods[i].is_break:
+                following = i
+            self._next_quarter[i] = following
+
+    def __len__(self):
+        return len(self.items)
+
+    def lookup(self, now=None):
+        """Position of `now` (default: the current time) in the calendar, or None if it isn't covered."""
+        now = now or datetime.now(CALENDAR_TZ)
+        timestamp = now.timestamp()
+        i = bisect_right(self._starts, timestamp) - 1
+        if i < 0 or timestamp >= self.items[i].end.timestamp():
+            return None
+        period = self.items[i]
+        local = now.astimezone(CALENDAR_TZ)
+        day = (local.date() - period.start.date()).days + 1
+        remaining = timedelta(seconds=period.end.timestamp() - timestamp)
+        following = self._next_quarter[i + 1] if i + 1 < len(self.items) else None
+        return Position(period, day, remaining, None if following is None else self.items[following])
+
+
+def load_calendar(path):
+    """Parse academic_calendar.csv into an AcademicCalendar."""
+    quarters = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            start = date.fromisoformat(row["Start"].strip())
+            end = date.fromisoformat(row["End"].strip())
+            quarters.append(Period(row["Quarter"].strip(), _midnight(start), _midnight(end + timedelta(days=1))))
+    return AcademicCalendar(quarters)
@@ -0,0 +1,121 @@
+"""Helpers for the bot's JSON admin API: cursor pagination and compressed responses."""
+import gzip
+import json
+import base64
+import binascii
+from bisect import bisect_right
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; fall back to gzip
+    brotli = None
+
+MAX_LIMIT = 500
+# Bodies smaller than this aren't worth the CPU to compress
+MIN_COMPRESS_SIZE = 512
+
+
+class BadRequest(Exception):
+    """Raised for invalid query parameters; turned into a 400 response."""
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise BadRequest("Invalid cursor")
+
+
+def int_param(request, name, default=None, minimum=None, maximum=None):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise BadRequest(f"'{name}' must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise BadRequest(f"'{name}' must be at most {maximum}")
+    return value
+
+
+def paginate(rows, sort_fields, sort, order, cursor=None, limit=100, id_field="id"):
+    """
+    Keyset-paginate rows (a list of dicts with a unique `id_field`).
+
+    Rows are ordered by (row[sort], row[id_field]), ascending or descending. The cursor
+    is the opaque key of the last row on the previous page, so pages stay
+    stable when rows are added or removed in between requests.
+    Returns (page, next_cursor or None).
+    """
+    if sort not in sort_fields:
+        raise BadRequest(f"'sort' must be one of: {', '.join(sort_fields)}")
+    if order not in ("asc", "desc"):
+        raise BadRequest("'order' must be 'asc' or 'desc'")
+
+    def key(row):
+        return (row[sort], row[id_field])
+
+    ordered = sorted(rows, key=key)
+    keys = [key(row) for row in ordered]
+    if order == "desc":
+        ordered.reverse()
+        keys.reverse()
+        keys = [_Desc(k) for k in keys]
+
+    start = 0
+    if cursor:
+        last = decode_cursor(cursor)
+        if not isinstance(last, list) or len(last) != 2:
+            raise BadRequest("Invalid cursor")
+        last = tuple(last)
+        try:
+            start = bisect_right(keys, _Desc(last) if order == "desc" else last)
+        except TypeError:
+            # Cursor from a different sort field
+            raise BadRequest("Cursor does not match the requested sort")
+
+    page = ordered[start:start + limit]
+    next_cursor = None
+    if start + limit < len(ordered):
+        next_cursor = encode_cursor(list(key(page[-1])))
+    return page, next_cursor
+
+
+class _Desc:
+    """Inverts comparison so a descending list can be bisected."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+def json_response(request, payload, status=200):
+    """JSON response compressed with brotli or gzip according to Accept-Encoding."""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "private, no-cache"}
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("Accept-Encoding", "").split(",")
+    }
+    if len(body) >= MIN_COMPRESS_SIZE:
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return web.Response(body=body, status=status, content_type="application/json", headers=headers)
@@ -5,8 +5,13 @@ from datetime import datetime
 import urllib.parse
 
 import requests
-from flask import Flask, session, request, redirect, render_template_string, render_template
+from requests.adapters import HTTPAdapter
+from flask import Flask, session, request, redirect, render_template_string, render_template, url_for
 from dotenv import load_dotenv
+from roles import RoleCache
+from role_queue import RoleQueue, RoleWorker
+from discord_rest import DiscordREST, RateLimitState
+from oidc import IdTokenError, JWKSCache, NonceMismatch, verify_id_token
 load_dotenv()
 
 app = Flask(__name__)
@@ -16,12 +21,37 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecretkey")  # Secret key f
 OKTA_DOMAIN = os.getenv("OKTA_DOMAIN")            # e.g. "your-okta-domain.okta.com"
 OKTA_CLIENT_ID = os.getenv("OKTA_CLIENT_ID")      # Okta OIDC app client ID
 OKTA_CLIENT_SECRET = os.getenv("OKTA_CLIENT_SECRET")  # Okta OIDC app client secret
-OKTA_ISSUER = "https://uchicago.okta.com"
+OKTA_ISSUER = os.getenv("OKTA_ISSUER", "https://uchicago.okta.com")
+OKTA_REDIRECT_URI = os.getenv("OKTA_REDIRECT_URI", "https://vps.dariel.us/auth/callback")
 
 # OAuth endpoints for Okta (using the issuer URL)
 AUTHORIZATION_URL = f"{OKTA_ISSUER}/oauth2/v1/authorize"
 TOKEN_URL = f"{OKTA_ISSUER}/oauth2/v1/token"
 USERINFO_URL = f"{OKTA_ISSUER}/oauth2/v1/userinfo"
+JWKS_URL = f"{OKTA_ISSUER}/oauth2/v1/keys"
+
+VERIFIED_ROLE_NAME = "UChicago Verified"
+# Per-request timeouts (connect, read) so a slow upstream can't hang a worker
+HTTP_TIMEOUT = (3.05, 10)
+
+# "UChicago Verified" role ID per guild, shared by all gunicorn workers
+role_cache = RoleCache(
+    os.getenv("ROLE_CACHE_PATH", "role_cache.db"),
+    ttl=int(os.getenv("ROLE_CACHE_TTL", "3600")),
+)
+
+_sessions = {}
+
+def http_session(host):
+    """Keep-alive requests.Session for host, one per worker process."""
+    key = (host, os.getpid())  # sessions must not be shared across forks
+    session_ = _sessions.get(key)
+    if session_ is None:
+        session_ = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("HTTP_POOL_SIZE", "10")))
+        session_.mount("https://", adapter)
+        _sessions[key] = session_
+    return session_
 
 # Configure logging to file and console
 logging.basicConfig(
@@ -46,20 +76,83 @@ def start_auth():
     # Generate a random state string for CSRF protection
     state = os.urandom(16).hex()
     session['state'] = state
+    # Bound into the ID token by Okta, so a token can't be replayed into another login
+    nonce = os.urandom(16).hex()
+    session['nonce'] = nonce
 
     # Build the Okta authorization URL with required params
     params = {
         "client_id": OKTA_CLIENT_ID,
-        "redirect_uri": "https://vps.dariel.us/auth/callback",
+        "redirect_uri": OKTA_REDIRECT_URI,
         "response_type": "code",
         "scope": "openid email profile groups",   # request OIDC scopes
-        "state": state
+        "state": state,
+        "nonce": nonce
     }
     
     auth_url = f"{AUTHORIZATION_URL}?{urllib.parse.urlencode(params)}"
     logger.info(f"Initiating Okta OIDC login for Discord user {user_id} (guild {guild_id})")
     return redirect(auth_url)
 
+# Okta's ID-token signing keys, cached in memory and refetched when a new key ID appears
+okta_keys = JWKSCache(JWKS_URL, lambda: http_session("okta"), timeout=HTTP_TIMEOUT)
+
+# Discord rate-limit buckets, shared with the bot through the same file
+ratelimit_state = RateLimitState(os.getenv("DISCORD_RATELIMIT_PATH", "discord_ratelimits.db"))
+_discord_clients = {}
+
+def discord_api():
+    """Rate-limit-aware Discord REST client for this worker process."""
+    client = _discord_clients.get(os.getpid())
+    if client is None:
+        client = DiscordREST(os.getenv("DISCORD_BOT_TOKEN"), ratelimit_state, http_session("discord"),
+                             timeout=HTTP_TIMEOUT)
+        _discord_clients[os.getpid()] = client
+    return client
+
+def resolve_verified_role(guild_id):
+    """Find the guild's "UChicago Verified" role over REST, creating it if missing. Returns its ID or None."""
+    roles_res = discord_api().request("GET", f"/guilds/{guild_id}/roles")
+    if roles_res.status_code != 200:
+        logger.error(f"Failed to list roles: {roles_res.status_code} - {roles_res.text}")
+        return None
+    for role in roles_res.json():
+        if role["name"] == VERIFIED_ROLE_NAME:
+            return role["id"]
+    # Create the role (with default permissions)
+    new_role = {"name": VERIFIED_ROLE_NAME, "mentionable": False}
+    create_res = discord_api().request("POST", f"/guilds/{guild_id}/roles", json=new_role)
+    if create_res.status_code in (200, 201):
+        logger.info(f"Created 'UChicago Verified' role in guild {guild_id}")
+        return create_res.json().get("id")
+    logger.error(f"Failed to create role: {create_res.status_code} - {create_res.text}")
+    return None
+
+def unknown_role(response):
+    """True if a Discord error response is 'Unknown Role' (code 10011)."""
+    try:
+        return response.json().get("code") == 10011
+    except ValueError:
+        return False
+
+def assign_verified_role(guild_id, user_id):
+    """PUT the verified role on a member. Returns the Discord response, or None if the role couldn't be resolved."""
+    for _ in range(2):
+        role_id = role_cache.get_or_create(guild_id, lambda: resolve_verified_role(guild_id))
+        if role_id is None:
+            return None
+        assign_res = discord_api().request("PUT", f"/guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+        if not (assign_res.status_code == 404 and unknown_role(assign_res)):
+            break
+        # The role was deleted since we cached its ID; look it up again
+        role_cache.invalidate(guild_id)
+    return assign_res
+
+# Durable role-assignment queue, drained by a worker thread in every process
+role_queue = RoleQueue(os.getenv("ROLE_QUEUE_PATH", "role_queue.db"))
+role_worker = RoleWorker(role_queue, assign_verified_role)
+role_worker.start()
+
 @app.route('/auth/callback')
 def auth_callback():
     """Okta redirects here after login. This route processes the OIDC response."""
@@ -76,62 +169,57 @@ def auth_callback():
         return render_template("verificationfailed.html", error="OIDC state mismatch or missing code.")
     guild_id = session.get('guild_id')
     user_id = session.get('user_id')
+    nonce = session.pop('nonce', None)
+    if not nonce and guild_id and user_id:
+        # Login started before ID tokens were checked (no nonce in the session): start it over
+        logger.info(f"No nonce in session for Discord user {user_id}; restarting login")
+        return redirect(url_for('start_auth', guild_id=guild_id, user_id=user_id))
     # Exchange authorization code for tokens
     token_data = {
         "grant_type": "authorization_code",
         "code": code,
-        "redirect_uri": "https://vps.dariel.us/auth/callback",
+        "redirect_uri": OKTA_REDIRECT_URI,
         "client_id": OKTA_CLIENT_ID,
         "client_secret": OKTA_CLIENT_SECRET
     }
-    token_res = requests.post(TOKEN_URL, data=token_data)
+    okta = http_session("okta")
+    token_res = okta.post(TOKEN_URL, data=token_data, timeout=HTTP_TIMEOUT)
     if token_res.status_code != 200:
         logger.error(f"Token exchange failed: {token_res.status_code} - {token_res.text}")
         return render_template("verificationfailed.html", error="Could not retrieve authentication token.")
     tokens = token_res.json()
     access_token = tokens.get("access_token")
 
-    # Use the access token to get the user's info
-    userinfo_res = requests.get(USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
-    if userinfo_res.status_code != 200:
-        logger.error(f"Userinfo request failed: {userinfo_res.status_code} - {userinfo_res.text}")
-        return render_template("verificationfailed.html", error="Could not retrieve user information.")
-    profile = userinfo_res.json()
+    # The ID token already carries the user's claims; only ask /userinfo if it can't be used
+    profile = None
+    try:
+        profile = verify_id_token(tokens.get("id_token"), okta_keys, OKTA_ISSUER, OKTA_CLIENT_ID, nonce)
+    except NonceMismatch as e:
+        logger.error(f"ID token rejected: {e}")
+        return render_template("verificationfailed.html", error="This login link has already been used or expired.")
+    except (IdTokenError, requests.RequestException, ValueError) as e:
+        logger.warning(f"Could not validate ID token locally ({e}); falling back to userinfo")
+    if profile is None or not profile.get("email"):
+        userinfo_res = okta.get(USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"},
+                                timeout=HTTP_TIMEOUT)
+        if userinfo_res.status_code != 200:
+            logger.error(f"Userinfo request failed: {userinfo_res.status_code} - {userinfo_res.text}")
+            return render_template("verificationfailed.html", error="Could not retrieve user information.")
+        profile = userinfo_res.json()
     email = profile.get("email")
     if not email:
         logger.error("No email found in OIDC profile!")
         return render_template("verificationfailed.html", error="Your email could not be obtained.")
     logger.info(f"Verified Discord user {user_id}, guild {guild_id}: {profile}")
+    role_worker.start()  # no-op unless this process was forked after import
     # Assign the "UChicago Verified" role in Discord via Bot API
     bot_token = os.getenv("DISCORD_BOT_TOKEN")
     if bot_token:
-        headers = {"Authorization": f"Bot {bot_token}"}
-        # Ensure the role exists
-        role_id = None
-        roles_res = requests.get(f"https://discord.com/api/v10/guilds/{guild_id}/roles", headers=headers)
-        if roles_res.status_code == 200:
-            for role in roles_res.json():
-                if role["name"] == "UChicago Verified":
-                    role_id = role["id"]
-                    break
-        if role_id is None:
-            # Create the role (with default permissions)
-            new_role = {"name": "UChicago Verified", "mentionable": False}
-            create_res = requests.post(f"https://discord.com/api/v10/guilds/{guild_id}/roles",
-                                       json=new_role, headers=headers)
-            if create_res.status_code in (200, 201):
-                role_id = create_res.json().get("id")
-                logger.info(f"Created 'UChicago Verified' role in guild {guild_id}")
-            else:
-                logger.error(f"Failed to create role: {create_res.status_code} - {create_res.text}")
-        # Assign role to the user
-        if role_id:
-            assign_res = requests.put(f"https://discord.com/api/v10/guilds/{guild_id}/members/{user_id}/roles/{role_id}",
-                                      headers=headers)
-            if assign_res.status_code in (200, 204):
-                logger.info(f"Assigned 'UChicago Verified' role to user {user_id} in guild {guild_id}")
-            else:
-                logger.error(f"Failed to assign role: {assign_res.status_code} - {assign_res.text}")
+        # Assigned by the background worker so the user doesn't wait on Discord
+        if role_queue.enqueue(guild_id, user_id):
+            role_worker.notify()
+        else:
+            logger.info(f"Role assignment for user {user_id} in guild {guild_id} is already queued")
     else:
         logger.warning("Discord bot token not provided to Flask app; skipping role assignment.")
     # Display a success message to the user
@@ -0,0 +1,500 @@
+"""
+Benchmark the bot's slash-command handlers without Discord or the internet.
+
+Imports bot.py (with its caches, logs and stats in a temp dir), creates the
+bot's real HTTP session and calls the command callbacks on `bot.tree` with
+fake Interactions. Blueprint, events.uchicago.edu, the Hyde Park ICS feed
+and cataas are served from benchmarks/fixtures by a local server, with their
+dates shifted so recorded events are still upcoming.
+
+For each scenario it reports latency to the first response (what Discord's
+3-second deadline applies to) and to completion, event-loop blocking time
+(measured by a 1 ms sampler task) and, in a separate tracemalloc pass,
+peak and retained allocations per call.
+
+    python benchmarks/bench_commands.py --iterations 200
+    python benchmarks/bench_commands.py --only thingstodo,finalsmotivation --upstream-latency 0.2
+    python benchmarks/bench_commands.py --json results.json
+    python benchmarks/bench_commands.py record    # refresh the fixtures (needs network)
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT)
+
+# Files bot.py opens relative to the working directory
+DATA_FILES = ["shadydealer.csv", "scav.csv", "academic_calendar.csv", "countdownimages", "static", "templates"]
+
+ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}")
+ICS_RE = re.compile(r"\d{8}T\d{6}")
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+
+def shift_dates(text, delta):
+    """Move every ISO and ICS timestamp in text forward by delta."""
+    def iso(match):
+        sep = match.group(0)[10]
+        value = datetime.strptime(match.group(0), f"%Y-%m-%d{sep}%H:%M:%S") + delta
+        return value.strftime(f"%Y-%m-%d{sep}%H:%M:%S")
+
+    def ics(match):
+        return (datetime.strptime(match.group(0), "%Y%m%dT%H%M%S") + delta).strftime("%Y%m%dT%H%M%S")
+
+    return ICS_RE.sub(ics, ISO_RE.sub(iso, text))
+
+
+def synthetic_cat():
+    """A 640x480 JPEG standing in for a cataas image when no recorded one exists."""
+    import io
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (640, 480))
+    draw = ImageDraw.Draw(image)
+    for y in range(480):
+        draw.line([(0, y), (640, y)], fill=(128 + y // 4, 64 + y // 8, 32))
+    draw.ellipse((200, 120, 440, 360), fill=(90, 90, 90))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def load_fixtures():
+    """Fixture bodies keyed by route, with dates moved to the present (in whole days)."""
+    with open(os.path.join(FIXTURES, "manifest.json")) as f:
+        manifest = json.load(f)
+    recorded_at = datetime.fromisoformat(manifest["recorded_at"])
+    delta = timedelta(days=(datetime.now(timezone.utc) - recorded_at).days)
+    bodies = {}
+    for route, name in [("blueprint", "blueprint.json"), ("uchicago_events", "uchicago_events.json"),
+                        ("hydepark", "hydepark.ics")]:
+        with open(os.path.join(FIXTURES, name), newline="") as f:
+            bodies[route] = shift_dates(f.read(), delta).encode()
+    cat_path = os.path.join(FIXTURES, "cat.jpg")
+    if os.path.exists(cat_path):
+        with open(cat_path, "rb") as f:
+            bodies["cat"] = f.read()
+    else:
+        bodies["cat"] = synthetic_cat()
+    return manifest, bodies
+
+
+class FixtureServer:
+    """Serves the fixtures after `latency` seconds, honouring If-None-Match like the real feeds."""
+
+    CONTENT_TYPES = {"blueprint": "application/json", "uchicago_events": "application/json",
+                     "hydepark": "text/calendar", "cat": "image/jpeg"}
+
+    def __init__(self, bodies, latency=0.0, chunk_size=16384):
+        self.bodies = bodies
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = {}
+
+    async def serve(self, request):
+        route = request.match_info.get("route", "cat")
+        self.calls[route] = self.calls.get(route, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = self.bodies[route]
+        etag = f'"{len(body)}-{hash(body) & 0xffffffff:x}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        response = web.StreamResponse(headers={"ETag": etag, "Content-Type": self.CONTENT_TYPES[route]})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for i in range(0, len(body), self.chunk_size):
+            await response.write(body[i:i + self.chunk_size])
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/feeds/{route}", self.serve)
+        app.router.add_get("/cat", self.serve)
+        app.router.add_get("/cat/says/{text}", self.serve)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def record():
+    """Download the live upstream responses into benchmarks/fixtures."""
+    from events import blueprint_url, UCHICAGO_EVENTS_URL, HYDEPARK_URL
+    from catpool import CAT_BASE_URL
+    now = datetime.now(timezone.utc)
+    targets = [(blueprint_url(now.astimezone()), "blueprint.json"), (UCHICAGO_EVENTS_URL, "uchicago_events.json"),
+               (HYDEPARK_URL, "hydepark.ics"), (CAT_BASE_URL, "cat.jpg")]
+    async with aiohttp.ClientSession(headers={"User-Agent": "UChiVerify benchmark recorder"}) as session:
+        for url, name in targets:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                response.raise_for_status()
+                data = await response.read()
+            with open(os.path.join(FIXTURES, name), "wb") as f:
+                f.write(data)
+            print(f"{name}: {len(data)} bytes from {url}")
+    with open(os.path.join(FIXTURES, "manifest.json"), "w") as f:
+        json.dump({"recorded_at": now.isoformat(), "synthetic": False}, f, indent=1)
+
+
+# ── Fake interactions ─────────────────────────────────────────────────────────
+
+class FakeUser:
+    def __init__(self, user_id, name="benchuser", display_name="Bench User"):
+        self.id = user_id
+        self.name = name
+        self.display_name = display_name
+        self.mention = f"<@{user_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+
+def _serialize(kwargs):
+    """Do the payload work discord.py would do before sending (embeds, views, files)."""
+    if kwargs.get("embed") is not None:
+        kwargs["embed"].to_dict()
+    if kwargs.get("view") is not None:
+        kwargs["view"].to_components()
+    if kwargs.get("file") is not None:
+        kwargs["file"].fp.read()
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._interaction.responded(content, kwargs)
+        self._done = True
+
+    async def defer(self, **kwargs):
+        self._interaction.responded(None, {})
+        self._done = True
+
+    async def send_modal(self, modal):
+        self._interaction.responded(None, {})
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self._interaction.responded(content, kwargs)
+
+
+class FakeInteraction:
+    """The parts of discord.Interaction the command callbacks use; records when each reply was sent."""
+
+    def __init__(self, user_id=10**17, guild_id=10**16, channel_id=10**15):
+        self.user = FakeUser(user_id)
+        self.guild = FakeGuild(guild_id)
+        self.channel = FakeChannel(channel_id)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.replies = []  # (perf_counter, content, kwargs)
+
+    def responded(self, content, kwargs):
+        _serialize(kwargs)
+        self.replies.append((time.perf_counter(), content, kwargs))
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+
+class LoopMonitor:
+    """
+    A task that wakes every `interval` seconds; any extra delay means
+    something held the event loop. `blocked` accumulates that delay.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            if lag > 0:
+                self.blocked += lag
+                self.max_lag = max(self.max_lag, lag)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def reset_max(self):
+        self.max_lag = 0.0
+
+    def stop(self):
+        self._task.cancel()
+
+
+class Scenario:
+    """One command invocation pattern. setup/teardown run outside the timed region."""
+
+    def __init__(self, name, command, kwargs=None, setup=None, teardown=None):
+        self.name = name
+        self.command = command
+        self.kwargs = kwargs or {}
+        self.setup = setup
+        self.teardown = teardown
+
+
+async def invoke(bot_module, scenario):
+    """Run one call. Returns (first response seconds, total seconds, replies)."""
+    callback = bot_module.bot.tree.get_command(scenario.command).callback
+    state = await scenario.setup() if scenario.setup else None
+    interaction = FakeInteraction()
+    try:
+        start = time.perf_counter()
+        await callback(interaction, **scenario.kwargs)
+        end = time.perf_counter()
+    finally:
+        if scenario.teardown:
+            await scenario.teardown(state)
+    if not interaction.replies:
+        raise RuntimeError(f"{scenario.name} finished without replying")
+    return interaction.replies[0][0] - start, end - start, len(interaction.replies)
+
+
+async def measure(bot_module, scenario, iterations, warmup, monitor):
+    for _ in range(warmup):
+        await invoke(bot_module, scenario)
+    first, total, blocked, max_lag = [], [], [], []
+    for _ in range(iterations):
+        monitor.reset_max()
+        blocked_before = monitor.blocked
+        f, t, _ = await invoke(bot_module, scenario)
+        # Let the sampler observe whatever the call left running on the loop
+        await asyncio.sleep(monitor.interval * 2)
+        first.append(f)
+        total.append(t)
+        blocked.append(monitor.blocked - blocked_before)
+        max_lag.append(monitor.max_lag)
+    return {"first": first, "total": total, "blocked": blocked, "max_lag": max_lag}
+
+
+async def measure_allocations(bot_module, scenario, iterations):
+    """Peak and retained bytes per call under tracemalloc (slow, so a separate pass)."""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await invoke(bot_module, scenario)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {"peak": peaks, "retained": retained}
+
+
+# ── Harness ───────────────────────────────────────────────────────────────────
+
+def import_bot(workdir):
+    """Import bot.py with every file it writes kept in workdir."""
+    os.environ.update(
+        DISCORD_BOT_TOKEN="benchmark",
+        STATS_BACKEND="json",
+        COUNTDOWN_CACHE_DIR=os.path.join(workdir, "countdown_cache"),
+        CAT_POOL_DIR=os.path.join(workdir, "catpool"),
+        DISCORD_RATELIMIT_PATH=os.path.join(workdir, "discord_ratelimits.db"),
+    )
+    for name in DATA_FILES:
+        if os.path.exists(os.path.join(ROOT, name)):
+            os.symlink(os.path.join(ROOT, name), os.path.join(workdir, name))
+    os.chdir(workdir)
+    import logging
+    import bot
+    # Keep bot.log (as in production) but don't echo every command to the terminal
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if type(handler) is logging.StreamHandler:
+            root.removeHandler(handler)
+    return bot
+
+
+def redirect_events(cache, base_url):
+    cache.sources["blueprint"].url = lambda now: f"{base_url}/feeds/blueprint?endsAfter={now:%Y-%m-%d}"
+    cache.sources["uchicago_events"].url = f"{base_url}/feeds/uchicago_events"
+    cache.sources["hydepark"].url = f"{base_url}/feeds/hydepark"
+
+
+def build_scenarios(bot, base_url, workdir):
+    from discord import app_commands
+    from catpool import CatPool
+    from events import EventCache
+
+    async def cold_events():
+        cache = EventCache(ttl=bot.event_cache.ttl, timeouts=bot.SOURCE_TIMEOUTS)
+        redirect_events(cache, base_url)
+        warm, bot.event_cache = bot.event_cache, cache
+        cache.start(bot.bot.http_session)  # as on_ready does; the command finds it still loading
+        return warm
+
+    async def restore_events(warm):
+        bot.event_cache._task.cancel()
+        bot.event_cache = warm
+
+    empty_pool_dir = os.path.join(workdir, "catpool-empty")
+
+    async def empty_pool():
+        warm, bot.cat_pool = bot.cat_pool, CatPool(empty_pool_dir)
+        return warm
+
+    async def restore_pool(warm):
+        bot.cat_pool = warm
+
+    week = app_commands.Choice(name="Next 7 Days", value="7")
+    return [
+        Scenario("scav", "scav"),
+        Scenario("scav filtered", "scav", {"year": 2015, "min_points": 5, "keyword": "the"}),
+        Scenario("shadydealer", "shadydealer"),
+        Scenario("shadydealer filtered", "shadydealer", {"keyword": "student"}),
+        Scenario("daysinquarter", "daysinquarter"),
+        Scenario("finalsmotivation", "finalsmotivation"),
+        Scenario("finalsmotivation cold", "finalsmotivation", setup=empty_pool, teardown=restore_pool),
+        Scenario("thingstodo", "thingstodo"),
+        Scenario("thingstodo 7 days", "thingstodo", {"timeframe": week}),
+        Scenario("thingstodo cold", "thingstodo", setup=cold_events, teardown=restore_events),
+    ]
+
+
+def summarize(timings, allocations):
+    ms = lambda values, p: percentile(values, p) * 1000
+    summary = {
+        "first_p50_ms": ms(timings["first"], 50), "first_p99_ms": ms(timings["first"], 99),
+        "total_p50_ms": ms(timings["total"], 50), "total_p95_ms": ms(timings["total"], 95),
+        "total_p99_ms": ms(timings["total"], 99), "total_max_ms": max(timings["total"]) * 1000,
+        "blocked_mean_ms": sum(timings["blocked"]) / len(timings["blocked"]) * 1000,
+        "max_lag_ms": max(timings["max_lag"]) * 1000,
+    }
+    if allocations:
+        summary["alloc_peak_kb"] = percentile(allocations["peak"], 50) / 1024
+        summary["alloc_retained_kb"] = percentile(allocations["retained"], 50) / 1024
+    return summary
+
+
+def print_table(results):
+    print(f"\n{'scenario':<24}{'first p50':>10}{'p99':>9}{'total p50':>11}{'p95':>9}{'p99':>9}{'max':>9}"
+          f"{'blocked':>9}{'max lag':>9}{'peak KB':>9}{'kept KB':>9}")
+    for name, s in results.items():
+        print(f"{name:<24}{s['first_p50_ms']:>10.2f}{s['first_p99_ms']:>9.2f}{s['total_p50_ms']:>11.2f}"
+              f"{s['total_p95_ms']:>9.2f}{s['total_p99_ms']:>9.2f}{s['total_max_ms']:>9.2f}"
+              f"{s['blocked_mean_ms']:>9.2f}{s['max_lag_ms']:>9.2f}"
+              f"{s.get('alloc_peak_kb', float('nan')):>9.1f}{s.get('alloc_retained_kb', float('nan')):>9.1f}")
+    print("(milliseconds; 'blocked' is mean event-loop time lost per call, allocation columns are medians)")
+
+
+async def main(args):
+    manifest, bodies = load_fixtures()
+    with tempfile.TemporaryDirectory(prefix="uchiverify-bench-") as workdir:
+        bot = import_bot(workdir)
+        server = FixtureServer(bodies, latency=args.upstream_latency)
+        base_url = await server.start()
+        import catpool
+        catpool.CAT_BASE_URL = f"{base_url}/cat"
+        bot.CATAAS_SAYS_URL = f"{base_url}/cat/says/{{text}}"
+        redirect_events(bot.event_cache, base_url)
+
+        await bot.bot.setup_hook()
+        session = bot.bot.http_session
+        bot.stats_store.start()
+        try:
+            # Production state after on_ready: events loaded, a few cats in the pool
+            bot.event_cache.start(session)
+            await bot.event_cache.wait_loaded()
+            for _ in range(args.pool_size):
+                await bot.cat_pool._add_one(session)
+            print(f"fixtures recorded {manifest['recorded_at']}{' (synthetic)' if manifest.get('synthetic') else ''}; "
+                  f"{len(bot.event_cache.events())} upcoming events, {len(bot.cat_pool)} pooled cats, "
+                  f"upstream latency {args.upstream_latency * 1000:.0f} ms")
+
+            scenarios = build_scenarios(bot, base_url, workdir)
+            if args.only:
+                wanted = {name.strip() for name in args.only.split(",")}
+                scenarios = [s for s in scenarios if s.name in wanted or s.command in wanted]
+
+            monitor = LoopMonitor()
+            monitor.start()
+            results = {}
+            for scenario in scenarios:
+                timings = await measure(bot, scenario, args.iterations, args.warmup, monitor)
+                allocations = None
+                if args.alloc_iterations:
+                    allocations = await measure_allocations(bot, scenario, args.alloc_iterations)
+                results[scenario.name] = summarize(timings, allocations)
+                print(f"  {scenario.name}: done")
+            monitor.stop()
+        finally:
+            bot.event_cache._task.cancel()
+            await bot.stats_store.close()
+            bot.countdown_images.close()
+            await session.close()
+            await server.stop()
+        os.chdir(ROOT)
+
+    print_table(results)
+    print(f"upstream requests: {dict(sorted(server.calls.items()))}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["record"]:
+        asyncio.run(record())
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Benchmark slash-command handlers against recorded fixtures")
+    parser.add_argument("--iterations", type=int, default=100, help="timed calls per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed calls per scenario")
+    parser.add_argument("--alloc-iterations", type=int, default=20,
+                        help="calls per scenario under tracemalloc (0 to skip)")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds added to each fixture response")
+    parser.add_argument("--pool-size", type=int, default=10, help="cats fetched into the pool before measuring")
+    parser.add_argument("--only", help="comma-separated scenario or command names")
+    parser.add_argument("--json", help="also write the results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Latency and memory of picking a random /scav item and /shadydealer article:
+re-reading the CSV per call (old) vs. the preloaded Corpus (new).
+
+    python benchmarks/bench_corpora.py
+"""
+import os
+import sys
+import csv
+import time
+import random
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpora import Corpus, load_scav, load_articles
+
+SCAV_PATH = os.path.join(ROOT, "scav.csv")
+CSV_PATH = os.path.join(ROOT, "shadydealer.csv")
+
+
+def legacy_random_scav():
+    with open(SCAV_PATH, newline='', encoding='utf-8') as csvfile:
+        reader = list(csv.DictReader(csvfile))
+        item = random.choice(reader)
+        return item.get("Item", "UNK ITEM.").strip(), item.get("Description", "").strip(), item.get("Points", "[UNK POINTS]").strip()
+
+
+def legacy_random_article():
+    with open(CSV_PATH, newline='', encoding='utf-8') as csvfile:
+        reader = list(csv.DictReader(csvfile))
+        article = random.choice(reader)
+        return article.get("Title", "Untitled").strip(), article.get("URL", "").strip(), article.get("Author", "Unknown").strip()
+
+
+def dict_rows(path):
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def peak_kb(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def retained_kb(fn):
+    tracemalloc.start()
+    obj = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current / 1024
+
+
+if __name__ == "__main__":
+    scav = Corpus(SCAV_PATH, load_scav)
+    articles = Corpus(CSV_PATH, load_articles)
+
+    print(f"{'':28}{'per call':>12}{'peak alloc/call':>18}")
+    print(f"{'scav (CSV per call)':28}{per_call_us(legacy_random_scav, 50):>9.0f} us{peak_kb(legacy_random_scav):>15.0f} KB")
+    print(f"{'scav (preloaded)':28}{per_call_us(scav.pick, 100000):>9.2f} us{peak_kb(scav.pick):>15.1f} KB")
+    print(f"{'shadydealer (CSV per call)':28}{per_call_us(legacy_random_article, 200):>9.0f} us{peak_kb(legacy_random_article):>15.0f} KB")
+    print(f"{'shadydealer (preloaded)':28}{per_call_us(articles.pick, 100000):>9.2f} us{peak_kb(articles.pick):>15.1f} KB")
+    print()
+    print(f"resident scav corpus       : {retained_kb(lambda: load_scav(SCAV_PATH)):8.0f} KB "
+          f"(list of DictReader rows: {retained_kb(lambda: dict_rows(SCAV_PATH)):.0f} KB)")
+    print(f"resident article corpus    : {retained_kb(lambda: load_articles(CSV_PATH)):8.0f} KB "
+          f"(list of DictReader rows: {retained_kb(lambda: dict_rows(CSV_PATH)):.0f} KB)")
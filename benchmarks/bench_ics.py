@@ -0,0 +1,104 @@
+"""
+Benchmark the streaming ICS parser against the old split-and-regex approach
+on a large synthetic Hyde Park-style feed.
+
+    python benchmarks/bench_ics.py [num_events]
+"""
+import os
+import re
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz
+
+from ics import StreamingIcsParser
+
+CST = pytz.timezone("US/Central")
+
+
+def synthetic_feed(num_events, past_fraction=0.5, seed=1):
+    """A feed with a TZID on every DTSTART, folded descriptions and escaped text."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//EN"]
+    for i in range(num_events):
+        offset = rng.randint(1, 365) * (-1 if rng.random() < past_fraction else 1)
+        start = now + timedelta(days=offset, hours=rng.randint(0, 23))
+        description = "Join us\\, neighbours\; " + "lorem ipsum dolor sit amet " * rng.randint(2, 8)
+        folded = [description[j:j + 74] for j in range(0, len(description), 74)]
+        lines += [
+            "BEGIN:VEVENT",
+            f"DTSTART;TZID=America/Chicago:{start:%Y%m%dT%H%M%S}",
+            f"DTEND;TZID=America/Chicago:{start + timedelta(hours=2):%Y%m%dT%H%M%S}",
+            f"DTSTAMP:{now:%Y%m%dT%H%M%S}Z",
+            f"UID:{i}@welcometohydepark.com",
+            f"SUMMARY:Event number {i}",
+            "DESCRIPTION:" + "\r\n ".join(folded),
+            f"URL:https://welcometohydepark.com/event/{i}/",
+            "LOCATION:Harper Court\\, 5235 S Harper Ct",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def legacy_parse(ics_data, now):
+    """The original /thingstodo Hyde Park parser, kept verbatim for comparison."""
+    events = []
+    for event_block in ics_data.split("BEGIN:VEVENT")[1:]:
+        summary_match = re.search(r'SUMMARY:(.*?)(?:\r?\n)', event_block)
+        dtstart_match = re.search(r'DTSTART(?:;[^:]*)?:(.*?)(?:\r?\n)', event_block)
+        url_match = re.search(r'URL:(.*?)(?:\r?\n)', event_block)
+        location_match = re.search(r'LOCATION:(.*?)(?:\r?\n)', event_block)
+        description_match = re.search(r'DESCRIPTION:(.*?)(?:\r?\n)', event_block)
+        if not summary_match or not dtstart_match:
+            continue
+        dtstart_str = dtstart_match.group(1).strip()
+        if 'T' in dtstart_str:
+            date = datetime.strptime(dtstart_str.replace('Z', ''), "%Y%m%dT%H%M%S")
+        else:
+            date = datetime.strptime(dtstart_str, "%Y%m%d")
+        date = CST.localize(date)
+        if date < now:
+            continue
+        events.append((summary_match.group(1).strip(), date,
+                       url_match and url_match.group(1).strip(),
+                       location_match and location_match.group(1).strip(),
+                       description_match and description_match.group(1).strip()[:150]))
+    return events
+
+
+def streaming_parse(data, now, chunk_size=64 * 1024):
+    parser = StreamingIcsParser(not_before=now, default_tz=CST)
+    events = []
+    for i in range(0, len(data), chunk_size):
+        events += parser.feed(data[i:i + chunk_size])
+    return events + parser.close()
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    num_events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = synthetic_feed(num_events)
+    now = datetime.now().astimezone()
+    print(f"Feed: {num_events} events, {len(data) / 1e6:.1f} MB")
+
+    # The legacy path also paid for decoding the whole body up front
+    legacy_time, legacy = best_of(lambda: legacy_parse(data.decode(), now))
+    stream_time, streamed = best_of(lambda: streaming_parse(data, now))
+
+    print(f"split + regex : {legacy_time * 1000:8.1f} ms  ({len(legacy)} upcoming events)")
+    print(f"streaming     : {stream_time * 1000:8.1f} ms  ({len(streamed)} upcoming events)")
+    print(f"speedup       : {legacy_time / stream_time:8.2f}x")
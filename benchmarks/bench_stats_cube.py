@@ -0,0 +1,125 @@
+"""
+Admin-dashboard aggregations over synthetic command stats: walking the
+command_stats.json dicts (old) vs. reductions over the StatsCube (new).
+
+The stats have `--guilds` guilds with `--days` days of history, each guild
+active on a random `--activity` fraction of days with 1-3 commands per
+active day. Both sides must return identical results.
+
+    python benchmarks/bench_stats_cube.py
+    python benchmarks/bench_stats_cube.py --guilds 1000 --days 90 --activity 1
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stats_cube import StatsCube
+
+COMMANDS = ["verify", "scav", "shadydealer", "thingstodo", "finalsmotivation", "countdown",
+            "cat", "help", "serverstats", "about", "events", "calendar"]
+END = date(2026, 10, 18)
+
+
+def make_stats(guilds, days, activity, seed=0):
+    rng = random.Random(seed)
+    dates = [(END - timedelta(days=i)).isoformat() for i in range(days)][::-1]
+    weights = [1 / (rank + 1) for rank in range(len(COMMANDS))]  # a few popular commands, a long tail
+    servers, totals = {}, defaultdict(int)
+    for guild in range(guilds):
+        daily, guild_totals = {}, defaultdict(int)
+        for day in dates:
+            if rng.random() >= activity:
+                continue
+            counts = {}
+            for command in rng.choices(COMMANDS, weights, k=rng.randint(1, 3)):
+                counts[command] = counts.get(command, 0) + rng.randint(1, 20)
+            daily[day] = counts
+            for command, count in counts.items():
+                guild_totals[command] += count
+        servers[str(10**17 + guild)] = {"commands": dict(guild_totals), "daily": daily}
+        for command, count in guild_totals.items():
+            totals[command] += count
+    return {"commands": dict(totals), "servers": servers}
+
+
+# The pre-cube implementations (JSONStatsStore and collect_dashboard)
+
+def legacy_guild_summaries(stats):
+    summaries = {}
+    for guild_id, guild_data in stats.get("servers", {}).items():
+        commands = guild_data.get("commands", {})
+        top_name, top_count = max(commands.items(), key=lambda x: x[1], default=("None", 0))
+        summaries[guild_id] = (sum(commands.values()), top_name, top_count)
+    return summaries
+
+
+def legacy_daily_totals(stats, days=30):
+    totals = defaultdict(int)
+    for guild_data in stats.get("servers", {}).values():
+        for day, commands in guild_data.get("daily", {}).items():
+            totals[day] += sum(commands.values())
+    return [(day, totals[day]) for day in sorted(totals)[-days:]]
+
+
+def legacy_top_commands(stats, n=10):
+    return sorted(stats["commands"].items(), key=lambda x: x[1], reverse=True)[:n]
+
+
+def legacy_dashboard(stats):
+    return legacy_top_commands(stats), legacy_guild_summaries(stats), legacy_daily_totals(stats)
+
+
+def cube_dashboard(cube):
+    return cube.top_commands(), cube.guild_summaries(), cube.daily_totals()
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main(args):
+    start = time.perf_counter()
+    stats = make_stats(args.guilds, args.days, args.activity)
+    cells = sum(len(day) for server in stats["servers"].values() for day in server["daily"].values())
+    print(f"{args.guilds:,} guilds x {args.days} days, {cells:,} (guild, day, command) counts "
+          f"(generated in {time.perf_counter() - start:.1f}s)")
+
+    build_ms, cube = best_ms(lambda: StatsCube.from_stats(stats, days=args.days, end=END), 1)
+    print(f"StatsCube.from_stats: {build_ms:.0f} ms, {cube.nbytes / 2**20:.1f} MB of arrays "
+          f"(totals {cube.totals.shape}, {cube.day_totals.size} day totals)\n")
+
+    cases = [
+        ("guild summaries", lambda: legacy_guild_summaries(stats), cube.guild_summaries),
+        ("daily totals (30)", lambda: legacy_daily_totals(stats), cube.daily_totals),
+        ("top 10 commands", lambda: legacy_top_commands(stats), cube.top_commands),
+        ("whole dashboard", lambda: legacy_dashboard(stats), lambda: cube_dashboard(cube)),
+    ]
+    print(f"{'':22}{'dicts':>11}{'cube':>11}{'speedup':>9}")
+    for name, legacy, vectorized in cases:
+        legacy_ms, expected = best_ms(legacy, args.repeat)
+        cube_ms, result = best_ms(vectorized, args.repeat)
+        if result != expected:
+            raise SystemExit(f"{name}: cube result differs from the dict walk")
+        print(f"{name:22}{legacy_ms:>8.2f} ms{cube_ms:>8.2f} ms{legacy_ms / cube_ms:>8.1f}x")
+    print("(best of each; results verified identical)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dashboard stats aggregations: dict walk vs StatsCube")
+    parser.add_argument("--guilds", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--activity", type=float, default=0.3, help="fraction of days each guild is active")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    main(parser.parse_args())
@@ -0,0 +1,193 @@
+"""
+End-to-end load test of the verification flow in app.py, fully offline.
+
+Starts the Okta/Discord stand-ins from verify_stubs.py and app.py under
+gunicorn (pointed at the stubs through OKTA_ISSUER, OKTA_REDIRECT_URI and
+DISCORD_API_BASE, with its SQLite files in a temp dir), then drives
+/uchiverify/auth/start -> Okta authorize -> /auth/callback at each
+concurrency level. After each level it waits for the role queue to drain
+and reports throughput, p50/p95/p99 latency of the whole flow and of the
+callback alone, and upstream calls per verification.
+
+    python benchmarks/loadtest_verify.py --levels 1,4,16,64 --per-level 200 --workers 4
+    python benchmarks/loadtest_verify.py --inject-429 0.1 --no-id-token
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+import multiprocessing
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import verify_stubs
+
+CLIENT_ID = "loadtest"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def wait_until_up(url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url, allow_redirects=False):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_app(args, app_port, stub_port, workdir):
+    env = dict(os.environ,
+               OKTA_ISSUER=f"http://127.0.0.1:{stub_port}",
+               OKTA_REDIRECT_URI=f"http://127.0.0.1:{app_port}/auth/callback",
+               OKTA_CLIENT_ID=CLIENT_ID,
+               OKTA_CLIENT_SECRET="loadtest",
+               DISCORD_API_BASE=f"http://127.0.0.1:{stub_port}/api/v10",
+               DISCORD_BOT_TOKEN="loadtest",
+               FLASK_SECRET_KEY="loadtest",
+               ROLE_CACHE_PATH=os.path.join(workdir, "role_cache.db"),
+               ROLE_QUEUE_PATH=os.path.join(workdir, "role_queue.db"),
+               DISCORD_RATELIMIT_PATH=os.path.join(workdir, "discord_ratelimits.db"))
+    command = [sys.executable, "-m", "gunicorn", "--pythonpath", ROOT, "--chdir", workdir,
+               "-w", str(args.workers), "--threads", str(args.threads),
+               "-b", f"127.0.0.1:{app_port}", "--log-level", "warning", "app:app"]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+async def verify_once(app_url, guild_id, user_id):
+    """One user's full flow. Returns (total seconds, callback seconds, ok)."""
+    jar = aiohttp.CookieJar(unsafe=True)  # keep cookies for 127.0.0.1
+    async with aiohttp.ClientSession(cookie_jar=jar) as session:
+        start = time.perf_counter()
+        async with session.get(f"{app_url}/uchiverify/auth/start",
+                               params={"guild_id": guild_id, "user_id": user_id},
+                               allow_redirects=False) as response:
+            authorize_url = response.headers["Location"]
+        async with session.get(authorize_url, allow_redirects=False) as response:
+            callback_url = response.headers["Location"]
+        callback_start = time.perf_counter()
+        async with session.get(callback_url, allow_redirects=False) as response:
+            body = await response.text()
+            ok = response.status == 200 and "Verification Success" in body
+        end = time.perf_counter()
+    return end - start, end - callback_start, ok
+
+
+async def stub_stats(stub_url, reset=False):
+    async with aiohttp.ClientSession() as session:
+        if reset:
+            async with session.post(f"{stub_url}/_reset"):
+                return {}
+        async with session.get(f"{stub_url}/_stats") as response:
+            return await response.json()
+
+
+async def run_level(app_url, stub_url, concurrency, total, guilds, user_ids):
+    await stub_stats(stub_url, reset=True)
+    totals, callbacks, failures = [], [], 0
+    remaining = iter(range(total))
+
+    async def user_loop():
+        nonlocal failures
+        for _ in remaining:
+            guild_id = 1000 + next(user_ids) % guilds
+            try:
+                t, cb, ok = await verify_once(app_url, guild_id, next(user_ids))
+            except (aiohttp.ClientError, KeyError, asyncio.TimeoutError):
+                failures += 1
+                continue
+            if ok:
+                totals.append(t)
+                callbacks.append(cb)
+            else:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    # Role assignment happens after the response; wait for the queue to drain
+    drain_start = time.perf_counter()
+    while time.perf_counter() - drain_start < 60:
+        stats = await stub_stats(stub_url)
+        if stats.get("roles_assigned", 0) >= len(totals):
+            break
+        await asyncio.sleep(0.2)
+    drain = time.perf_counter() - drain_start
+    return totals, callbacks, failures, elapsed, drain, stats
+
+
+def print_level(concurrency, totals, callbacks, failures, elapsed, drain, stats):
+    n = len(totals)
+    ms = lambda v: v * 1000
+    print(f"\nconcurrency {concurrency}: {n} ok, {failures} failed in {elapsed:.2f}s "
+          f"-> {n / elapsed:.1f} verifications/s (roles drained {drain:.2f}s later)")
+    print(f"  flow     p50 {ms(percentile(totals, 50)):7.1f} ms  p95 {ms(percentile(totals, 95)):7.1f} ms  "
+          f"p99 {ms(percentile(totals, 99)):7.1f} ms")
+    print(f"  callback p50 {ms(percentile(callbacks, 50)):7.1f} ms  p95 {ms(percentile(callbacks, 95)):7.1f} ms  "
+          f"p99 {ms(percentile(callbacks, 99)):7.1f} ms")
+    if n:
+        calls = ", ".join(f"{name} {count / n:.2f}" for name, count in sorted(stats.items()))
+        print(f"  upstream calls per verification: {calls}")
+
+
+async def main(args):
+    stub_port, app_port = free_port(), free_port()
+    stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+    stubs = multiprocessing.Process(target=verify_stubs.serve, args=(stub_port, args), daemon=True)
+    stubs.start()
+    with tempfile.TemporaryDirectory(prefix="uchiverify-loadtest-") as workdir:
+        app = start_app(args, app_port, stub_port, workdir)
+        try:
+            await wait_until_up(f"{stub_url}/_stats")
+            await wait_until_up(f"{app_url}/uchiverify/auth/start")
+            print(f"app.py: gunicorn -w {args.workers} --threads {args.threads}; "
+                  f"okta latency {args.okta_latency * 1000:.0f} ms, discord latency "
+                  f"{args.discord_latency * 1000:.0f} ms, injected 429s {args.inject_429:.0%}, "
+                  f"id_token {'off' if args.no_id_token else 'on'}")
+            user_ids = itertools.count(10**17)
+            for concurrency in args.levels:
+                total = max(args.per_level, concurrency)
+                result = await run_level(app_url, stub_url, concurrency, total, args.guilds, user_ids)
+                print_level(concurrency, *result)
+        finally:
+            app.send_signal(signal.SIGTERM)
+            app.wait(timeout=10)
+            stubs.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the app.py verification flow against local stubs")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16, 64],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--per-level", type=int, default=200, help="verifications per level")
+    parser.add_argument("--guilds", type=int, default=5, help="number of guilds users verify in")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--verbose", action="store_true", help="show gunicorn's stderr")
+    verify_stubs.add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
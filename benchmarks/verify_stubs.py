@@ -0,0 +1,200 @@
+"""
+Local stand-ins for the Okta and Discord endpoints app.py talks to, for load
+tests. Everything is served from one aiohttp app:
+
+    /oauth2/v1/authorize   redirects straight back to redirect_uri with a code
+    /oauth2/v1/token       access token plus an RS256 id_token carrying the nonce
+    /oauth2/v1/keys        JWKS for the id_token signing key
+    /oauth2/v1/userinfo    the user's email
+    /api/v10/guilds/{guild}/roles                          GET / POST
+    /api/v10/guilds/{guild}/members/{user}/roles/{role}    PUT
+
+Each endpoint sleeps for the configured latency, Discord endpoints send
+rate-limit headers (and enforce them with 429s), and a fraction of Discord
+requests can be answered with an injected 429. Call counts are served at
+/_stats and cleared with POST /_reset.
+
+    python benchmarks/verify_stubs.py --port 8900
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter, defaultdict
+
+import jwt
+from aiohttp import web
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+KID = "loadtest"
+
+
+class Stubs:
+    def __init__(self, issuer, client_id="loadtest", okta_latency=0.0, discord_latency=0.0,
+                 inject_429=0.0, retry_after=0.25, bucket_limit=50, bucket_window=1.0, id_token=True):
+        self.issuer = issuer
+        self.client_id = client_id
+        self.okta_latency = okta_latency
+        self.discord_latency = discord_latency
+        self.inject_429 = inject_429
+        self.retry_after = retry_after
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.id_token = id_token
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.key.public_key()))
+        jwk.update(kid=KID, alg="RS256", use="sig")
+        self.jwks = {"keys": [jwk]}
+        self.codes = {}                      # code -> (nonce, email)
+        self.roles = {}                      # guild -> role id
+        self.buckets = defaultdict(lambda: [0.0, 0])  # (endpoint, guild) -> [window start, count]
+        self.ids = itertools.count(10**17)
+        self.calls = Counter()
+
+    async def _okta(self, name):
+        self.calls[name] += 1
+        if self.okta_latency:
+            await asyncio.sleep(self.okta_latency)
+
+    async def authorize(self, request):
+        await self._okta("okta_authorize")
+        q = request.query
+        code = os.urandom(12).hex()
+        self.codes[code] = (q.get("nonce"), f"user{next(self.ids)}@uchicago.edu")
+        raise web.HTTPFound(f"{q['redirect_uri']}?code={code}&state={q['state']}")
+
+    async def token(self, request):
+        await self._okta("okta_token")
+        form = await request.post()
+        nonce, email = self.codes.pop(form.get("code"), (None, None))
+        if email is None:
+            return web.json_response({"error": "invalid_grant"}, status=400)
+        body = {"access_token": os.urandom(16).hex(), "token_type": "Bearer", "expires_in": 3600}
+        if self.id_token:
+            now = int(time.time())
+            claims = {"iss": self.issuer, "aud": self.client_id, "sub": email, "email": email,
+                      "iat": now, "exp": now + 3600, "nonce": nonce}
+            body["id_token"] = jwt.encode(claims, self.key, "RS256", headers={"kid": KID})
+        self.codes[body["access_token"]] = (None, email)
+        return web.json_response(body)
+
+    async def keys(self, request):
+        await self._okta("okta_keys")
+        return web.json_response(self.jwks)
+
+    async def userinfo(self, request):
+        await self._okta("okta_userinfo")
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        _, email = self.codes.get(token, (None, None))
+        if email is None:
+            return web.json_response({"error": "invalid_token"}, status=401)
+        return web.json_response({"sub": email, "email": email})
+
+    async def _discord(self, name, guild):
+        """Count, delay and rate-limit a Discord call. Returns (429 response or None, headers)."""
+        self.calls[name] += 1
+        if self.discord_latency:
+            await asyncio.sleep(self.discord_latency)
+        now = time.time()
+        bucket = self.buckets[(name, guild)]
+        if now - bucket[0] >= self.bucket_window:
+            bucket[0], bucket[1] = now, 0
+        bucket[1] += 1
+        reset_after = bucket[0] + self.bucket_window - now
+        headers = {
+            "X-RateLimit-Bucket": f"stub-{name}",
+            "X-RateLimit-Limit": str(self.bucket_limit),
+            "X-RateLimit-Remaining": str(max(0, self.bucket_limit - bucket[1])),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if bucket[1] > self.bucket_limit:
+            self.calls["discord_429_enforced"] += 1
+            return web.json_response({"message": "You are being rate limited.", "retry_after": reset_after,
+                                      "global": False}, status=429, headers=headers), headers
+        if random.random() < self.inject_429:
+            self.calls["discord_429_injected"] += 1
+            headers["Retry-After"] = str(self.retry_after)
+            return web.json_response({"message": "You are being rate limited.", "retry_after": self.retry_after,
+                                      "global": False}, status=429, headers=headers), headers
+        return None, headers
+
+    async def list_roles(self, request):
+        guild = request.match_info["guild"]
+        limited, headers = await self._discord("discord_list_roles", guild)
+        if limited is not None:
+            return limited
+        roles = [{"id": guild, "name": "@everyone"}]
+        if guild in self.roles:
+            roles.append({"id": self.roles[guild], "name": "UChicago Verified"})
+        return web.json_response(roles, headers=headers)
+
+    async def create_role(self, request):
+        guild = request.match_info["guild"]
+        limited, headers = await self._discord("discord_create_role", guild)
+        if limited is not None:
+            return limited
+        if guild in self.roles:
+            self.calls["discord_duplicate_role"] += 1
+        self.roles[guild] = str(next(self.ids))
+        body = await request.json()
+        return web.json_response({"id": self.roles[guild], "name": body.get("name")}, headers=headers)
+
+    async def add_member_role(self, request):
+        guild = request.match_info["guild"]
+        limited, headers = await self._discord("discord_add_role", guild)
+        if limited is not None:
+            return limited
+        if self.roles.get(guild) != request.match_info["role"]:
+            return web.json_response({"message": "Unknown Role", "code": 10011}, status=404, headers=headers)
+        self.calls["roles_assigned"] += 1
+        return web.Response(status=204, headers=headers)
+
+    async def stats(self, request):
+        return web.json_response(dict(self.calls))
+
+    async def reset(self, request):
+        self.calls.clear()
+        return web.json_response({})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/oauth2/v1/authorize", self.authorize)
+        app.router.add_post("/oauth2/v1/token", self.token)
+        app.router.add_get("/oauth2/v1/keys", self.keys)
+        app.router.add_get("/oauth2/v1/userinfo", self.userinfo)
+        app.router.add_get("/api/v10/guilds/{guild}/roles", self.list_roles)
+        app.router.add_post("/api/v10/guilds/{guild}/roles", self.create_role)
+        app.router.add_put("/api/v10/guilds/{guild}/members/{user}/roles/{role}", self.add_member_role)
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_post("/_reset", self.reset)
+        return app
+
+
+def add_arguments(parser):
+    parser.add_argument("--okta-latency", type=float, default=0.02, help="seconds added to each Okta call")
+    parser.add_argument("--discord-latency", type=float, default=0.03, help="seconds added to each Discord call")
+    parser.add_argument("--inject-429", type=float, default=0.0, help="fraction of Discord calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.25, help="Retry-After of injected 429s")
+    parser.add_argument("--bucket-limit", type=int, default=50, help="Discord requests per guild per window")
+    parser.add_argument("--no-id-token", action="store_true", help="omit id_token to force the userinfo path")
+
+
+def serve(port, args):
+    stubs = Stubs(f"http://127.0.0.1:{port}", okta_latency=args.okta_latency,
+                  discord_latency=args.discord_latency, inject_429=args.inject_429,
+                  retry_after=args.retry_after, bucket_limit=args.bucket_limit,
+                  id_token=not args.no_id_token)
+    web.run_app(stubs.app(), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"Okta and Discord stubs on http://127.0.0.1:{args.port}", file=sys.stderr)
+    serve(args.port, args)
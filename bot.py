@@ -4,100 +4,85 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
-import csv
 import random
-import pytz
 import urllib.parse
 import re
 from datetime import datetime, timedelta
-import requests
 import aiohttp
 from aiohttp import web, ClientTimeout
 import asyncio
 import io
-import json
+import math
+import time
+import signal
 import base64
-from pathlib import Path
+from stats import make_stats_store, RetentionPolicy
+from events import EventCache
+from corpora import Corpus, load_articles, load_scav
+from academic_calendar import load_calendar
+from cluster import ClusterStatus
+from catpool import CatPool
+from owners import OwnerCache
+from dashboard import DashboardCache, etag_matches
+from countdown import CountdownImages
+from discord_rest import AsyncDiscordREST, RateLimitState
+from loop_watchdog import LoopWatchdog
+from metrics import Gauge, LoopLagMonitor, observe_upstream, render as render_metrics, timed_command
+from api import BadRequest, MAX_LIMIT, int_param, json_response, paginate
 load_dotenv()
 
 CSV_PATH = "shadydealer.csv"
 SCAV_PATH = "scav.csv"
 STATS_PATH = "command_stats.json"
-
-# Initialize or load command statistics
-def load_stats():
-    """Load command statistics from JSON file."""
-    if Path(STATS_PATH).exists():
-        try:
-            with open(STATS_PATH, 'r') as f:
-                return json.load(f)
-        except:
-            return {"commands": {}}
-    return {"commands": {}}
-
-def save_stats(stats):
-    """Save command statistics to JSON file."""
-    try:
-        with open(STATS_PATH, 'w') as f:
-            json.dump(stats, f, indent=2)
-    except Exception as e:
-        logging.error(f"Failed to save stats: {e}")
+CALENDAR_PATH = "academic_calendar.csv"
+
+# Sharding. By default one process runs every shard Discord recommends; cluster.py
+# instead starts several processes, each with a range of shards and CLUSTER_STATUS_PATH
+# pointing at the file they share. Cluster 0 serves the public web server.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard] or None
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+IS_PRIMARY = CLUSTER_ID == 0
+IDENTIFY_CONCURRENCY = int(os.getenv("IDENTIFY_CONCURRENCY", "1"))
+CLUSTER_STATUS_INTERVAL = float(os.getenv("CLUSTER_STATUS_INTERVAL", "15"))
+cluster_status = ClusterStatus(os.getenv("CLUSTER_STATUS_PATH")) if os.getenv("CLUSTER_STATUS_PATH") else None
+
+# Command statistics are buffered in memory and flushed to the backend in the background
+stats_store = make_stats_store(
+    STATS_PATH,
+    flush_interval=float(os.getenv("STATS_FLUSH_INTERVAL", "30")),
+    flush_every=int(os.getenv("STATS_FLUSH_EVERY", "50")),
+    # Per-guild daily buckets older than this roll up into weekly, then monthly ones
+    retention=RetentionPolicy(
+        daily_days=int(os.getenv("STATS_DAILY_RETENTION_DAYS", "90")),
+        weekly_days=int(os.getenv("STATS_WEEKLY_RETENTION_DAYS", "365")),
+    ),
+    compact_interval=float(os.getenv("STATS_COMPACT_INTERVAL", str(6 * 3600))),
+)
 
 def track_command(command_name: str, guild_id: int = None):
     """Track command usage statistics (anonymized - no user data collected)."""
-    stats = load_stats()
-
-    # Track global command counts (legacy support)
-    if command_name not in stats["commands"]:
-        stats["commands"][command_name] = 0
-    stats["commands"][command_name] += 1
-
-    # Track per-server stats if guild_id provided
-    if guild_id:
-        # Initialize servers dict if it doesn't exist
-        if "servers" not in stats:
-            stats["servers"] = {}
-
-        guild_id_str = str(guild_id)
-        if guild_id_str not in stats["servers"]:
-            stats["servers"][guild_id_str] = {
-                "commands": {},
-                "daily": {}
-            }
-
-        # Track total command count for this server
-        if command_name not in stats["servers"][guild_id_str]["commands"]:
-            stats["servers"][guild_id_str]["commands"][command_name] = 0
-        stats["servers"][guild_id_str]["commands"][command_name] += 1
-
-        # Track daily usage
-        today = datetime.now(pytz.timezone('America/Chicago')).strftime('%Y-%m-%d')
-        if today not in stats["servers"][guild_id_str]["daily"]:
-            stats["servers"][guild_id_str]["daily"][today] = {}
-
-        if command_name not in stats["servers"][guild_id_str]["daily"][today]:
-            stats["servers"][guild_id_str]["daily"][today][command_name] = 0
-        stats["servers"][guild_id_str]["daily"][today][command_name] += 1
-
-    save_stats(stats)
-
-def get_random_article():
-    with open(CSV_PATH, newline='', encoding='utf-8') as csvfile:
-        reader = list(csv.DictReader(csvfile))
-        article = random.choice(reader)
-        title = article.get("Title", "Untitled").strip()
-        url = article.get("URL", "").strip()
-        author = article.get("Author", "Unknown").strip()
-        return title, url, author
-
-def get_random_scav():
-    with open(SCAV_PATH, newline='', encoding='utf-8') as csvfile:
-        reader = list(csv.DictReader(csvfile))
-        item = random.choice(reader)
-        number = item.get("Item", "UNK ITEM.").strip()
-        description = item.get("Description", "").strip()
-        pointvalue = item.get("Points", "[UNK POINTS]").strip()
-        return number, description, pointvalue
+    stats_store.record(command_name, guild_id)
+
+# Scav and Shady Dealer corpora, parsed once and hot-reloaded when the CSVs change
+articles = Corpus(CSV_PATH, load_articles)
+scav_items = Corpus(SCAV_PATH, load_scav)
+# Quarter and break dates for /daysinquarter, hot-reloaded the same way
+academic_calendar = Corpus(CALENDAR_PATH, load_calendar)
+
+def get_random_article(author=None, keyword=None):
+    """Random (title, url, author) matching the filters, or None if nothing matches."""
+    article = articles.pick(author=author, keyword=keyword)
+    if article is None:
+        return None
+    return article.title, article.url, article.author
+
+def get_random_scav(year=None, min_points=None, max_points=None, keyword=None):
+    """Random (number, description, points) matching the filters, or None if nothing matches."""
+    item = scav_items.pick(year=year, min_points=min_points, max_points=max_points, keyword=keyword)
+    if item is None:
+        return None
+    return item.number, item.description, item.points
 
 def get_safe_username(user):
     """
@@ -111,49 +96,43 @@ def get_safe_username(user):
         return user.name
     return display_name
 
-def days_in_quarter(tz_name="America/Chicago"):
-    tz  = pytz.timezone(tz_name)
-    now = datetime.now(tz)
-
-    def dt(y, m, d, hh=0, mm=0, ss=0):
-        return tz.localize(datetime(y, m, d, hh, mm, ss))
-
-    # Build candidate quarters across adjacent years
-    candidates = []
-    for y in (now.year - 1, now.year, now.year + 1):
-        candidates.append(("Summer", dt(y, 6, 16), dt(y, 9, 12, 23, 59, 59)))
-        candidates.append(("Autumn", dt(y, 9, 29), dt(y, 12, 13, 23, 59, 59)))
-        candidates.append(("Winter", dt(y, 1, 5), dt(y, 3, 14, 23, 59, 59)))
-        candidates.append(("Spring", dt(y, 3, 23), dt(y, 6, 6, 23, 59, 59)))
-
-    # Check if we're inside a quarter
-    for quarter_name, start, end in candidates:
-        if start <= now <= end:
-            delta = end - now
-            days = delta.days
-            rem_seconds = delta.seconds
-            hours = rem_seconds // 3600
-            rem_seconds %= 3600
-            minutes = rem_seconds // 60
-            seconds = rem_seconds % 60
-
-            daysspent = (now - start).days + 1
-
-            return (
-                f"**DAY NUMBER {daysspent} OF {quarter_name.upper()}!! 🔔** "
-                f"There are {days} days, {hours} hours, {minutes} minutes, and {seconds} seconds remaining in {quarter_name}.\n\n"
-                f"https://vps.dariel.us/uchiverify/images/{daysspent}.png"
-            )
+# Public URL prefix under which the bot's /countdown route is reachable
+COUNTDOWN_BASE_URL = os.getenv("COUNTDOWN_BASE_URL", "https://vps.dariel.us/uchiverify")
 
-    # Otherwise, we're on break — find the next quarter
-    future_starts = sorted(
-        [(start, name) for name, start, end in candidates if start > now],
-        key=lambda x: x[0]
-    )
-    next_start, next_name = future_starts[0]
+def countdown_image_url(day):
+    """Link to the compact (720px WebP) countdown image for a day number."""
+    return f"{COUNTDOWN_BASE_URL}/countdown/{day}.webp?w=720"
+
+# Countdown images, rendered on demand and kept in a bounded disk cache
+countdown_images = CountdownImages(
+    cache_dir=os.getenv("COUNTDOWN_CACHE_DIR", "countdown_cache"),
+    max_bytes=int(os.getenv("COUNTDOWN_CACHE_MB", "64")) * 1024 * 1024,
+    workers=int(os.getenv("COUNTDOWN_WORKERS", "2")),
+    # Only the process serving /countdown benefits from pre-rendering
+    prewarm=3 if IS_PRIMARY else 0,
+)
 
-    days_until = (next_start - now).days
-    return f"We are on break sailors! {next_name} quarter begins in {days_until} days."
+def format_remaining(delta):
+    """(days, hours, minutes, seconds) in a timedelta."""
+    hours, rem_seconds = divmod(delta.seconds, 3600)
+    minutes, seconds = divmod(rem_seconds, 60)
+    return delta.days, hours, minutes, seconds
+
+def days_in_quarter():
+    position = academic_calendar.index.lookup()
+    if position is None:
+        return "The academic calendar doesn't cover today yet."
+    if position.period.is_break:
+        next_quarter = position.next_quarter
+        return f"We are on break sailors! {next_quarter.name} quarter begins in {position.remaining.days} days."
+
+    quarter_name = position.period.name
+    days, hours, minutes, seconds = format_remaining(position.remaining)
+    return (
+        f"**DAY NUMBER {position.day} OF {quarter_name.upper()}!! 🔔** "
+        f"There are {days} days, {hours} hours, {minutes} minutes, and {seconds} seconds remaining in {quarter_name}.\n\n"
+        f"{countdown_image_url(position.day)}"
+    )
 
 # ── Health endpoint ───────────────────────────────────────────────────────────
 routes = web.RouteTableDef()
@@ -174,356 +153,218 @@ def check_admin_password(request):
 
 @routes.get("/bothealth")
 async def health(request):
-    # you could add deeper checks here if you like
-    return web.json_response({"status": "ok"}, status=200)
-
-@routes.get("/admin")
-async def admin_servers(request):
-    """Password-protected page showing all servers the bot is in and usage stats."""
-    # Check authentication
-    if not check_admin_password(request):
-        return web.Response(
-            text="Access denied",
-            status=401,
-            headers={'WWW-Authenticate': 'Basic realm="UChiVerify Admin"'}
-        )
-
-    # Get all guilds the bot is in
+    if cluster_status is None:
+        return web.json_response({"status": "ok"}, status=200)
+    # Cluster mode: merge what every process last reported about its shards
+    shards = await asyncio.to_thread(cluster_status.shards)
+    up = sum(1 for shard in shards if shard['up'])
+    expected = SHARD_COUNT or len(shards)
+    return web.json_response({
+        "status": "ok" if up >= expected else "degraded",
+        "shards_up": up,
+        "shards": expected,
+    }, status=200)
+
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@routes.get("/metrics")
+async def metrics(request):
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return web.Response(status=401, text="Unauthorized")
+    return web.Response(body=render_metrics().encode(), headers={
+        "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+        "Cache-Control": "no-store",
+    })
+
+async def collect_dashboard():
+    """Gather everything the admin dashboard template needs."""
+    # Get all guilds the bot is in (owner names come from cache; misses resolve in the background)
     guilds_info = []
-    for guild in bot.guilds:
-        try:
-            owner = await guild.fetch_member(guild.owner_id) if guild.owner_id else None
-            if owner:
-                # Get the username (not display_name)
-                owner_name = f"@{owner.name}"
-                if owner.discriminator != "0":  # Legacy username
-                    owner_name = f"{owner.name}#{owner.discriminator}"
-            else:
-                owner_name = "Unknown"
-        except:
-            owner_name = f"Unknown (ID: {guild.owner_id})"
+    if cluster_status is not None:
+        # Cluster mode: every process's guilds, as last published to the status file
+        for guild_id, name, owner, member_count in await asyncio.to_thread(cluster_status.guilds):
+            guilds_info.append({'name': name, 'id': int(guild_id), 'owner': owner, 'member_count': member_count or 0})
+    for guild in bot.guilds if cluster_status is None else ():
+        owner_name = owner_cache.get(guild) or f"Resolving… (ID: {guild.owner_id})"
 
         guilds_info.append({
             'name': guild.name,
             'id': guild.id,
             'owner': owner_name,
-            'member_count': guild.member_count
+            'member_count': guild.member_count or 0  # None until the guild is fully loaded
         })
 
     # Sort by member count descending
     guilds_info.sort(key=lambda x: x['member_count'], reverse=True)
 
-    # Load command statistics
-    stats = load_stats()
-    total_commands = sum(stats["commands"].values())
-
-    # Prepare per-server stats
-    servers_data = stats.get("servers", {})
+    # Query command statistics from the stats backend (off the event loop)
+    command_totals = await asyncio.to_thread(stats_store.command_totals)
+    top_commands = await asyncio.to_thread(stats_store.top_commands, 10)
+    guild_summaries = await asyncio.to_thread(stats_store.guild_summaries)
+    daily_totals = await asyncio.to_thread(stats_store.daily_totals, 30)
 
     # Add command stats to each guild info
     for guild in guilds_info:
-        guild_id_str = str(guild['id'])
-        if guild_id_str in servers_data:
-            guild['total_commands'] = sum(servers_data[guild_id_str].get("commands", {}).values())
-            guild['top_command'] = max(servers_data[guild_id_str].get("commands", {}).items(),
-                                      key=lambda x: x[1], default=("None", 0))
-        else:
-            guild['total_commands'] = 0
-            guild['top_command'] = ("None", 0)
-
-    # Prepare daily stats for graph (last 30 days)
-    from collections import defaultdict
-    daily_totals = defaultdict(int)
-
-    for guild_id, guild_data in servers_data.items():
-        for date, commands in guild_data.get("daily", {}).items():
-            daily_totals[date] += sum(commands.values())
-
-    # Sort by date and get last 30 days
-    sorted_dates = sorted(daily_totals.keys())[-30:]
-    dates_json = json.dumps(sorted_dates)
-    counts_json = json.dumps([daily_totals[date] for date in sorted_dates])
-
-    # Generate HTML
-    html = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Server List | UChiVerify Admin</title>
-        <style>
-            @font-face {
-                font-family: 'Gotham';
-                src: url("https://vps.dariel.us/uchiverify/static/fonts/Gotham/Gotham-Book.otf") format("opentype");
-                font-weight: normal;
-                font-style: normal;
-            }
-            @font-face {
-                font-family: 'Gotham Bold';
-                src: url("https://vps.dariel.us/uchiverify/static/fonts/Gotham/Gotham-Bold.otf") format("opentype");
-                font-weight: bold;
-                font-style: normal;
-            }
-            body {
-                font-family: 'Gotham', Arial, sans-serif;
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-                margin: 0;
-                padding: 20px;
-            }
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                background-color: #2a2a2a;
-                border: 1px solid #444;
-                padding: 30px;
-                border-radius: 12px;
-                box-shadow: 0 6px 10px rgba(0,0,0,0.6);
-            }
-            h1 {
-                font-family: 'Gotham Bold', Arial, sans-serif;
-                color: #800000;
-                margin-bottom: 10px;
-                font-size: 2rem;
-            }
-            .stats {
-                font-size: 1rem;
-                color: #999;
-                margin-bottom: 30px;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 20px;
-            }
-            th {
-                background-color: #800000;
-                color: white;
-                padding: 12px;
-                text-align: left;
-                font-family: 'Gotham Bold', Arial, sans-serif;
-            }
-            td {
-                padding: 12px;
-                border-bottom: 1px solid #444;
-            }
-            tr:hover {
-                background-color: #333;
-            }
-            .server-name {
-                font-weight: bold;
-                color: #fff;
-            }
-            .server-id {
-                color: #999;
-                font-size: 0.9em;
-            }
-            .member-count {
-                color: #4CAF50;
-                font-weight: bold;
-            }
-            h2 {
-                font-family: 'Gotham Bold', Arial, sans-serif;
-                color: #800000;
-                margin-top: 40px;
-                margin-bottom: 15px;
-                font-size: 1.5rem;
-                border-bottom: 2px solid #800000;
-                padding-bottom: 10px;
-            }
-            .stats-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-                margin-bottom: 30px;
-            }
-            .stat-box {
-                background-color: #333;
-                padding: 15px;
-                border-radius: 8px;
-                border-left: 4px solid #800000;
-            }
-            .stat-label {
-                color: #999;
-                font-size: 0.9em;
-                margin-bottom: 5px;
-            }
-            .stat-value {
-                color: #fff;
-                font-size: 1.5em;
-                font-weight: bold;
-            }
-            .command-name {
-                color: #4CAF50;
-                font-family: monospace;
-            }
-            .chart-container {
-                background-color: #333;
-                padding: 20px;
-                border-radius: 8px;
-                margin-bottom: 30px;
-            }
-            canvas {
-                max-height: 400px;
-            }
-        </style>
-        <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
-    </head>
-    <body>
-        <div class="container">
-            <h1>UChiVerify Admin Dashboard</h1>
-
-            <div class="stats-grid">
-                <div class="stat-box">
-                    <div class="stat-label">Total Servers</div>
-                    <div class="stat-value">""" + str(len(guilds_info)) + """</div>
-                </div>
-                <div class="stat-box">
-                    <div class="stat-label">Total Members</div>
-                    <div class="stat-value">""" + f"{sum(g['member_count'] for g in guilds_info):,}" + """</div>
-                </div>
-                <div class="stat-box">
-                    <div class="stat-label">Commands Executed</div>
-                    <div class="stat-value">""" + f"{total_commands:,}" + """</div>
-                </div>
-            </div>
-
-            <h2>Top Commands</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Command</th>
-                        <th>Usage Count</th>
-                    </tr>
-                </thead>
-                <tbody>
-    """
+        total, top_name, top_count = guild_summaries.get(str(guild['id']), (0, "None", 0))
+        guild['total_commands'] = total
+        guild['top_command'] = (top_name, top_count)
+
+    return {
+        'guilds': guilds_info,
+        'total_members': sum(g['member_count'] for g in guilds_info),
+        'total_commands': sum(command_totals.values()),
+        'top_commands': top_commands,
+        # Daily stats for graph (last 30 days with activity)
+        'dates': [date for date, _ in daily_totals],
+        'counts': [count for _, count in daily_totals],
+    }
+
+# Pre-rendered admin page, rebuilt in the background when stats change
+dashboard = DashboardCache(
+    "admin.html",
+    collect_dashboard,
+    version=lambda: stats_store.version,
+    max_age=float(os.getenv("ADMIN_SNAPSHOT_MAX_AGE", "60")),
+)
 
-    # Add top commands
-    sorted_commands = sorted(stats["commands"].items(), key=lambda x: x[1], reverse=True)[:10]
-    for cmd_name, count in sorted_commands:
-        html += f"""
-                    <tr>
-                        <td class="command-name">/{cmd_name}</td>
-                        <td class="member-count">{count:,}</td>
-                    </tr>
-        """
-
-    html += """
-                </tbody>
-            </table>
-
-            <h2>Daily Command Usage (Last 30 Days)</h2>
-            <div class="chart-container">
-                <canvas id="dailyChart"></canvas>
-            </div>
-
-            <h2>Server List</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Server Name</th>
-                        <th>Server ID</th>
-                        <th>Owner</th>
-                        <th>Members</th>
-                        <th>Commands Used</th>
-                        <th>Top Command</th>
-                    </tr>
-                </thead>
-                <tbody>
-    """
+@routes.get("/admin")
+async def admin_servers(request):
+    """Password-protected page showing all servers the bot is in and usage stats."""
+    # Check authentication
+    if not check_admin_password(request):
+        return web.Response(
+            text="Access denied",
+            status=401,
+            headers={'WWW-Authenticate': 'Basic realm="UChiVerify Admin"'}
+        )
 
-    for guild in guilds_info:
-        top_cmd_name, top_cmd_count = guild['top_command']
-        html += f"""
-                    <tr>
-                        <td class="server-name">{guild['name']}</td>
-                        <td class="server-id">{guild['id']}</td>
-                        <td>{guild['owner']}</td>
-                        <td class="member-count">{guild['member_count']:,}</td>
-                        <td class="member-count">{guild['total_commands']:,}</td>
-                        <td class="command-name">/{top_cmd_name} ({top_cmd_count})</td>
-                    </tr>
-        """
-
-    html += """
-                </tbody>
-            </table>
-        </div>
-
-        <script>
-            const ctx = document.getElementById('dailyChart');
-            new Chart(ctx, {
-                type: 'line',
-                data: {
-                    labels: """ + dates_json + """,
-                    datasets: [{
-                        label: 'Commands Executed',
-                        data: """ + counts_json + """,
-                        borderColor: '#800000',
-                        backgroundColor: 'rgba(128, 0, 0, 0.1)',
-                        tension: 0.3,
-                        fill: true
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    plugins: {
-                        legend: {
-                            labels: {
-                                color: '#e0e0e0',
-                                font: {
-                                    family: 'Gotham'
-                                }
-                            }
-                        }
-                    },
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            ticks: {
-                                color: '#e0e0e0',
-                                font: {
-                                    family: 'Gotham'
-                                }
-                            },
-                            grid: {
-                                color: '#444'
-                            }
-                        },
-                        x: {
-                            ticks: {
-                                color: '#e0e0e0',
-                                font: {
-                                    family: 'Gotham'
-                                }
-                            },
-                            grid: {
-                                color: '#444'
-                            }
-                        }
-                    }
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """
+    snapshot = await dashboard.get()
+    headers = {'ETag': snapshot.etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request.headers.get('If-None-Match'), snapshot.etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=snapshot.body, content_type='text/html', charset='utf-8', headers=headers)
+
+def require_admin(handler):
+    """Wrap an aiohttp handler so it answers 401 unless the admin password was given."""
+    async def wrapper(request):
+        if not check_admin_password(request):
+            return web.Response(
+                text="Access denied",
+                status=401,
+                headers={'WWW-Authenticate': 'Basic realm="UChiVerify Admin"'}
+            )
+        try:
+            return await handler(request)
+        except BadRequest as e:
+            return json_response(request, {"error": str(e)}, status=400)
+    return wrapper
+
+def page_params(request, default_sort, default_order="desc"):
+    return {
+        "sort": request.query.get("sort", default_sort),
+        "order": request.query.get("order", default_order),
+        "cursor": request.query.get("cursor"),
+        "limit": int_param(request, "limit", 100, minimum=1, maximum=MAX_LIMIT),
+    }
+
+@routes.get("/admin/api/servers")
+@require_admin
+async def api_servers(request):
+    """Guilds with member counts and usage, filterable by min/max members and min commands."""
+    min_members = int_param(request, "min_members")
+    max_members = int_param(request, "max_members")
+    min_commands = int_param(request, "min_commands")
+
+    snapshot = await dashboard.get()
+    rows = []
+    for guild in snapshot.context['guilds']:
+        members = guild['member_count']
+        if min_members is not None and members < min_members:
+            continue
+        if max_members is not None and members > max_members:
+            continue
+        if min_commands is not None and guild['total_commands'] < min_commands:
+            continue
+        top_name, top_count = guild['top_command']
+        rows.append({
+            'id': str(guild['id']),
+            'name': guild['name'],
+            'owner': guild['owner'],
+            'member_count': members,
+            'total_commands': guild['total_commands'],
+            'top_command': {'name': top_name, 'count': top_count},
+        })
 
-    return web.Response(text=html, content_type='text/html')
+    page, next_cursor = paginate(rows, ('member_count', 'total_commands', 'name', 'id'),
+                                 **page_params(request, 'member_count'))
+    return json_response(request, {'servers': page, 'total': len(rows), 'next_cursor': next_cursor})
+
+@routes.get("/admin/api/commands")
+@require_admin
+async def api_commands(request):
+    """Global usage count per command."""
+    command_totals = await asyncio.to_thread(stats_store.command_totals)
+    rows = [{'name': name, 'count': count} for name, count in command_totals.items()]
+    page, next_cursor = paginate(rows, ('count', 'name'), id_field='name',
+                                 **page_params(request, 'count'))
+    return json_response(request, {'commands': page, 'total': len(rows), 'next_cursor': next_cursor})
+
+@routes.get("/admin/api/discord")
+@require_admin
+async def api_discord(request):
+    """Counters from the rate-limit-aware Discord REST client."""
+    return json_response(request, {'rest': discord_rest.stats()})
+
+@routes.get("/admin/api/cluster")
+@require_admin
+async def api_cluster(request):
+    """Status of every shard: from all processes in cluster mode, else from this one."""
+    if cluster_status is not None:
+        shards = await asyncio.to_thread(cluster_status.shards)
+    else:
+        shards = [{'shard_id': shard_id, 'cluster_id': CLUSTER_ID, 'pid': os.getpid(), 'latency': latency,
+                   'guilds': guild_count, 'members': members, 'up': not is_closed}
+                  for shard_id, latency, is_closed, guild_count, members in shard_status()]
+    return json_response(request, {'cluster_mode': cluster_status is not None, 'shards': shards})
+
+@routes.get("/admin/api/loop")
+@require_admin
+async def api_loop(request):
+    """Event loop blocks caught by the watchdog (enabled with LOOP_WATCHDOG_MS)."""
+    if loop_watchdog is None:
+        return json_response(request, {'enabled': False})
+    return json_response(request, {'enabled': True, **loop_watchdog.snapshot()})
+
+@routes.get("/admin/api/daily")
+@require_admin
+async def api_daily(request):
+    """Commands per day for the most recent `days` days with activity."""
+    days = int_param(request, "days", 30, minimum=1, maximum=3660)
+    daily_totals = await asyncio.to_thread(stats_store.daily_totals, days)
+    rows = [{'date': date, 'count': count} for date, count in daily_totals]
+    page, next_cursor = paginate(rows, ('date', 'count'), id_field='date',
+                                 **page_params(request, 'date', default_order='asc'))
+    return json_response(request, {'daily': page, 'total': len(rows), 'next_cursor': next_cursor})
+
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8765"))
 
 async def start_health_server():
     app = web.Application()
     app.add_routes(routes)
+    countdown_images.add_routes(app)
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", 8765)
+    site = web.TCPSite(runner, WEB_HOST, WEB_PORT)
     await site.start()
-    print("🌐 Web server running at http://0.0.0.0:8765/")
-    print("   - Health endpoint: http://0.0.0.0:8765/bothealth")
-    print("   - Admin panel: http://0.0.0.0:8765/admin")
+    base = f"http://{WEB_HOST}:{WEB_PORT}"
+    print(f"🌐 Web server running at {base}/")
+    print(f"   - Health endpoint: {base}/bothealth")
+    print(f"   - Metrics: {base}/metrics")
+    print(f"   - Admin panel: {base}/admin")
+    print(f"   - Admin API: {base}/admin/api/{{servers,commands,daily,discord,cluster,loop}}")
+    print(f"   - Countdown images: {base}/countdown/{{day}}")
 
 # Logging configuration: logs to file and console
 logging.basicConfig(
@@ -536,7 +377,108 @@ logging.basicConfig(
 intents = discord.Intents.default()
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)  # prefix not used for slash, but required by Bot
+# Per-source timeouts for outbound HTTP so one slow upstream can't hold a command forever
+SOURCE_TIMEOUTS = {
+    "cataas": ClientTimeout(total=15, connect=5),
+    "blueprint": ClientTimeout(total=8, connect=3),
+    "uchicago_events": ClientTimeout(total=8, connect=3),
+    "hydepark": ClientTimeout(total=10, connect=3),
+    "discord": ClientTimeout(total=10, connect=3),
+}
+DEFAULT_TIMEOUT = ClientTimeout(total=10, connect=3)
+
+# Local pool of cat base images for /finalsmotivation captions
+cat_pool = CatPool(
+    os.getenv("CAT_POOL_DIR", "catpool"),
+    size=int(os.getenv("CAT_POOL_SIZE", "30")),
+    timeout=SOURCE_TIMEOUTS["cataas"],
+    workers=int(os.getenv("CAT_CAPTION_WORKERS", "1")),
+)
+
+# Discord REST calls made outside discord.py share rate-limit buckets with app.py through this file
+discord_rest = AsyncDiscordREST(
+    os.getenv("DISCORD_BOT_TOKEN"),
+    RateLimitState(os.getenv("DISCORD_RATELIMIT_PATH", "discord_ratelimits.db")),
+    timeout=SOURCE_TIMEOUTS["discord"],
+)
+
+# Remote fallback for /finalsmotivation captions while the local pool is empty
+CATAAS_SAYS_URL = "https://cataas.com/cat/cute/says/{text}"
+
+# Guild owner names for the admin dashboard
+owner_cache = OwnerCache(discord_rest, ttl=int(os.getenv("OWNER_CACHE_TTL", "3600")))
+
+# Events for /thingstodo, refreshed in the background every EVENTS_TTL seconds
+event_cache = EventCache(ttl=int(os.getenv("EVENTS_TTL", "600")), timeouts=SOURCE_TIMEOUTS)
+
+class UChiVerifyBot(commands.AutoShardedBot):
+    """Bot that owns one pooled aiohttp session for all outbound HTTP."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.http_session = None
+        self.cluster_status_task = None  # publish_cluster_status(), in cluster mode
+
+    async def setup_hook(self):
+        connector = aiohttp.TCPConnector(
+            limit=64,               # total simultaneous connections
+            limit_per_host=8,       # don't hammer any single upstream
+            ttl_dns_cache=300,      # cache DNS lookups for 5 minutes
+            keepalive_timeout=60,   # reuse TCP/TLS connections between commands
+        )
+        self.http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=DEFAULT_TIMEOUT,
+            headers={"User-Agent": "UChiVerify (+https://uchiverify.dariel.us/)"},
+        )
+        discord_rest.session = self.http_session
+
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        if cluster_status is None:
+            return await super().before_identify_hook(shard_id, initial=initial)
+        # Processes take turns through the shared file so the whole cluster respects the identify limit
+        bucket = (shard_id or 0) % IDENTIFY_CONCURRENCY
+        while (delay := await asyncio.to_thread(cluster_status.identify_delay, bucket)) > 0:
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        await super().close()
+        if self.http_session is not None:
+            await self.http_session.close()
+
+bot = UChiVerifyBot(  # prefix not used for slash, but required by Bot
+    command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS
+)
+
+# Read at scrape time for /metrics (gateway latency is NaN, and skipped, until connected)
+Gauge("uchiverify_gateway_latency_seconds", "Discord gateway heartbeat latency.", function=lambda: bot.latency)
+Gauge("uchiverify_guilds", "Guilds the bot is a member of (in this process).", function=lambda: len(bot.guilds))
+Gauge("uchiverify_shard_latency_seconds", "Gateway heartbeat latency per shard.", ["shard"],
+      function=lambda: {(str(shard_id),): latency for shard_id, latency in bot.latencies})
+loop_lag_monitor = LoopLagMonitor()
+
+# Opt-in: log (with a stack) anything that blocks the event loop longer than this many ms
+LOOP_WATCHDOG_MS = float(os.getenv("LOOP_WATCHDOG_MS", "0"))
+loop_watchdog = LoopWatchdog(threshold=LOOP_WATCHDOG_MS / 1000) if LOOP_WATCHDOG_MS > 0 else None
+
+async def fetch(source: str, url: str, kind: str = "json"):
+    """GET url through the bot's shared session, using the timeout configured for source."""
+    timeout = SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT)
+    start = time.perf_counter()
+    try:
+        async with bot.http_session.get(url, timeout=timeout) as response:
+            response.raise_for_status()
+            if kind == "json":
+                data = await response.json(content_type=None)
+            elif kind == "text":
+                data = await response.text()
+            else:
+                data = await response.read()
+    except Exception as e:
+        observe_upstream(source, time.perf_counter() - start, e)
+        raise
+    observe_upstream(source, time.perf_counter() - start)
+    return data
 
 # Define a View with a Button for verification
 class VerifyView(discord.ui.View):
@@ -607,6 +549,7 @@ class SetChannelModal(discord.ui.Modal, title="Customize Verification Message"):
         track_command("setchannel", interaction.guild.id if interaction.guild else None)
 
 @bot.tree.command(name="setchannel", description="Post UChicago verification message in this channel (admins only)")
+@timed_command("setchannel")
 async def setchannel(interaction: discord.Interaction):
     """Slash command to initialize verification in the current channel (admin only)."""
     # Check that the user has administrator permission
@@ -619,6 +562,7 @@ async def setchannel(interaction: discord.Interaction):
     await interaction.response.send_modal(modal)
 
 @bot.tree.command(name="gethelp", description="Get a link to the support Discord server.")
+@timed_command("gethelp")
 async def support(interaction: discord.Interaction):
     """Slash command to send a private message with the support server link."""
     support_link = "https://discord.gg/syNk2wNp2x" 
@@ -634,8 +578,17 @@ async def support(interaction: discord.Interaction):
     track_command("gethelp", interaction.guild.id if interaction.guild else None)
 
 @bot.tree.command(name="shadydealer", description="Get a random article title from the Shady Dealer.")
-async def random_article(interaction: discord.Interaction):
-    title, url, author = get_random_article()
+@app_commands.describe(
+    author="Only articles by this author (partial names work)",
+    keyword="Only articles whose title contains these words"
+)
+@timed_command("shadydealer")
+async def random_article(interaction: discord.Interaction, author: str = None, keyword: str = None):
+    result = get_random_article(author=author, keyword=keyword)
+    if result is None:
+        await interaction.response.send_message("No Shady Dealer articles match those filters.", ephemeral=True)
+        return
+    title, url, author = result
 
     embed = discord.Embed(
         title=title,
@@ -655,52 +608,21 @@ async def random_article(interaction: discord.Interaction):
     name="daysinquarter",
     description="Use this command if you're wondering how long the rest of your journey will be this quarter."
 )
+@timed_command("daysinquarter")
 async def daysinquarter(interaction: discord.Interaction):
-    tz = pytz.timezone("America/Chicago")
-    now = datetime.now(tz)
-
-    def dt(y, m, d, hh=0, mm=0, ss=0):
-        return tz.localize(datetime(y, m, d, hh, mm, ss))
-
-    # Define quarter windows (check surrounding years)
-    quarters = []
-    for y in (now.year - 1, now.year, now.year + 1):
-        quarters.extend([
-            ("Summer quarter", dt(y, 6, 16), dt(y, 9, 12, 23, 59, 59)),
-            ("Autumn quarter", dt(y, 9, 29), dt(y, 12, 13, 23, 59, 59)),
-            ("Winter quarter", dt(y, 1, 5),  dt(y, 3, 14, 23, 59, 59)),
-            ("Spring quarter", dt(y, 3, 23), dt(y, 6, 6, 23, 59, 59)),
-        ])
-
-    # Try to find current quarter
-    current = None
-    for qname, start, end in quarters:
-        if start <= now <= end:
-            current = (qname, start, end)
-            break
-
-    # If not in a quarter, treat break as a "quarter"
-    if current is None:
-        # find the surrounding break window: end of last quarter → start of next quarter
-        past_ends = [(end, qname) for qname, start, end in quarters if end < now]
-        future_starts = [(start, qname) for qname, start, end in quarters if start > now]
-
-        last_end, _ = max(past_ends, key=lambda x: x[0])
-        next_start, _ = min(future_starts, key=lambda x: x[0])
-
-        current = ("Break", last_end, next_start)
-
-    quarter_name, start_date, end_date = current
-
-    delta = end_date - now
-    days = delta.days
-    rem_seconds = delta.seconds
-    hours = rem_seconds // 3600
-    rem_seconds %= 3600
-    minutes = rem_seconds // 60
-    seconds = rem_seconds % 60
-
-    daysspent = (now - start_date).days + 1
+    position = academic_calendar.index.lookup()
+    if position is None:
+        await interaction.response.send_message(
+            "The academic calendar doesn't cover today yet.", ephemeral=True
+        )
+        return
+
+    # Breaks are counted like a quarter: day N of the break, time until the next quarter
+    period = position.period
+    quarter_name = period.name if period.is_break else f"{period.name} quarter"
+    days, hours, minutes, seconds = format_remaining(position.remaining)
+    daysspent = position.day
+    countdown_images.prewarm(daysspent)
 
     embed = discord.Embed(
         title=f"DAY NUMBER {daysspent} OF {quarter_name.upper()}! 🔔",
@@ -708,10 +630,10 @@ async def daysinquarter(interaction: discord.Interaction):
             f"There are **{days} days, {hours} hours, "
             f"{minutes} minutes, and {seconds} seconds** remaining in {quarter_name}."
         ),
-        color=0x800000 if quarter_name != "Break" else 0x555555
+        color=0x555555 if period.is_break else 0x800000
     )
     embed.set_image(
-        url=f"https://vps.dariel.us/uchiverify/images/{daysspent}.png"
+        url=countdown_image_url(daysspent)
     )
 
     await interaction.response.send_message(
@@ -725,8 +647,25 @@ async def daysinquarter(interaction: discord.Interaction):
     track_command("daysinquarter", interaction.guild.id if interaction.guild else None)
 
 @bot.tree.command(name="scav", description="Get a random item from a Scav list (1998-2024)")
-async def random_scav(interaction: discord.Interaction):
-    number, description, pointvalue = get_random_scav()
+@app_commands.describe(
+    year="Only items from this year's list, e.g. 1998",
+    min_points="Only items worth at least this many points",
+    max_points="Only items worth at most this many points",
+    keyword="Only items whose description contains these words"
+)
+@timed_command("scav")
+async def random_scav(
+    interaction: discord.Interaction,
+    year: int = None,
+    min_points: float = None,
+    max_points: float = None,
+    keyword: str = None
+):
+    result = get_random_scav(year=year, min_points=min_points, max_points=max_points, keyword=keyword)
+    if result is None:
+        await interaction.response.send_message("No Scav items match those filters.", ephemeral=True)
+        return
+    number, description, pointvalue = result
 
     embed = discord.Embed(
         title=f"Item {number}",
@@ -743,9 +682,8 @@ async def random_scav(interaction: discord.Interaction):
     track_command("scav", interaction.guild.id if interaction.guild else None)
 
 @bot.tree.command(name="finalsmotivation", description="Get some finals motivation with a cute cat gif")
+@timed_command("finalsmotivation")
 async def finals_motivation(interaction: discord.Interaction):
-    await interaction.response.defer()
-
     username = get_safe_username(interaction.user)
 
     messages = [
@@ -772,23 +710,35 @@ async def finals_motivation(interaction: discord.Interaction):
 
     message_text = random.choice(messages)
 
-    # URL encode the message for the cat image
-    encoded_text = urllib.parse.quote(message_text)
-    cat_url = f"https://cataas.com/cat/cute/says/{encoded_text}"
+    # Caption a pooled cat locally; no third-party call in the request path
+    image_data = None
+    base_image = cat_pool.pick()
+    if base_image is not None:
+        try:
+            image_data = await cat_pool.caption(base_image, message_text)
+        except OSError as e:
+            logging.warning(f"Local caption render failed, using cataas: {e}")
 
-    # Download the image
-    response = requests.get(cat_url)
-    image_data = response.content
+    if image_data is not None:
+        filename = "motivation.jpg"
+        send = interaction.response.send_message
+    else:
+        # Pool still empty (e.g. just after first start): fall back to the remote API
+        await interaction.response.defer()
+        cat_url = CATAAS_SAYS_URL.format(text=urllib.parse.quote(message_text))
+        image_data = await fetch("cataas", cat_url, kind="bytes")
+        filename = "motivation.png"
+        send = interaction.followup.send
 
     # Create a Discord file from the image data
-    file = discord.File(fp=io.BytesIO(image_data), filename="motivation.png")
+    file = discord.File(fp=io.BytesIO(image_data), filename=filename)
 
     # Create embed with the uploaded image and motivational text as title
     embed = discord.Embed(title=message_text, color=0x800000)
-    embed.set_image(url="attachment://motivation.png")
+    embed.set_image(url=f"attachment://{filename}")
 
     # Ping the user above the embed
-    await interaction.followup.send(
+    await send(
         content=f"{interaction.user.mention}",
         embed=embed,
         file=file
@@ -841,162 +791,28 @@ class EventView(discord.ui.View):
     app_commands.Choice(name="Next 3 Days", value="3"),
     app_commands.Choice(name="Next 7 Days", value="7"),
 ])
+@timed_command("thingstodo")
 async def thingstodo(interaction: discord.Interaction, timeframe: app_commands.Choice[str] = None):
-    await interaction.response.defer()
-
-    events_combined = {}
-    now = datetime.now().astimezone()
-    cst = pytz.timezone("US/Central")
-    encoded_time = urllib.parse.quote(now.isoformat(), safe='')
-
     # Determine cutoff time based on timeframe
     if timeframe:
-        days = int(timeframe.value)
-        cutoff = now + timedelta(days=days)
+        cutoff = datetime.now().astimezone() + timedelta(days=int(timeframe.value))
     else:
         cutoff = None
 
-    # === Source 1: Blueprint ===
-    try:
-        url1 = (
-            f"https://blueprint.uchicago.edu/api/discovery/event/search?"
-            f"endsAfter={encoded_time}&orderByField=endsOn&orderByDirection=ascending&"
-            f"status=Approved&take=25&query="
-        )
-        r1 = requests.get(url1)
-        r1.raise_for_status()
-        data1 = r1.json()["value"]
-
-        for i, event in enumerate(data1):
-            name = event["name"]
-            event_url = f"https://blueprint.uchicago.edu/event/{event['id']}"
-            date = datetime.fromisoformat(event["startsOn"])
-
-            # Filter by timeframe if specified
-            if cutoff and date > cutoff:
-                continue
-
-            date_str = date.strftime("%A, %B %-d, %Y at %-I:%M %p")
-            desc = re.sub('<[^<]+?>', '', event["description"])[:150]
-            location = event["location"] or "TBA"
-
-            events_combined[f"bp_{i}"] = {
-                "name": name,
-                "url": event_url,
-                "date": date_str,
-                "date_obj": date,
-                "location": location,
-                "desc": desc,
-                "source": "Blueprint"
-            }
-    except Exception as e:
-        print("Blueprint error:", e)
-
-    # === Source 2: UChicago Events ===
-    try:
-        url2 = "https://events.uchicago.edu/live/json/events"
-        r2 = requests.get(url2)
-        r2.raise_for_status()
-        data2 = r2.json()["data"]
-
-        for i, event in enumerate(data2):
-            name = event["title"]
-            event_url = event["url"]
-            date_utc = datetime.strptime(event["date_utc"], "%Y-%m-%d %H:%M:%S")
-            date = date_utc.astimezone(cst)
-
-            # Filter by timeframe if specified
-            if cutoff and date > cutoff:
-                continue
-
-            date_str = date.strftime("%A, %B %-d, %Y at %-I:%M %p")
-            location = "Online" if event["is_online"] == 1 else "In-Person"
-
-            events_combined[f"uc_{i}"] = {
-                "name": name,
-                "url": event_url,
-                "date": date_str,
-                "date_obj": date,
-                "location": location,
-                "desc": "No description",  # description just repeats the URL
-                "source": "UChicago Events"
-            }
-    except Exception as e:
-        print("UChicago Events error:", e)
-
-    # === Source 3: Hyde Park (.ics) ===
-    try:
-        url3 = "https://welcometohydepark.com/events/list/?ical=1"
-        r3 = requests.get(url3)
-        r3.raise_for_status()
-
-        # Simple .ics parser (looking for VEVENT blocks)
-        ics_data = r3.text
-        events_text = ics_data.split("BEGIN:VEVENT")
-
-        for i, event_block in enumerate(events_text[1:]):  # Skip first split (header)
-            try:
-                # Extract fields
-                summary_match = re.search(r'SUMMARY:(.*?)(?:\r?\n)', event_block)
-                dtstart_match = re.search(r'DTSTART(?:;[^:]*)?:(.*?)(?:\r?\n)', event_block)
-                url_match = re.search(r'URL:(.*?)(?:\r?\n)', event_block)
-                location_match = re.search(r'LOCATION:(.*?)(?:\r?\n)', event_block)
-                description_match = re.search(r'DESCRIPTION:(.*?)(?:\r?\n)', event_block)
-
-                if not summary_match or not dtstart_match:
-                    continue
-
-                name = summary_match.group(1).strip()
-                dtstart_str = dtstart_match.group(1).strip()
-                event_url = url_match.group(1).strip() if url_match else "https://welcometohydepark.com/events/list/"
-                location = location_match.group(1).strip() if location_match else "TBA"
-                desc = description_match.group(1).strip()[:150] if description_match else "No description"
-
-                # Parse datetime (handle both formats: YYYYMMDD and YYYYMMDDTHHMMSS)
-                if 'T' in dtstart_str:
-                    date = datetime.strptime(dtstart_str.replace('Z', ''), "%Y%m%dT%H%M%S")
-                else:
-                    date = datetime.strptime(dtstart_str, "%Y%m%d")
-
-                # Localize to CST if naive
-                if date.tzinfo is None:
-                    date = cst.localize(date)
-                else:
-                    date = date.astimezone(cst)
-
-                # Skip past events
-                if date < now:
-                    continue
-
-                # Filter by timeframe if specified
-                if cutoff and date > cutoff:
-                    continue
-
-                date_str = date.strftime("%A, %B %-d, %Y at %-I:%M %p")
-
-                events_combined[f"hp_{i}"] = {
-                    "name": name,
-                    "url": event_url,
-                    "date": date_str,
-                    "date_obj": date,
-                    "location": location,
-                    "desc": desc,
-                    "source": "Hyde Park"
-                }
-            except Exception as event_error:
-                print(f"Hyde Park event parse error: {event_error}")
-                continue
-
-    except Exception as e:
-        print("Hyde Park error:", e)
+    # Answer from the background-refreshed cache; only a cold cache has to wait on the network
+    if not event_cache.loaded:
+        await interaction.response.defer()
+        await event_cache.wait_loaded()
+        send = interaction.followup.send
+    else:
+        send = interaction.response.send_message
 
-    if not events_combined:
-        await interaction.followup.send("❌ No events found at the moment.")
+    event = event_cache.pick(cutoff)
+    if event is None:
+        await send("❌ No events found at the moment.")
         return
 
-    # === Pick One and Format ===
-    event = random.choice(list(events_combined.values()))
-
+    # === Format ===
     embed = discord.Embed(
         title=event['name'],
         description=event['desc'],
@@ -1007,30 +823,98 @@ async def thingstodo(interaction: discord.Interaction, timeframe: app_commands.C
     embed.set_footer(text=f"Source: {event['source']}")
 
     view = EventView(event['url'])
-    await interaction.followup.send(embed=embed, view=view)
+    await send(embed=embed, view=view)
     logging.info(f"/thingstodo used by {interaction.user.id} in guild {interaction.guild.id} (channel {interaction.channel.id})")
     track_command("thingstodo", interaction.guild.id if interaction.guild else None)
 
+def shard_status():
+    """(shard_id, latency, is_closed, guild count, member count) for each shard in this process."""
+    counts = {}
+    for guild in bot.guilds:
+        guild_count, members = counts.get(guild.shard_id, (0, 0))
+        counts[guild.shard_id] = (guild_count + 1, members + (guild.member_count or 0))
+    rows = []
+    for shard_id, shard in bot.shards.items():
+        latency = shard.latency if math.isfinite(shard.latency) else None
+        rows.append((shard_id, latency, shard.is_closed(), *counts.get(shard_id, (0, 0))))
+    return rows
+
+async def publish_cluster_status():
+    """Report this process's shards and guilds to the cluster status file every few seconds."""
+    while True:
+        if bot.shards:  # nothing to report until the shards have launched
+            guilds = [
+                (guild.id, guild.shard_id, guild.name,
+                 owner_cache.get(guild) or f"Resolving… (ID: {guild.owner_id})", guild.member_count)
+                for guild in bot.guilds
+            ]
+            try:
+                await asyncio.to_thread(cluster_status.publish, CLUSTER_ID, shard_status(), guilds)
+            except Exception as e:
+                logging.error(f"Failed to publish cluster status: {e}")
+        await asyncio.sleep(CLUSTER_STATUS_INTERVAL)
+
 @bot.event
 async def on_ready():
+    # Warm the /thingstodo event cache and cat image pool (no-ops on reconnects)
+    event_cache.start(bot.http_session)
+    cat_pool.start(bot.http_session)
     # Sync slash commands with Discord (register globally)
     try:
-        await bot.tree.sync()
+        if IS_PRIMARY:  # commands are global: one sync per cluster is enough
+            await bot.tree.sync()
         bot.add_view(VerifyView())
         logging.info(f"Logged in as {bot.user}. Slash commands synced.")
     except Exception as e:
         logging.error(f"Failed to sync commands: {e}")
 
+@bot.event
+async def on_guild_update(before: discord.Guild, after: discord.Guild):
+    if before.owner_id != after.owner_id:
+        owner_cache.invalidate(after.id)
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    owner_cache.update_member(after)
+
+async def main(token):
+    # 1) spin up health server and background tasks
+    await start_health_server()
+    stats_store.start()
+    articles.start()
+    scav_items.start()
+    academic_calendar.start()
+    if IS_PRIMARY:
+        dashboard.start()
+    if cluster_status is not None:
+        bot.cluster_status_task = asyncio.create_task(publish_cluster_status())
+    loop_lag_monitor.start()
+    if loop_watchdog is not None:
+        loop_watchdog.start()
+    # docker stop and the cluster launcher send SIGTERM: close the bot so bot.start()
+    # returns and the final stats flush below still runs
+    loop = asyncio.get_running_loop()
+    closing = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: closing.append(asyncio.create_task(bot.close())))
+    # 2) then start Discord bot (this will block until shutdown)
+    try:
+        await bot.start(token)
+    finally:
+        if bot.cluster_status_task is not None:
+            bot.cluster_status_task.cancel()
+            try:
+                await bot.cluster_status_task
+            except asyncio.CancelledError:
+                pass
+        await stats_store.close()
+        countdown_images.close()
+        cat_pool.close()
+
 if __name__ == "__main__":
     TOKEN = os.getenv("DISCORD_BOT_TOKEN")
     if not TOKEN:
         logging.error("Discord bot token not set. Please export DISCORD_BOT_TOKEN.")
         exit(1)
 
-    async def main():
-        # 1) spin up health server
-        await start_health_server()
-        # 2) then start Discord bot (this will block until shutdown)
-        await bot.start(TOKEN)
-
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(TOKEN))
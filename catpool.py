@@ -0,0 +1,166 @@
+import io
+import os
+import time
+import random
+import logging
+import asyncio
+import multiprocessing
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from metrics import observe_upstream
+
+FONT_PATH = "static/fonts/Gotham/Gotham-Bold.otf"
+CAT_BASE_URL = "https://cataas.com/cat/cute?width=640"
+MAX_SIDE = 640
+
+
+@lru_cache(maxsize=16)
+def _font(size):
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+def _wrap(text, font, max_width):
+    """Greedy word wrap of text to lines no wider than max_width pixels."""
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and font.getlength(candidate) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def render_caption(base_path, text):
+    """Overlay text on the bottom of a base cat image; returns JPEG bytes."""
+    with Image.open(base_path) as image:
+        image = image.convert("RGB")
+    draw = ImageDraw.Draw(image)
+
+    # Gotham has no emoji glyphs; drop astral-plane characters instead of drawing boxes
+    text = "".join(ch for ch in text if ord(ch) <= 0xFFFF).strip()
+    size = max(18, image.width // 14)
+    font = _font(size)
+    stroke = max(2, size // 12)
+    lines = _wrap(text, font, image.width * 0.92)
+
+    line_height = int(size * 1.2)
+    y = image.height - line_height * len(lines) - size // 2
+    for line in lines:
+        x = (image.width - font.getlength(line)) / 2
+        draw.text((x, y), line, font=font, fill="white", stroke_width=stroke, stroke_fill="black")
+        y += line_height
+
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=80, optimize=True)
+    return out.getvalue()
+
+
+def _normalize(data, path):
+    """Validate downloaded image bytes and store them as a bounded-size JPEG."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+    image.thumbnail((MAX_SIDE, MAX_SIDE))
+    image.save(path, "JPEG", quality=90)
+
+
+class CatPool:
+    """
+    A bounded on-disk pool of cat base images for /finalsmotivation.
+
+    A background task fills the pool up to `size` images, then fetches a fresh
+    one every `rotate_interval` seconds, evicting the least recently used image
+    to stay within the bound. Use order is kept in memory and mirrored to file
+    mtimes so it survives restarts. Captions are drawn in a process pool:
+    Pillow holds the GIL while drawing text, so a thread would still stall the
+    event loop.
+    """
+
+    def __init__(self, directory, size=30, rotate_interval=1800, timeout=None, workers=1):
+        self.directory = directory
+        self.size = size
+        self.rotate_interval = rotate_interval
+        self.timeout = timeout
+        self.workers = workers
+        self._lru = OrderedDict()  # path -> None, least recently used first
+        self._task = None
+        self._pool = None
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jpg")]
+        for path in sorted(paths, key=os.path.getmtime):
+            self._lru[path] = None
+
+    def __len__(self):
+        return len(self._lru)
+
+    def pick(self):
+        """A random base image path (marked as recently used), or None if the pool is empty."""
+        if not self._lru:
+            return None
+        path = random.choice(list(self._lru))
+        self._lru.move_to_end(path)
+        return path
+
+    async def caption(self, path, text):
+        """Render text onto the pooled image at path in the process pool; returns JPEG bytes."""
+        if self._pool is None:
+            # Not fork: the bot process has threads (stats flusher, web server)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("forkserver"))
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._pool, render_caption, path, text)
+        # Record the use on disk so LRU order survives restarts
+        await asyncio.to_thread(os.utime, path)
+        return data
+
+    def _evict(self):
+        while len(self._lru) > self.size:
+            path, _ = self._lru.popitem(last=False)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def _add_one(self, session):
+        start = time.perf_counter()
+        try:
+            async with session.get(CAT_BASE_URL, timeout=self.timeout) as response:
+                response.raise_for_status()
+                data = await response.read()
+        except Exception as e:
+            observe_upstream("cataas", time.perf_counter() - start, e)
+            raise
+        observe_upstream("cataas", time.perf_counter() - start)
+        path = os.path.join(self.directory, f"{time.time_ns()}.jpg")
+        await asyncio.to_thread(_normalize, data, path)
+        self._lru[path] = None
+        self._evict()
+
+    async def _run(self, session):
+        while True:
+            try:
+                await self._add_one(session)
+            except Exception as e:
+                logging.warning(f"Cat pool refill failed: {e!r}")
+                await asyncio.sleep(60)
+                continue
+            # Fill quickly (but politely) until full, then rotate slowly.
+            await asyncio.sleep(2 if len(self._lru) < self.size else self.rotate_interval)
+
+    def start(self, session):
+        """Start filling and rotating the pool in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,286 @@
+"""
+Cluster mode: run the bot as several processes on one host, each handling a
+contiguous range of gateway shards.
+
+    python cluster.py --processes 4            # shard count recommended by Discord
+    python cluster.py --processes 4 --shards 16
+
+The launcher asks Discord for the recommended shard count and identify
+concurrency, splits the shards across processes and starts `bot.py` in each
+with SHARD_COUNT / SHARD_IDS / CLUSTER_ID set, restarting any that exit.
+Processes share state through local files:
+
+- command stats go to the SQLite stats backend (increments are additive, so
+  every process can flush into the same file);
+- each process publishes its shards' status and its guilds to
+  CLUSTER_STATUS_PATH, which cluster 0 (the only one serving the public web
+  server on WEB_PORT) merges for /bothealth and the admin pages;
+- gateway IDENTIFYs take turns through the same file so the processes
+  together respect Discord's identify rate limit.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import subprocess
+
+from sqlite_util import LocalConnection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id   INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    pid        INTEGER NOT NULL,
+    latency    REAL,               -- seconds; NULL until the first heartbeat
+    is_closed  INTEGER NOT NULL,
+    guilds     INTEGER NOT NULL,
+    members    INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id     TEXT PRIMARY KEY,
+    shard_id     INTEGER NOT NULL,
+    name         TEXT NOT NULL,
+    owner        TEXT,
+    member_count INTEGER,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_guilds_shard ON guilds (shard_id);
+CREATE TABLE IF NOT EXISTS identify (
+    bucket INTEGER PRIMARY KEY,    -- shard_id % max_concurrency
+    last   REAL NOT NULL
+);
+"""
+
+# Discord allows max_concurrency IDENTIFYs per this many seconds
+IDENTIFY_INTERVAL = 5.0
+
+
+class ClusterStatus:
+    """Shard status, guild lists and identify slots shared by the cluster's processes."""
+
+    def __init__(self, path, stale_after=60.0):
+        self.path = path
+        self.stale_after = stale_after
+        self._connect = LocalConnection(path)
+        self._connect().executescript(SCHEMA)
+
+    def reset(self):
+        """Forget every shard and guild (the launcher calls this before starting processes)."""
+        conn = self._connect()
+        conn.execute("DELETE FROM shards")
+        conn.execute("DELETE FROM guilds")
+
+    def publish(self, cluster_id, shards, guilds):
+        """
+        Replace this process's status. `shards` are (shard_id, latency, is_closed,
+        guild count, member count) and `guilds` are (guild_id, shard_id, name,
+        owner, member_count); guilds no longer listed for these shards are removed.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO shards (shard_id, cluster_id, pid, latency, is_closed, guilds, members, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (shard_id) DO UPDATE SET "
+                "cluster_id = excluded.cluster_id, pid = excluded.pid, latency = excluded.latency, "
+                "is_closed = excluded.is_closed, guilds = excluded.guilds, members = excluded.members, "
+                "updated_at = excluded.updated_at",
+                [(shard_id, cluster_id, os.getpid(), latency, int(is_closed), guild_count, members, now)
+                 for shard_id, latency, is_closed, guild_count, members in shards]
+            )
+            conn.executemany(
+                "INSERT INTO guilds (guild_id, shard_id, name, owner, member_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (guild_id) DO UPDATE SET shard_id = excluded.shard_id, "
+                "name = excluded.name, owner = excluded.owner, member_count = excluded.member_count, "
+                "updated_at = excluded.updated_at",
+                [(str(guild_id), shard_id, name, owner, member_count, now)
+                 for guild_id, shard_id, name, owner, member_count in guilds]
+            )
+            shard_ids = [shard[0] for shard in shards]
+            conn.execute(
+                f"DELETE FROM guilds WHERE shard_id IN ({','.join('?' * len(shard_ids))}) AND updated_at < ?",
+                (*shard_ids, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def shards(self):
+        """Every known shard, with `up` False if it is closed or hasn't reported recently."""
+        cutoff = time.time() - self.stale_after
+        rows = self._connect().execute(
+            "SELECT shard_id, cluster_id, pid, latency, is_closed, guilds, members, updated_at "
+            "FROM shards ORDER BY shard_id"
+        ).fetchall()
+        return [{
+            "shard_id": shard_id, "cluster_id": cluster_id, "pid": pid, "latency": latency,
+            "guilds": guild_count, "members": members, "updated_at": updated_at,
+            "up": not is_closed and updated_at >= cutoff,
+        } for shard_id, cluster_id, pid, latency, is_closed, guild_count, members, updated_at in rows]
+
+    def guilds(self):
+        """(guild_id, name, owner, member_count) for every guild in the cluster."""
+        return self._connect().execute(
+            "SELECT guild_id, name, owner, member_count FROM guilds"
+        ).fetchall()
+
+    def identify_delay(self, bucket, interval=IDENTIFY_INTERVAL):
+        """Claim the identify slot for bucket. Returns 0 if claimed, else seconds until it frees up."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last FROM identify WHERE bucket = ?", (bucket,)).fetchone()
+            if row is not None and now - row[0] < interval:
+                return row[0] + interval - now
+            conn.execute(
+                "INSERT INTO identify (bucket, last) VALUES (?, ?) "
+                "ON CONFLICT (bucket) DO UPDATE SET last = excluded.last",
+                (bucket, now)
+            )
+            return 0.0
+        finally:
+            conn.execute("COMMIT")
+
+
+def shard_ranges(shard_count, processes):
+    """Split shard IDs 0..shard_count-1 into `processes` contiguous, near-equal ranges."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for i in range(processes):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def recommended_sharding(token):
+    """(shard count, identify max_concurrency) from Discord's /gateway/bot."""
+    import requests
+    from discord_rest import API_BASE
+    response = requests.get(f"{API_BASE}/gateway/bot", headers={"Authorization": f"Bot {token}"},
+                            timeout=(3.05, 10))
+    response.raise_for_status()
+    data = response.json()
+    return data["shards"], data.get("session_start_limit", {}).get("max_concurrency", 1)
+
+
+class Launcher:
+    """
+    Starts one bot.py per shard range and restarts any that exit, with backoff.
+    On SIGTERM/SIGINT it stops the workers with SIGTERM, which bot.py handles by
+    closing the bot and flushing its buffered stats (see main() there), and
+    only kills a worker that hasn't exited after `stop_timeout` seconds.
+    """
+
+    def __init__(self, ranges, shard_count, env, base_port=8765, stop_timeout=30.0):
+        self.ranges = ranges
+        self.shard_count = shard_count
+        self.env = env
+        self.base_port = base_port
+        self.stop_timeout = stop_timeout
+        self.processes = {}   # cluster id -> Popen
+        self.restarts = {}    # cluster id -> consecutive quick exits
+        self.started_at = {}
+        self.stopping = False
+
+    def spawn(self, cluster_id):
+        env = dict(self.env,
+                   CLUSTER_ID=str(cluster_id),
+                   SHARD_COUNT=str(self.shard_count),
+                   SHARD_IDS=",".join(map(str, self.ranges[cluster_id])),
+                   # Cluster 0 serves the public web server; the rest only answer locally (e.g. /metrics)
+                   WEB_HOST=self.env.get("WEB_HOST", "0.0.0.0") if cluster_id == 0 else "127.0.0.1",
+                   WEB_PORT=str(self.base_port + cluster_id),
+                   CAT_POOL_DIR=os.path.join(self.env.get("CAT_POOL_DIR", "catpool"), str(cluster_id)))
+        self.processes[cluster_id] = subprocess.Popen([sys.executable, "bot.py"], env=env)
+        self.started_at[cluster_id] = time.monotonic()
+        logging.info(f"Started cluster {cluster_id} (pid {self.processes[cluster_id].pid}) "
+                     f"with shards {env['SHARD_IDS']}")
+
+    def _on_signal(self, *_):
+        self.stopping = True
+
+    def stop(self):
+        """Terminate every worker and wait for them to exit cleanly, killing any that take too long."""
+        self.stopping = True
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for cluster_id, process in self.processes.items():
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logging.error(f"Cluster {cluster_id} did not exit within {self.stop_timeout:.0f}s; killing it")
+                process.kill()
+                process.wait()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for cluster_id in range(len(self.ranges)):
+            self.spawn(cluster_id)
+        restart_at = {}
+        while not self.stopping:
+            time.sleep(1)
+            for cluster_id, process in self.processes.items():
+                if process.poll() is None or self.stopping:
+                    continue
+                if cluster_id not in restart_at:
+                    # Back off if it keeps dying soon after starting
+                    quick = time.monotonic() - self.started_at[cluster_id] < 60
+                    self.restarts[cluster_id] = self.restarts.get(cluster_id, 0) + 1 if quick else 0
+                    delay = min(60, 2 ** self.restarts[cluster_id])
+                    logging.error(f"Cluster {cluster_id} exited with {process.returncode}; restarting in {delay}s")
+                    restart_at[cluster_id] = time.monotonic() + delay
+                elif time.monotonic() >= restart_at[cluster_id]:
+                    del restart_at[cluster_id]
+                    self.spawn(cluster_id)
+        self.stop()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: [cluster] %(message)s")
+
+    parser = argparse.ArgumentParser(description="Run the bot as several sharded processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="bot processes to run")
+    parser.add_argument("--shards", type=int, help="total shard count (default: Discord's recommendation)")
+    args = parser.parse_args()
+
+    token = os.getenv("DISCORD_BOT_TOKEN")
+    if not token:
+        logging.error("Discord bot token not set. Please export DISCORD_BOT_TOKEN.")
+        sys.exit(1)
+    try:
+        recommended, max_concurrency = recommended_sharding(token)
+    except Exception as e:
+        if not args.shards:
+            raise
+        logging.warning(f"Could not fetch /gateway/bot ({e}); assuming identify concurrency 1")
+        recommended, max_concurrency = args.shards, 1
+    shard_count = args.shards or recommended
+    ranges = shard_ranges(shard_count, args.processes)
+    logging.info(f"{shard_count} shards across {len(ranges)} processes (identify concurrency {max_concurrency})")
+
+    env = dict(os.environ,
+               STATS_BACKEND="sqlite",
+               CLUSTER_STATUS_PATH=os.getenv("CLUSTER_STATUS_PATH", "cluster_status.db"),
+               IDENTIFY_CONCURRENCY=str(max_concurrency))
+    ClusterStatus(env["CLUSTER_STATUS_PATH"]).reset()
+
+    # Import command_stats.json once here rather than racing to do it in every process
+    from stats import SQLiteStatsStore
+    env.setdefault("STATS_DB_PATH", "command_stats.db")
+    if os.path.exists("command_stats.json") and SQLiteStatsStore(env["STATS_DB_PATH"]).import_json("command_stats.json"):
+        logging.info(f"Imported command_stats.json into {env['STATS_DB_PATH']}")
+
+    Launcher(ranges, shard_count, env, base_port=int(os.getenv("WEB_PORT", "8765"))).run()
@@ -0,0 +1,301 @@
+import os
+import re
+import sys
+import csv
+import random
+import logging
+import asyncio
+from array import array
+from typing import NamedTuple, Optional
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# A number, optionally a range ("1–8"), followed by "points" with at most one word
+# in between ("17 sexy points", "5 bonus points").
+POINTS_RE = re.compile(
+    r"(\d+(?:\.\d+)?)(?:\s*[-–—−]\s*(\d+(?:\.\d+)?))?\s*(?:[a-z]+\s+)?points?\b",
+    re.IGNORECASE
+)
+
+
+class ScavItem(NamedTuple):
+    number: str
+    description: str
+    points: str
+    year: Optional[int]
+    min_points: Optional[float]
+    max_points: Optional[float]
+
+
+class Article(NamedTuple):
+    title: str
+    url: str
+    author: str
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens of text (curly apostrophes are dropped)."""
+    return TOKEN_RE.findall(text.lower().replace("’", "").replace("'", ""))
+
+
+def parse_year(number):
+    """Hunt year from an item number such as '1998.01' or '2014(1).05'."""
+    match = re.match(r"(\d{4})", number)
+    return int(match.group(1)) if match else None
+
+
+def parse_points(points):
+    """(min, max) point value mentioned in the free-text Points column, or (None, None)."""
+    values = []
+    for low, high in POINTS_RE.findall(points):
+        values.append(float(low))
+        if high:
+            values.append(float(high))
+    if not values:
+        return None, None
+    return min(values), max(values)
+
+
+class TokenIndex:
+    """
+    Inverted index: token -> sorted row ids containing it. The tokens are kept
+    sorted and concatenated into one string and the row ids in one flat array,
+    so a corpus-sized index is a handful of objects rather than a dict entry,
+    a str and an array per token.
+    """
+
+    def __init__(self, texts):
+        postings = {}
+        rows = 0
+        for row_id, text in enumerate(texts):
+            rows = row_id + 1
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(row_id)
+        tokens = sorted(postings)
+        self.text = "".join(tokens)
+        self.bounds = array('I', [0])  # tokens[i] is text[bounds[i]:bounds[i + 1]]
+        self.offsets = array('I', [0])  # its row ids are ids[offsets[i]:offsets[i + 1]]
+        # Two bytes per posting while row ids fit (the scav list has ~7k rows)
+        self.ids = array('H' if rows <= 1 << 16 else 'I')
+        for token in tokens:
+            self.bounds.append(self.bounds[-1] + len(token))
+            self.ids.extend(postings[token])
+            self.offsets.append(len(self.ids))
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def _token(self, i):
+        return self.text[self.bounds[i]:self.bounds[i + 1]]
+
+    def get(self, token, default=()):
+        """Row ids containing token (an array slice), or default."""
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self._token(mid) < token:
+                low = mid + 1
+            else:
+                high = mid
+        if low == len(self) or self._token(low) != token:
+            return default
+        return self.ids[self.offsets[low]:self.offsets[low + 1]]
+
+
+def match_tokens(postings, keyword):
+    """Row ids containing every token of keyword, or None if keyword has no tokens."""
+    tokens = tokenize(keyword)
+    if not tokens:
+        return None
+    lists = sorted((postings.get(token, ()) for token in set(tokens)), key=len)
+    matches = set(lists[0])
+    for ids in lists[1:]:
+        if not matches:
+            break
+        matches.intersection_update(ids)
+    return matches
+
+
+class ScavIndex:
+    """
+    Scav items plus per-year and keyword indexes and parsed point ranges.
+    Items are stored column-wise (a tuple per text field, arrays for the
+    parsed numbers) and rebuilt as ScavItems only when picked.
+    """
+
+    def __init__(self, items):
+        self.numbers = tuple(item.number for item in items)
+        self.descriptions = tuple(item.description for item in items)
+        self.points = tuple(item.points for item in items)
+        nan = float("nan")  # no point value: compares false against any bound
+        self.min_points = array('d', (nan if item.min_points is None else item.min_points for item in items))
+        self.max_points = array('d', (nan if item.max_points is None else item.max_points for item in items))
+        self.years = tuple(item.year for item in items)
+        self.by_year = {}
+        for row_id, item in enumerate(items):
+            if item.year is not None:
+                self.by_year.setdefault(item.year, array('I')).append(row_id)
+        self.tokens = TokenIndex(self.descriptions)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, i):
+        low, high = self.min_points[i], self.max_points[i]
+        return ScavItem(
+            number=self.numbers[i],
+            description=self.descriptions[i],
+            points=self.points[i],
+            year=self.years[i],
+            min_points=None if low != low else low,
+            max_points=None if high != high else high,
+        )
+
+    def search(self, year=None, min_points=None, max_points=None, keyword=None):
+        """Ids of items matching every given filter (None means "all items")."""
+        candidates = None
+        if year is not None:
+            candidates = set(self.by_year.get(year, ()))
+        if keyword:
+            matches = match_tokens(self.tokens, keyword)
+            if matches is not None:
+                candidates = matches if candidates is None else candidates & matches
+        if min_points is None and max_points is None:
+            return candidates
+
+        low = float("-inf") if min_points is None else min_points
+        high = float("inf") if max_points is None else max_points
+        mins, maxes = self.min_points, self.max_points
+        ids = range(len(self)) if candidates is None else candidates
+        # An item matches if any of its possible point values falls inside [low, high]
+        return {i for i in ids if mins[i] <= high and maxes[i] >= low}
+
+    def pick(self, **filters):
+        """A random item matching filters, or None."""
+        ids = self.search(**filters)
+        if ids is None:
+            return random.choice(self) if len(self) else None
+        return self[random.choice(tuple(ids))] if ids else None
+
+
+class ArticleIndex:
+    """Shady Dealer articles plus author and title keyword indexes."""
+
+    def __init__(self, items):
+        self.items = items
+        self.by_author = {}
+        for row_id, article in enumerate(items):
+            self.by_author.setdefault(article.author.casefold(), array('I')).append(row_id)
+        self.tokens = TokenIndex(article.title for article in items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, author=None, keyword=None):
+        """Ids of articles matching every given filter (None means "all articles")."""
+        candidates = None
+        if author:
+            # Partial, case-insensitive author match ("felsen" finds "Jake Felsen")
+            needle = author.casefold().strip()
+            candidates = set()
+            for name, ids in self.by_author.items():
+                if needle in name:
+                    candidates.update(ids)
+        if keyword:
+            matches = match_tokens(self.tokens, keyword)
+            if matches is not None:
+                candidates = matches if candidates is None else candidates & matches
+        return candidates
+
+    def pick(self, **filters):
+        """A random article matching filters, or None."""
+        ids = self.search(**filters)
+        if ids is None:
+            return random.choice(self.items) if self.items else None
+        return self.items[random.choice(tuple(ids))] if ids else None
+
+
+def load_scav(path):
+    """Parse scav.csv into an indexed tuple of ScavItems."""
+    items = []
+    # Years and point strings repeat heavily ("10 points"), so every item
+    # shares one copy of each and of the values parsed from it
+    years, point_ranges = {}, {}
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            number = row.get("Item", "UNK ITEM.").strip()
+            points = sys.intern(row.get("Points", "[UNK POINTS]").strip())
+            if points not in point_ranges:
+                point_ranges[points] = parse_points(points)
+            min_points, max_points = point_ranges[points]
+            year = parse_year(number)
+            items.append(ScavItem(
+                number=number,
+                description=row.get("Description", "").strip(),
+                points=points,
+                year=years.setdefault(year, year),
+                min_points=min_points,
+                max_points=max_points,
+            ))
+    return ScavIndex(tuple(items))
+
+
+def load_articles(path):
+    """Parse shadydealer.csv into an indexed tuple of Articles."""
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return ArticleIndex(tuple(
+            Article(
+                title=row.get("Title", "Untitled").strip(),
+                url=row.get("URL", "").strip(),
+                author=sys.intern(row.get("Author", "Unknown").strip()),
+            )
+            for row in csv.DictReader(csvfile)
+        ))
+
+
+class Corpus:
+    """
+    A CSV file parsed once into an immutable, indexed set of records.
+    `reload_if_changed` re-parses and re-indexes the file when its mtime changes
+    and swaps the new index in with a single assignment, so readers always see
+    either the old or the new corpus.
+    """
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self.mtime = os.stat(path).st_mtime_ns
+        self.index = loader(path)
+        self._task = None
+
+    def pick(self, **filters):
+        """A random record matching filters (see the index's search()), or None."""
+        return self.index.pick(**filters)
+
+    def reload_if_changed(self):
+        """Re-parse the file if it changed on disk. Returns True if data was swapped in."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            index = self.loader(self.path)
+        except Exception as e:
+            # Keep serving the last good copy (e.g. while the file is mid-edit).
+            logging.error(f"Failed to reload {self.path}: {e}")
+            return False
+        if not len(index):
+            logging.error(f"Refusing to reload {self.path}: no rows")
+            return False
+        self.index, self.mtime = index, mtime
+        logging.info(f"Reloaded {len(index)} rows from {self.path}")
+        return True
+
+    async def _run(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reload_if_changed)
+
+    def start(self, interval=30.0):
+        """Poll the file's mtime in the background and hot-reload on change."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
@@ -0,0 +1,271 @@
+"""
+Countdown images for /daysinquarter, rendered on demand.
+
+Every image is the same template with a different number in the white box, so
+instead of shipping one PNG per day the bot draws the number onto
+countdownimages/template.png with the bundled Gotham font when a day is first
+requested. Rendering runs in a process pool; results are kept in a
+size-bounded on-disk LRU cache, and the next few days are rendered ahead of
+time whenever a day is served. The old images/{day}.png URLs redirect to
+/countdown/{day}.png.
+"""
+import os
+import hashlib
+import logging
+import asyncio
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from aiohttp import web
+from PIL import Image, ImageDraw, ImageFont
+
+from dashboard import etag_matches
+
+TEMPLATE_PATH = os.path.join("countdownimages", "template.png")
+FONT_PATH = os.path.join("static", "fonts", "Gotham", "Gotham-Book.otf")
+# Interior of the white number box on the 1080x1080 template (left, top, right, bottom)
+NUMBER_BOX = (386, 900, 694, 1052)
+NUMBER_PADDING = 12
+FONT_SIZE = 205  # digits ~146px tall, matching the original artwork
+MAX_DAY = 9999
+WIDTHS = (360, 720)
+DEFAULT_WIDTH = 720
+FORMATS = ("webp", "png")
+CONTENT_TYPES = {"webp": "image/webp", "png": "image/png"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@lru_cache(maxsize=1)
+def _template():
+    with Image.open(TEMPLATE_PATH) as image:
+        return image.convert("RGB")
+
+
+@lru_cache(maxsize=8)
+def _font(size):
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+def render_day(day, width=DEFAULT_WIDTH, fmt="webp"):
+    """Encoded countdown image for one day number. Runs in a worker process."""
+    image = _template().copy()
+    text = str(day)
+    left, top, right, bottom = NUMBER_BOX
+    max_width = right - left - 2 * NUMBER_PADDING
+
+    font = _font(FONT_SIZE)
+    x0, y0, x1, y1 = font.getbbox(text)
+    if x1 - x0 > max_width:
+        # Shrink long numbers to fit the box instead of spilling over its border
+        font = _font(int(FONT_SIZE * max_width / (x1 - x0)))
+        x0, y0, x1, y1 = font.getbbox(text)
+    x = left + (right - left - (x1 - x0)) / 2 - x0
+    y = top + (bottom - top - (y1 - y0)) / 2 - y0
+    ImageDraw.Draw(image).text((x, y), text, font=font, fill="black")
+
+    if width != image.width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    out = BytesIO()
+    if fmt == "png":
+        # 256-colour palette with dithering keeps gradients acceptable at a fraction of the size
+        image.quantize(colors=256, method=Image.Quantize.MEDIANCUT).save(out, "PNG", optimize=True)
+    else:
+        image.save(out, "WEBP", quality=80, method=6)
+    return out.getvalue()
+
+
+def render_version():
+    """Short hash of everything that affects rendered output; changes whenever the artwork does."""
+    h = hashlib.blake2b(digest_size=6)
+    for path in (TEMPLATE_PATH, FONT_PATH):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    h.update(repr((NUMBER_BOX, NUMBER_PADDING, FONT_SIZE, WIDTHS)).encode())
+    return h.hexdigest()
+
+
+class DiskLRUCache:
+    """
+    Files in `directory` bounded to `max_bytes` in total, least recently used
+    evicted first. Recency is kept in memory and seeded from file mtimes, so
+    it survives restarts. Methods do blocking I/O; call them from a thread.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # name -> size, least recently used first
+        self.total = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.total += size
+        self._evict()
+
+    def get(self, name):
+        """Contents of a cached file, or None."""
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:  # evicted by another thread, or removed by hand
+            with self._lock:
+                self.total -= self._entries.pop(name, 0)
+            return None
+        return data
+
+    def put(self, name, data):
+        fd, tmp_path = tempfile.mkstemp(prefix=".countdown-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self.total += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+def choose_format(accept, suffix=None):
+    """Explicit suffix wins; otherwise WebP if the client accepts it, else PNG."""
+    if suffix in FORMATS:
+        return suffix
+    return "webp" if "image/webp" in (accept or "") else "png"
+
+
+def choose_width(hint):
+    """Smallest variant at least as wide as the hint (largest if none is)."""
+    try:
+        hint = int(hint)
+    except (TypeError, ValueError):
+        return DEFAULT_WIDTH
+    for width in WIDTHS:
+        if width >= hint:
+            return width
+    return WIDTHS[-1]
+
+
+class CountdownImages:
+    """
+    Serves /countdown/{day} images, rendering each (day, width, format) once.
+
+    Concurrent requests for an image that is still rendering share one render.
+    After serving day N, days N+1..N+`prewarm` are rendered in the background
+    so tomorrow's /daysinquarter link is already cached.
+    """
+
+    def __init__(self, cache_dir="countdown_cache", max_bytes=64 * 1024 * 1024, workers=2, prewarm=3):
+        self.cache = DiskLRUCache(cache_dir, max_bytes)
+        self.workers = workers
+        self.prewarm_days = prewarm
+        self.version = render_version()
+        self._pool = None
+        self._inflight = {}  # file name -> render future
+        self._prewarm_tasks = set()
+
+    def _name(self, day, width, fmt):
+        return f"{day}-{width}-{self.version}.{fmt}"
+
+    def etag(self, day, width, fmt):
+        # Rendering is deterministic, so the version and parameters identify the bytes
+        return f'"{self._name(day, width, fmt)}"'
+
+    async def image(self, day, width=DEFAULT_WIDTH, fmt="webp"):
+        """Encoded image for a day, from the disk cache or freshly rendered."""
+        name = self._name(day, width, fmt)
+        data = await asyncio.to_thread(self.cache.get, name)
+        if data is not None:
+            return data
+        future = self._inflight.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._render(name, day, width, fmt))
+            self._inflight[name] = future
+            future.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, name, day, width, fmt):
+        if self._pool is None:
+            # Not fork: the bot process has threads (stats flusher, web server)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("forkserver"))
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._pool, render_day, day, width, fmt)
+        await asyncio.to_thread(self.cache.put, name, data)
+        return data
+
+    def prewarm(self, first_day, width=DEFAULT_WIDTH, fmt="webp"):
+        """Render `prewarm` days from first_day on in the background. Must be called on the event loop."""
+        for next_day in range(first_day, min(first_day + self.prewarm_days - 1, MAX_DAY) + 1):
+            task = asyncio.create_task(self._prewarm_one(next_day, width, fmt))
+            self._prewarm_tasks.add(task)
+            task.add_done_callback(self._prewarm_tasks.discard)
+
+    async def _prewarm_one(self, day, width, fmt):
+        try:
+            await self.image(day, width, fmt)
+        except Exception as e:
+            logging.warning(f"Failed to pre-render countdown image for day {day}: {e}")
+
+    async def handle(self, request):
+        day = int(request.match_info["day"])
+        if day > MAX_DAY:
+            raise web.HTTPNotFound()
+        suffix = request.match_info.get("ext")
+        fmt = choose_format(request.headers.get("Accept"), suffix)
+        width = choose_width(request.query.get("w"))
+
+        etag = self.etag(day, width, fmt)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if suffix is None:
+            headers["Vary"] = "Accept"
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+        body = await self.image(day, width, fmt)
+        self.prewarm(day + 1, width, fmt)
+        return web.Response(body=body, content_type=CONTENT_TYPES[fmt], headers=headers)
+
+    async def legacy(self, request):
+        # Embeds posted before on-demand rendering link images/{day}.png (the
+        # old pre-rendered PNGs); relative, so it works under any proxy prefix
+        raise web.HTTPMovedPermanently(f"../countdown/{request.match_info['day']}.png")
+
+    def add_routes(self, app):
+        app.router.add_get(r"/countdown/{day:\d+}", self.handle)
+        app.router.add_get(r"/countdown/{day:\d+}.{ext:png|webp}", self.handle)
+        app.router.add_get(r"/images/{day:\d+}.png", self.legacy)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,92 @@
+import time
+import hashlib
+import logging
+import asyncio
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+# Templates are compiled once when first loaded and cached by the environment.
+env = Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches etag (weak comparison, as RFC 9110 asks for GETs)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if tags == ["*"]:
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in tags)
+
+
+class Snapshot:
+    """A rendered page body plus its strong ETag and source data."""
+
+    __slots__ = ("body", "etag", "built_at", "context")
+
+    def __init__(self, body, context):
+        self.body = body
+        self.context = context  # the data the page was rendered from
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.built_at = time.monotonic()
+
+
+class DashboardCache:
+    """
+    Admin dashboard rendered ahead of time.
+
+    `collect` is a coroutine returning the template context. A background task
+    re-renders the page when `version()` changes (checked every `check_interval`
+    seconds) and at least every `max_age` seconds, so requests are served from
+    the last snapshot without touching stats or Discord.
+    """
+
+    def __init__(self, template_name, collect, version, check_interval=5.0, max_age=60.0):
+        self.template = env.get_template(template_name)
+        self.collect = collect
+        self.version = version
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.snapshot = None
+        self._built_version = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def rebuild(self):
+        async with self._lock:
+            version = self.version()
+            context = await self.collect()
+            body = await asyncio.to_thread(lambda: self.template.render(**context).encode("utf-8"))
+            self.snapshot = Snapshot(body, context)
+            self._built_version = version
+        return self.snapshot
+
+    async def get(self):
+        """The current snapshot, building the first one on demand."""
+        if self.snapshot is None:
+            return await self.rebuild()
+        return self.snapshot
+
+    def _needs_rebuild(self):
+        if self.snapshot is None or self.version() != self._built_version:
+            return True
+        return time.monotonic() - self.snapshot.built_at >= self.max_age
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if self._needs_rebuild():
+                try:
+                    await self.rebuild()
+                except Exception as e:
+                    logging.error(f"Failed to rebuild admin dashboard: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
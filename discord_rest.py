@@ -0,0 +1,323 @@
+"""
+Minimal Discord REST client that respects the bot token's rate limits.
+
+The Flask app and the bot share one bot token, so they also share its
+per-route buckets and the global limit. Bucket state learned from response
+headers is kept in a WAL-mode SQLite file (DISCORD_RATELIMIT_PATH) that both
+processes open; before each request a client reserves a slot there and waits
+for the bucket (or the global limit) to reset instead of provoking a 429.
+
+`DiscordREST` is the blocking client used by app.py (over requests);
+`AsyncDiscordREST` is the aiohttp client used by the bot.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from sqlite_util import LocalConnection
+
+API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v10")
+# Discord allows 50 requests per second per bot token across all routes
+GLOBAL_PER_SECOND = 50
+# How long other requests wait on a route's first request before sending anyway
+DISCOVERY_TIMEOUT = 5.0
+DISCOVERY_POLL = 0.05
+# Slack added to bucket resets to absorb clock skew and request latency
+RESET_MARGIN = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_buckets (
+    route  TEXT PRIMARY KEY,   -- e.g. "PUT /guilds/{guild_id}/members/{id}/roles/{id}"
+    bucket TEXT NOT NULL       -- X-RateLimit-Bucket hash, or "" if the route reported none
+);
+CREATE TABLE IF NOT EXISTS discovering (
+    route TEXT PRIMARY KEY,    -- first request on a route whose bucket is still unknown
+    until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    key       TEXT PRIMARY KEY,  -- bucket hash + ":" + major parameter
+    lim       INTEGER NOT NULL,
+    remaining INTEGER NOT NULL,
+    reset_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS global_limit (
+    id           INTEGER PRIMARY KEY CHECK (id = 1),
+    blocked_until REAL NOT NULL,
+    window_start REAL NOT NULL,
+    window_count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO global_limit (id, blocked_until, window_start, window_count) VALUES (1, 0, 0, 0);
+"""
+
+MAJOR_RE = re.compile(r"^/(guilds|channels|webhooks)/(\d+)")
+ID_RE = re.compile(r"/\d+")
+
+
+def route_key(method, path):
+    """
+    (route, major parameter) for rate limiting. Snowflakes other than the
+    major parameter (guild, channel or webhook ID) don't affect the bucket.
+    """
+    match = MAJOR_RE.match(path)
+    major = match.group(2) if match else ""
+    rest = path[match.end():] if match else path
+    prefix = f"/{match.group(1)}/{{{match.group(1)[:-1]}_id}}" if match else ""
+    return f"{method} {prefix}{ID_RE.sub('/{id}', rest)}", major
+
+
+class RateLimitState:
+    """Bucket and global-limit bookkeeping shared by every process using the same file."""
+
+    def __init__(self, path, global_per_second=GLOBAL_PER_SECOND):
+        self.path = path
+        self.global_per_second = global_per_second
+        self._connect = LocalConnection(path)
+        self._connect().executescript(SCHEMA)
+
+    def acquire(self, route, major):
+        """
+        Reserve a request on route. Returns 0 if the request may be sent now,
+        otherwise the number of seconds to wait before trying again.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            blocked_until, window_start, window_count = conn.execute(
+                "SELECT blocked_until, window_start, window_count FROM global_limit WHERE id = 1"
+            ).fetchone()
+            if blocked_until > now:
+                return blocked_until - now
+            if now - window_start >= 1.0:
+                window_start, window_count = now, 0
+            if window_count >= self.global_per_second:
+                return window_start + 1.0 - now
+
+            known = conn.execute("SELECT bucket FROM route_buckets WHERE route = ?", (route,)).fetchone()
+            row = None
+            if known is None:
+                # Until the first response tells us the bucket, send one request at a time
+                until = conn.execute("SELECT until FROM discovering WHERE route = ?", (route,)).fetchone()
+                if until is not None and until[0] > now:
+                    return DISCOVERY_POLL
+                conn.execute(
+                    "INSERT INTO discovering (route, until) VALUES (?, ?) "
+                    "ON CONFLICT (route) DO UPDATE SET until = excluded.until",
+                    (route, now + DISCOVERY_TIMEOUT)
+                )
+            elif known[0]:
+                row = conn.execute(
+                    "SELECT key, lim, remaining, reset_at FROM buckets WHERE key = ?", (f"{known[0]}:{major}",)
+                ).fetchone()
+            if row is not None:
+                key, lim, remaining, reset_at = row
+                if reset_at + RESET_MARGIN <= now:
+                    # The window has rolled over. Until a response reports the new reset
+                    # time, assume a provisional one so responses are merged, not trusted.
+                    remaining, reset_at = lim, now + DISCOVERY_TIMEOUT
+                if remaining <= 0:
+                    return reset_at + RESET_MARGIN - now
+                conn.execute("UPDATE buckets SET remaining = ?, reset_at = ? WHERE key = ?",
+                             (remaining - 1, reset_at, key))
+            conn.execute(
+                "UPDATE global_limit SET window_start = ?, window_count = ? WHERE id = 1",
+                (window_start, window_count + 1)
+            )
+            return 0.0
+        finally:
+            conn.execute("COMMIT")
+
+    def update(self, route, major, status, headers, retry_after=None):
+        """Record the bucket state reported by a response (and any 429)."""
+        now = time.time()
+        bucket = headers.get("X-RateLimit-Bucket")
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if status == 429 and headers.get("X-RateLimit-Global", "").lower() == "true":
+                conn.execute("UPDATE global_limit SET blocked_until = ? WHERE id = 1", (now + (retry_after or 1.0),))
+            conn.execute("DELETE FROM discovering WHERE route = ?", (route,))
+            conn.execute(
+                "INSERT INTO route_buckets (route, bucket) VALUES (?, ?) "
+                "ON CONFLICT (route) DO UPDATE SET bucket = excluded.bucket",
+                (route, bucket or "")
+            )
+            if bucket is None:
+                return
+            try:
+                lim = int(headers.get("X-RateLimit-Limit", 1))
+                remaining = int(headers.get("X-RateLimit-Remaining", 0))
+                reset_at = now + float(headers.get("X-RateLimit-Reset-After", 0))
+            except ValueError:
+                return
+            if status == 429 and retry_after is not None:
+                remaining, reset_at = 0, max(reset_at, now + retry_after)
+            # Within the current window our local count already includes requests still
+            # in flight, which the server hasn't seen yet: keep the lower of the two.
+            conn.execute(
+                "INSERT INTO buckets (key, lim, remaining, reset_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET lim = excluded.lim, "
+                "remaining = CASE WHEN buckets.reset_at > ? THEN MIN(buckets.remaining, excluded.remaining) "
+                "ELSE excluded.remaining END, reset_at = excluded.reset_at",
+                (f"{bucket}:{major}", lim, remaining, reset_at, now)
+            )
+        finally:
+            conn.execute("COMMIT")
+
+
+class DiscordRESTError(Exception):
+    """Non-2xx response from the async client."""
+
+    def __init__(self, status, data):
+        super().__init__(f"{status}: {data}")
+        self.status = status
+        self.data = data
+
+
+def _retry_after(data, headers):
+    if isinstance(data, dict) and "retry_after" in data:
+        try:
+            return float(data["retry_after"])
+        except (TypeError, ValueError):
+            pass
+    try:
+        return float(headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+async def _read_body(response):
+    """Decoded JSON body, None if empty, or the text of a body that isn't JSON (e.g. a proxy's HTML error page)."""
+    text = await response.text()
+    if not text:
+        return None
+    if response.content_type == "application/json":
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+    return text
+
+
+class _Counters:
+    """Request counters exposed by both clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {"requests": 0, "queued": 0, "queued_seconds": 0.0, "rate_limited": 0, "retries": 0}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.values[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+class DiscordREST:
+    """
+    Blocking client over a requests.Session. `request` waits for the route's
+    bucket before sending, and retries a 429 (after Retry-After) up to
+    `max_retries` times as long as the wait is under `max_wait` seconds;
+    otherwise the 429 response is returned to the caller.
+    """
+
+    def __init__(self, token, state, session, timeout=(3.05, 10), max_wait=10.0, max_retries=3):
+        self.headers = {"Authorization": f"Bot {token}"}
+        self.state = state
+        self.session = session
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.counters = _Counters()
+
+    def _wait(self, route, major):
+        while True:
+            delay = self.state.acquire(route, major)
+            if delay <= 0:
+                return
+            self.counters.add("queued")
+            self.counters.add("queued_seconds", delay)
+            time.sleep(delay)
+
+    def request(self, method, path, **kwargs):
+        route, major = route_key(method, path)
+        for attempt in range(self.max_retries + 1):
+            self._wait(route, major)
+            self.counters.add("requests")
+            response = self.session.request(method, API_BASE + path, headers=self.headers,
+                                            timeout=self.timeout, **kwargs)
+            retry_after = None
+            if response.status_code == 429:
+                self.counters.add("rate_limited")
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+                retry_after = _retry_after(data, response.headers)
+            self.state.update(route, major, response.status_code, response.headers, retry_after)
+            if response.status_code != 429 or retry_after > self.max_wait or attempt == self.max_retries:
+                return response
+            logging.warning(f"Discord rate limit on {route}; retrying in {retry_after:.2f}s")
+            self.counters.add("retries")
+            time.sleep(retry_after)
+        return response
+
+    def stats(self):
+        return self.counters.snapshot()
+
+
+class AsyncDiscordREST:
+    """
+    The same client for asyncio over an aiohttp.ClientSession (set `session`
+    before the first request). `request` returns the decoded JSON body and
+    raises DiscordRESTError for non-2xx responses and for bodies that aren't JSON.
+    """
+
+    def __init__(self, token, state, session=None, timeout=None, max_wait=10.0, max_retries=3):
+        self.headers = {"Authorization": f"Bot {token}"}
+        self.state = state
+        self.session = session
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.counters = _Counters()
+
+    async def _wait(self, route, major):
+        while True:
+            delay = await asyncio.to_thread(self.state.acquire, route, major)
+            if delay <= 0:
+                return
+            self.counters.add("queued")
+            self.counters.add("queued_seconds", delay)
+            await asyncio.sleep(delay)
+
+    async def request(self, method, path, **kwargs):
+        route, major = route_key(method, path)
+        for attempt in range(self.max_retries + 1):
+            await self._wait(route, major)
+            self.counters.add("requests")
+            async with self.session.request(method, API_BASE + path, headers=self.headers,
+                                            timeout=self.timeout, **kwargs) as response:
+                status, headers = response.status, response.headers
+                data = await _read_body(response)
+            retry_after = None
+            if status == 429:
+                self.counters.add("rate_limited")
+                retry_after = _retry_after(data, headers)
+            await asyncio.to_thread(self.state.update, route, major, status, headers, retry_after)
+            if status < 300 and not isinstance(data, str):
+                return data
+            if status != 429 or retry_after > self.max_wait or attempt == self.max_retries:
+                raise DiscordRESTError(status, data)
+            logging.warning(f"Discord rate limit on {route}; retrying in {retry_after:.2f}s")
+            self.counters.add("retries")
+            await asyncio.sleep(retry_after)
+
+    def stats(self):
+        return self.counters.snapshot()
@@ -0,0 +1,221 @@
+import re
+import time
+import json
+import random
+import logging
+import asyncio
+import urllib.parse
+from datetime import datetime
+
+import pytz
+
+from ics import aparse_ics
+from metrics import observe_upstream
+
+CST = pytz.timezone("US/Central")
+DATE_FORMAT = "%A, %B %-d, %Y at %-I:%M %p"
+
+BLUEPRINT_URL = (
+    "https://blueprint.uchicago.edu/api/discovery/event/search?"
+    "endsAfter={ends_after}&orderByField=endsOn&orderByDirection=ascending&"
+    "status=Approved&take=25&query="
+)
+UCHICAGO_EVENTS_URL = "https://events.uchicago.edu/live/json/events"
+HYDEPARK_URL = "https://welcometohydepark.com/events/list/?ical=1"
+
+
+def make_event(name, url, date, location, desc, source, expires=None):
+    """
+    Normalized event record shared by every source. `expires` is the moment
+    after which the event should no longer be offered (None = never).
+    """
+    return {
+        "name": name,
+        "url": url,
+        "date": date.strftime(DATE_FORMAT),
+        "date_obj": date,
+        "expires": expires,
+        "location": location,
+        "desc": desc,
+        "source": source,
+    }
+
+
+def blueprint_url(now):
+    return BLUEPRINT_URL.format(ends_after=urllib.parse.quote(now.isoformat(), safe=''))
+
+
+def parse_blueprint(body):
+    events = []
+    for event in json.loads(body)["value"]:
+        date = datetime.fromisoformat(event["startsOn"])
+        ends = datetime.fromisoformat(event["endsOn"]) if event.get("endsOn") else None
+        events.append(make_event(
+            name=event["name"],
+            url=f"https://blueprint.uchicago.edu/event/{event['id']}",
+            date=date,
+            location=event["location"] or "TBA",
+            desc=re.sub('<[^<]+?>', '', event["description"] or "")[:150],
+            source="Blueprint",
+            expires=ends,
+        ))
+    return events
+
+
+def parse_uchicago_events(body):
+    events = []
+    for event in json.loads(body)["data"]:
+        date_utc = datetime.strptime(event["date_utc"], "%Y-%m-%d %H:%M:%S")
+        events.append(make_event(
+            name=event["title"],
+            url=event["url"],
+            date=date_utc.astimezone(CST),
+            location="Online" if event["is_online"] == 1 else "In-Person",
+            desc="No description",  # description just repeats the URL
+            source="UChicago Events",
+        ))
+    return events
+
+
+async def parse_hydepark(chunks):
+    """Stream the Hyde Park .ics feed, dropping events that have already started."""
+    events = []
+    async for event in aparse_ics(chunks, not_before=datetime.now().astimezone(), default_tz=CST):
+        date = event.start.astimezone(CST)
+        events.append(make_event(
+            name=event.summary,
+            url=event.url or "https://welcometohydepark.com/events/list/",
+            date=date,
+            location=event.location or "TBA",
+            desc=event.description[:150] if event.description else "No description",
+            source="Hyde Park",
+            expires=date,  # past Hyde Park events are skipped
+        ))
+    return events
+
+
+class EventSource:
+    """One upstream feed plus its cached events and HTTP validators."""
+
+    def __init__(self, name, url, parse, conditional=True, streaming=False):
+        self.name = name
+        self.url = url                  # str, or callable(now) -> str
+        self.parse = parse
+        self.streaming = streaming      # parse is async and consumes body chunks
+        self.conditional = conditional  # send If-None-Match / If-Modified-Since
+        self.events = []
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = None          # monotonic time of the last successful fetch
+        self.error = None
+
+    async def refresh(self, session, timeout):
+        now = datetime.now().astimezone()
+        url = self.url(now) if callable(self.url) else self.url
+        headers = {}
+        if self.conditional and self.fetched_at is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status == 304:
+                    self.fetched_at = time.monotonic()
+                    self.error = None
+                    return
+                response.raise_for_status()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if self.streaming:
+                    events = await self.parse(response.content.iter_chunked(64 * 1024))
+                else:
+                    events = await asyncio.to_thread(self.parse, await response.read())
+            self.events = events
+            self.etag = etag
+            self.last_modified = last_modified
+            self.fetched_at = time.monotonic()
+            self.error = None
+        except Exception as e:
+            # Keep serving the previous events; the next refresh will retry.
+            self.error = f"{type(e).__name__}: {e}"
+            logging.warning(f"{self.name} refresh failed: {e!r}")
+
+
+class EventCache:
+    """
+    Normalized events from Blueprint, UChicago Events and Hyde Park, refreshed
+    concurrently in the background every `ttl` seconds. Reads never wait on the
+    network: stale data is served while a refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl=600, timeouts=None):
+        self.ttl = ttl
+        self.timeouts = timeouts or {}
+        self.sources = {
+            "blueprint": EventSource("Blueprint", blueprint_url, parse_blueprint, conditional=False),
+            "uchicago_events": EventSource("UChicago Events", UCHICAGO_EVENTS_URL, parse_uchicago_events),
+            "hydepark": EventSource("Hyde Park", HYDEPARK_URL, parse_hydepark, streaming=True),
+        }
+        self._session = None
+        self._refreshing = None
+        self._task = None
+
+    @property
+    def loaded(self):
+        return any(source.fetched_at is not None for source in self.sources.values())
+
+    def is_stale(self):
+        cutoff = time.monotonic() - self.ttl
+        return any(source.fetched_at is None or source.fetched_at < cutoff
+                   for source in self.sources.values())
+
+    async def _refresh_all(self):
+        try:
+            await asyncio.gather(*(self._refresh_source(key, source) for key, source in self.sources.items()))
+        finally:
+            self._refreshing = None
+
+    async def _refresh_source(self, key, source):
+        start = time.perf_counter()
+        await source.refresh(self._session, self.timeouts.get(key))
+        observe_upstream(key, time.perf_counter() - start, source.error and source.error.split(":", 1)[0])
+
+    def refresh(self):
+        """Start a refresh of every source unless one is already running; returns its task."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.create_task(self._refresh_all())
+        return self._refreshing
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.ttl)
+
+    def start(self, session):
+        """Warm the cache and keep it refreshed in the background."""
+        self._session = session
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_loaded(self):
+        if not self.loaded:
+            await self.refresh()
+
+    def events(self, cutoff=None):
+        """Upcoming events, optionally limited to those starting before cutoff."""
+        if self._session is not None and self.is_stale():
+            self.refresh()
+        now = datetime.now().astimezone()
+        return [
+            event
+            for source in self.sources.values()
+            for event in source.events
+            if (event["expires"] is None or event["expires"] >= now)
+            and (cutoff is None or event["date_obj"] <= cutoff)
+        ]
+
+    def pick(self, cutoff=None):
+        """A random upcoming event, or None if nothing matches."""
+        events = self.events(cutoff)
+        return random.choice(events) if events else None
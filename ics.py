@@ -0,0 +1,248 @@
+"""
+Minimal streaming RFC 5545 (iCalendar) parser for VEVENT feeds.
+
+Feed bytes in arbitrary chunks; lines are unfolded in a single pass and each
+VEVENT is yielded as an IcsEvent as soon as its END:VEVENT arrives. Events
+whose DTSTART is before `not_before` stop accumulating properties the moment
+DTSTART is seen and are never built.
+"""
+import re
+import codecs
+from datetime import datetime, date, timezone
+from typing import NamedTuple, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import pytz
+
+DEFAULT_TZ = pytz.timezone("US/Central")
+
+_UNESCAPES = {"n": "\n", "N": "\n", "\\": "\\", ",": ",", ";": ";"}
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+# Properties we keep from each VEVENT; everything else is skipped without parsing.
+_WANTED = {"SUMMARY", "DTSTART", "DTEND", "URL", "LOCATION", "DESCRIPTION", "UID"}
+
+
+class IcsEvent(NamedTuple):
+    summary: str
+    start: datetime
+    end: Optional[datetime]
+    all_day: bool
+    url: Optional[str]
+    location: Optional[str]
+    description: Optional[str]
+    uid: Optional[str]
+
+
+def unescape_text(value):
+    """Undo RFC 5545 TEXT escaping (\\n, \\, \\; \\\\)."""
+    if "\\" not in value:
+        return value
+    return _ESCAPE_RE.sub(lambda m: _UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def split_content_line(line):
+    """Split 'NAME;PARAM=a;PARAM2="b:c":value' into (NAME, {PARAM: value}, value)."""
+    colon = line.find(":")
+    if colon < 0:
+        return line.upper(), {}, ""
+    semi = line.find(";", 0, colon)
+    if semi < 0:
+        return line[:colon].upper(), {}, line[colon + 1:]
+    if '"' in line[semi:colon]:
+        # A quoted parameter value may itself contain ':'; find the real separator.
+        in_quotes = False
+        for colon in range(semi, len(line)):
+            ch = line[colon]
+            if ch == '"':
+                in_quotes = not in_quotes
+            elif ch == ":" and not in_quotes:
+                break
+    params = {}
+    for part in _split_params(line[semi + 1:colon]):
+        key, _, pvalue = part.partition("=")
+        params[key.upper()] = pvalue.strip('"')
+    return line[:semi].upper(), params, line[colon + 1:]
+
+
+def _split_params(text):
+    parts = []
+    start = 0
+    in_quotes = False
+    for i, ch in enumerate(text):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ";" and not in_quotes:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_ics_datetime(value, params, default_tz=DEFAULT_TZ):
+    """
+    Parse a DATE or DATE-TIME value into an aware datetime.
+    UTC ('Z') and TZID values are honoured; floating times use default_tz.
+    Returns (datetime, all_day).
+    """
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        d = date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        return default_tz.localize(datetime(d.year, d.month, d.day)), True
+
+    naive = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                     int(value[9:11]), int(value[11:13]), int(value[13:15] or 0))
+    if value.endswith("Z"):
+        return naive.replace(tzinfo=timezone.utc), False
+    tzid = params.get("TZID")
+    if tzid:
+        try:
+            # zoneinfo resolves wall time per PEP 495 and is far cheaper than pytz.localize
+            return naive.replace(tzinfo=ZoneInfo(tzid)), False
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return default_tz.localize(naive), False
+
+
+class StreamingIcsParser:
+    """Incremental VEVENT parser; call feed() with bytes chunks, then close()."""
+
+    def __init__(self, not_before=None, default_tz=DEFAULT_TZ):
+        self.not_before = not_before
+        self.default_tz = default_tz
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""       # trailing text that may still be continued by the next chunk
+        self._props = None      # properties of the current VEVENT, or None outside one
+        self._skip = False      # current VEVENT already known to be in the past
+        self.skipped = 0
+
+    def feed(self, chunk):
+        """Consume a chunk of bytes; return the events completed by it."""
+        text = self._buffer + self._decoder.decode(chunk)
+        # Only hand over lines whose successor is known not to be a fold continuation.
+        k = text.rfind("\n")
+        while k >= 0 and (k + 1 == len(text) or text[k + 1] in " \t"):
+            k = text.rfind("\n", 0, k)
+        self._buffer = text[k + 1:]
+        events = []
+        if k >= 0:
+            self._consume(text[:k + 1], events)
+        return events
+
+    def close(self):
+        """Flush the trailing partial line; return any events it completes."""
+        text = self._buffer + self._decoder.decode(b"", final=True)
+        self._buffer = ""
+        events = []
+        if text:
+            self._consume(text if text.endswith("\n") else text + "\n", events)
+        return events
+
+    def _consume(self, text, events):
+        # Normalize line endings and unfold in one pass over the whole block (C speed).
+        text = text.replace("\r\n", "\n").replace("\n ", "").replace("\n\t", "")
+        if text[:1] in (" ", "\t"):
+            text = text[1:]
+        pos = 0
+        n = len(text)
+        while pos < n:
+            if self._props is None:
+                pos = _find_line(text, "BEGIN:VEVENT", pos)
+                if pos < 0:
+                    return
+                pos = text.index("\n", pos) + 1
+                self._props = {}
+                self._skip = False
+                continue
+
+            if self._skip:
+                # Past event: jump straight to its END line without looking at properties.
+                pos = _find_line(text, "END:VEVENT", pos)
+                if pos < 0:
+                    return
+
+            end = text.find("\n", pos)
+            if end < 0:
+                end = n
+            line = text[pos:end]
+            pos = end + 1
+
+            if line == "END:VEVENT":
+                if not self._skip:
+                    event = self._build(self._props)
+                    if event is not None:
+                        events.append(event)
+                self._props = None
+                continue
+
+            # Cheap name check before doing a full content-line split
+            colon = line.find(":")
+            semi = line.find(";", 0, colon)
+            name_end = semi if semi >= 0 else colon
+            if name_end < 0 or line[:name_end].upper() not in _WANTED:
+                continue
+            self._property(line)
+
+    def _property(self, line):
+        name, params, value = split_content_line(line)
+        if name == "DTSTART":
+            try:
+                start, all_day = parse_ics_datetime(value, params, self.default_tz)
+            except (ValueError, IndexError):
+                self._skip = True
+                return
+            if self.not_before is not None and start < self.not_before:
+                self._skip = True
+                self.skipped += 1
+                return
+            self._props["DTSTART"] = (start, all_day)
+        elif name == "DTEND":
+            # Only resolved if the event is kept
+            self._props["DTEND"] = (value, params)
+        elif name == "URL":
+            self._props[name] = value.strip()
+        else:
+            self._props[name] = unescape_text(value)
+
+    def _build(self, props):
+        if "SUMMARY" not in props or "DTSTART" not in props:
+            return None
+        start, all_day = props["DTSTART"]
+        end = None
+        if "DTEND" in props:
+            try:
+                end = parse_ics_datetime(*props["DTEND"], self.default_tz)[0]
+            except (ValueError, IndexError):
+                pass
+        return IcsEvent(
+            summary=props["SUMMARY"].strip(),
+            start=start,
+            end=end,
+            all_day=all_day,
+            url=props.get("URL"),
+            location=props.get("LOCATION"),
+            description=props.get("DESCRIPTION"),
+            uid=props.get("UID"),
+        )
+
+
+def _find_line(text, line, pos):
+    """Index of the next line in text (from pos) that is exactly `line`, or -1."""
+    while True:
+        i = text.find(line, pos)
+        if i < 0:
+            return -1
+        after = i + len(line)
+        if (i == 0 or text[i - 1] == "\n") and (after == len(text) or text[after] == "\n"):
+            return i
+        pos = after
+
+
+async def aparse_ics(chunks, not_before=None, default_tz=DEFAULT_TZ):
+    """Async generator of IcsEvents from an async iterable of bytes chunks."""
+    parser = StreamingIcsParser(not_before, default_tz)
+    async for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.close():
+        yield event
@@ -0,0 +1,115 @@
+"""
+Opt-in detector for code that blocks the bot's event loop.
+
+A heartbeat task on the loop stamps the time every `interval` seconds. A
+watcher thread checks the stamp; once it is older than `interval +
+threshold` the loop is stuck, so the watcher grabs the loop thread's
+current stack and the task that is running. That stack shows the blocking
+code itself, not just the fact that something was slow. When the heartbeat
+resumes, the block is logged with its duration and kept for
+/admin/api/loop.
+"""
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque, defaultdict
+
+from metrics import Counter
+
+LOOP_BLOCKS = Counter(
+    "uchiverify_event_loop_blocks_total",
+    "Times the loop watchdog saw the event loop blocked past its threshold, by coroutine.",
+    ["coroutine"])
+
+
+class LoopWatchdog:
+    """
+    Records every stretch longer than `threshold` seconds during which the
+    event loop ran nothing else. Keeps the last `history` blocks, with up to
+    `max_frames` innermost stack frames each, plus totals per coroutine.
+    """
+
+    def __init__(self, threshold=0.1, history=50, max_frames=25):
+        self.threshold = threshold
+        self.interval = min(threshold / 2, 0.05)
+        self.poll = max(threshold / 4, 0.005)
+        self.max_frames = max_frames
+        self.blocks = deque(maxlen=history)
+        self.by_coroutine = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        self._lock = threading.Lock()
+        self._beat = None
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        """Start watching the running loop (call from the loop)."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logging.info(f"Event loop watchdog started (threshold {self.threshold * 1000:.0f} ms)")
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        pending = None  # (heartbeat being waited on, captured record)
+        while True:
+            time.sleep(self.poll)
+            beat = self._beat
+            if pending is not None and beat != pending[0]:
+                self._finish(pending[1], beat - pending[0] - self.interval)
+                pending = None
+            if pending is None and time.monotonic() - beat > self.interval + self.threshold:
+                pending = (beat, self._capture())
+
+    def _capture(self):
+        """Stack and task of the loop thread while it is still blocked."""
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame)[-self.max_frames:] if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            coro = task.get_coro()
+            task_name, coroutine = task.get_name(), getattr(coro, "__qualname__", repr(coro))
+        else:
+            task_name, coroutine = None, None  # a plain callback, not a task
+        return {
+            "at": time.time(),
+            "task": task_name,
+            "coroutine": coroutine,
+            "stack": [line.rstrip() for line in stack],
+        }
+
+    def _finish(self, record, duration):
+        record["duration_ms"] = round(duration * 1000, 1)
+        key = record["coroutine"] or "<callback>"
+        with self._lock:
+            self.blocks.append(record)
+            totals = self.by_coroutine[key]
+            totals["count"] += 1
+            totals["seconds"] += duration
+            totals["max_seconds"] = max(totals["max_seconds"], duration)
+        LOOP_BLOCKS.inc(key)
+        logging.warning(
+            f"Event loop blocked for {duration * 1000:.0f} ms in {key} (task {record['task']}):\n"
+            + "\n".join(record["stack"])
+        )
+
+    def snapshot(self):
+        """Recent blocks (newest first) and per-coroutine totals, for the admin API."""
+        with self._lock:
+            blocks = list(reversed(self.blocks))
+            by_coroutine = [{"coroutine": key, **totals} for key, totals in self.by_coroutine.items()]
+        by_coroutine.sort(key=lambda row: row["seconds"], reverse=True)
+        return {"threshold_ms": self.threshold * 1000, "blocks": blocks, "by_coroutine": by_coroutine}
@@ -0,0 +1,285 @@
+"""
+Prometheus-style metrics for the bot, rendered in the text exposition format
+at /metrics.
+
+Metrics are plain module-level objects (like prometheus_client's default
+registry) so the modules that do the work can record into them directly.
+Recording is a dict update under a lock; nothing is aggregated until a scrape.
+"""
+import math
+import time
+import asyncio
+import threading
+import functools
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+# Discord drops interactions that aren't answered within 3 seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.append(self)
+
+    @abstractmethod
+    def samples(self):
+        """(suffix, label values, extra label, value) tuples for the exposition."""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labels, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", labels, None, value) for labels, value in items]
+
+
+class Gauge(Metric):
+    """A settable gauge, or one read from `function()` at scrape time (a number, or a dict keyed by label tuples)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), function=None, registry=REGISTRY):
+        super().__init__(name, documentation, labels, registry)
+        self.function = function
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [("", labels, None, value) for labels, value in items
+                if value is not None and not math.isnan(value) and not math.isinf(value)]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, documentation, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        samples = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", labels, f'le="{_format_value(float(bound))}"', cumulative))
+            samples.append(("_sum", labels, None, total))
+            samples.append(("_count", labels, None, cumulative))
+        return samples
+
+
+def render(registry=REGISTRY):
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+COMMAND_FIRST_RESPONSE = Histogram(
+    "uchiverify_command_first_response_seconds",
+    "Time from command invocation to the initial response (message, defer or modal).",
+    ["command"])
+COMMAND_FOLLOWUP = Histogram(
+    "uchiverify_command_followup_seconds",
+    "Time from command invocation to the first followup message, for deferred commands.",
+    ["command"])
+COMMAND_ERRORS = Counter(
+    "uchiverify_command_errors_total",
+    "Command callbacks that raised, by exception type.",
+    ["command", "error"])
+UPSTREAM_LATENCY = Histogram(
+    "uchiverify_upstream_fetch_seconds",
+    "Duration of requests to upstream services, including failed ones.",
+    ["source"])
+UPSTREAM_ERRORS = Counter(
+    "uchiverify_upstream_errors_total",
+    "Failed upstream requests, by exception type.",
+    ["source", "error"])
+STATS_FLUSH = Histogram(
+    "uchiverify_stats_flush_seconds",
+    "Duration of command statistics flushes to the stats backend.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+STATS_FLUSH_ERRORS = Counter(
+    "uchiverify_stats_flush_errors_total",
+    "Command statistics flushes that failed.")
+EVENT_LOOP_LAG = Histogram(
+    "uchiverify_event_loop_lag_seconds",
+    "How late the event loop ran a timer scheduled by the lag monitor.",
+    buckets=LAG_BUCKETS)
+
+
+def observe_upstream(source, seconds, error=None):
+    """Record one upstream request; `error` is the exception (or its type name) if it failed."""
+    UPSTREAM_LATENCY.observe(seconds, source)
+    if error is not None:
+        UPSTREAM_ERRORS.inc(source, error if isinstance(error, str) else type(error).__name__)
+
+
+class _TimedResponse:
+    """Proxy for interaction.response that records when the first response went out."""
+
+    def __init__(self, response, timer):
+        self._response = response
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    async def send_message(self, *args, **kwargs):
+        result = await self._response.send_message(*args, **kwargs)
+        self._timer.responded()
+        return result
+
+    async def defer(self, *args, **kwargs):
+        result = await self._response.defer(*args, **kwargs)
+        self._timer.responded()
+        return result
+
+    async def send_modal(self, *args, **kwargs):
+        result = await self._response.send_modal(*args, **kwargs)
+        self._timer.responded()
+        return result
+
+
+class _TimedFollowup:
+    def __init__(self, followup, timer):
+        self._followup = followup
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._followup, name)
+
+    async def send(self, *args, **kwargs):
+        result = await self._followup.send(*args, **kwargs)
+        self._timer.followed_up()
+        return result
+
+
+class _TimedInteraction:
+    """Proxy for a discord.Interaction whose response and followup are timed."""
+
+    def __init__(self, interaction, command):
+        self._interaction = interaction
+        self._command = command
+        self._started = time.perf_counter()
+        self._responded = False
+        self._followed_up = False
+        self.response = _TimedResponse(interaction.response, self)
+        self.followup = _TimedFollowup(interaction.followup, self)
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+    def responded(self):
+        if not self._responded:
+            self._responded = True
+            COMMAND_FIRST_RESPONSE.observe(time.perf_counter() - self._started, self._command)
+
+    def followed_up(self):
+        if not self._followed_up:
+            self._followed_up = True
+            COMMAND_FOLLOWUP.observe(time.perf_counter() - self._started, self._command)
+
+
+def timed_command(name):
+    """
+    Decorator for slash-command callbacks (place it below @bot.tree.command
+    and the describe/choices decorators): records time to first response and
+    to followup, and counts exceptions.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            try:
+                return await func(_TimedInteraction(interaction, name), *args, **kwargs)
+            except Exception as e:
+                COMMAND_ERRORS.inc(name, type(e).__name__)
+                raise
+        return wrapper
+    return decorator
+
+
+class LoopLagMonitor:
+    """
+    Schedules a wakeup every `interval` seconds and records how late it ran
+    into EVENT_LOOP_LAG; anything that blocks the loop shows up as lag.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.last_lag = lag
+            EVENT_LOOP_LAG.observe(lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
@@ -0,0 +1,89 @@
+"""
+Local validation of Okta ID tokens.
+
+The token endpoint returns a signed `id_token` alongside the access token.
+Verifying it here (signature against Okta's published keys, issuer, audience,
+expiry and nonce) gives us the user's claims without a call to /userinfo.
+"""
+import hmac
+import time
+import logging
+import threading
+
+import jwt
+
+ALGORITHMS = ["RS256"]
+
+
+class IdTokenError(Exception):
+    """The ID token is missing, malformed or fails validation."""
+
+
+class NonceMismatch(IdTokenError):
+    """The token was not issued for this login attempt (possible replay)."""
+
+
+class JWKSCache:
+    """
+    Okta's signing keys, fetched once and kept in memory by key ID. An unknown
+    `kid` (Okta rotated its keys) triggers a refetch, at most once every
+    `min_refresh_interval` seconds so bogus tokens can't make us hammer Okta.
+    """
+
+    def __init__(self, jwks_uri, get_session, timeout=(3.05, 10), min_refresh_interval=60.0):
+        self.jwks_uri = jwks_uri
+        self.get_session = get_session
+        self.timeout = timeout
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        response = self.get_session().get(self.jwks_uri, timeout=self.timeout)
+        response.raise_for_status()
+        keys = {}
+        for data in response.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(data)
+            except jwt.PyJWKError as e:
+                logging.warning(f"Skipping unusable JWKS key {data.get('kid')}: {e}")
+                continue
+            keys[data.get("kid")] = key
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        logging.info(f"Loaded {len(keys)} signing keys from {self.jwks_uri}")
+
+    def get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None and (self._fetched_at is None
+                                or time.monotonic() - self._fetched_at >= self.min_refresh_interval):
+                self._refresh()
+                key = self._keys.get(kid)
+        if key is None:
+            raise IdTokenError(f"Unknown signing key {kid!r}")
+        return key
+
+
+def verify_id_token(token, jwks, issuer, audience, nonce, leeway=60):
+    """Claims of a valid ID token; raises IdTokenError (or NonceMismatch) otherwise."""
+    if not token:
+        raise IdTokenError("No ID token in the token response")
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") not in ALGORITHMS:
+            raise IdTokenError(f"Unexpected signing algorithm {header.get('alg')!r}")
+        key = jwks.get_key(header.get("kid"))
+        claims = jwt.decode(
+            token, key.key, algorithms=ALGORITHMS, audience=audience, issuer=issuer,
+            leeway=leeway, options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+        )
+    except jwt.PyJWTError as e:
+        raise IdTokenError(str(e)) from e
+    if not nonce or not hmac.compare_digest(str(claims.get("nonce", "")), nonce):
+        raise NonceMismatch("ID token nonce does not match this login")
+    return claims
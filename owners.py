@@ -0,0 +1,94 @@
+import time
+import logging
+import asyncio
+
+import aiohttp
+
+from discord_rest import DiscordRESTError
+from metrics import observe_upstream
+
+
+def format_owner(member):
+    """Username (not display name) of a guild owner, as shown on the admin page."""
+    return format_username(member.name, member.discriminator)
+
+
+def format_username(name, discriminator):
+    if discriminator not in ("0", None):  # Legacy username
+        return f"{name}#{discriminator}"
+    return f"@{name}"
+
+
+class OwnerCache:
+    """
+    Guild owner names for the admin dashboard.
+
+    Names come from the gateway member cache when the owner is cached there.
+    Otherwise they are fetched in the background through `rest` (an
+    AsyncDiscordREST sharing the bot token's rate limits), at most
+    `concurrency` at a time, and kept for `ttl` seconds. `get` never waits on
+    Discord: it returns a cached (possibly stale) name, or None while the first
+    lookup is still in flight.
+    """
+
+    def __init__(self, rest, ttl=3600, concurrency=4):
+        self.rest = rest
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache = {}       # guild_id -> (owner_id, name, expires_at)
+        self._pending = {}     # guild_id -> resolving task
+
+    def get(self, guild):
+        if guild.owner_id is None:
+            return "Unknown"
+        member = guild.owner
+        if member is not None:
+            self._store(guild.id, guild.owner_id, format_owner(member))
+            return self._cache[guild.id][1]
+
+        entry = self._cache.get(guild.id)
+        if entry is not None and entry[0] == guild.owner_id:
+            if entry[2] < time.monotonic():
+                self._schedule(guild)
+            return entry[1]
+        self._schedule(guild)
+        return None
+
+    def _store(self, guild_id, owner_id, name, ttl=None):
+        self._cache[guild_id] = (owner_id, name, time.monotonic() + (self.ttl if ttl is None else ttl))
+
+    def _schedule(self, guild):
+        if guild.id not in self._pending:
+            self._pending[guild.id] = asyncio.create_task(self._resolve(guild))
+
+    async def _resolve(self, guild):
+        owner_id = guild.owner_id
+        try:
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    member = await self.rest.request("GET", f"/guilds/{guild.id}/members/{owner_id}")
+                except Exception as e:
+                    observe_upstream("discord", time.perf_counter() - start, e)
+                    raise
+                observe_upstream("discord", time.perf_counter() - start)
+            user = member["user"]
+            self._store(guild.id, owner_id, format_username(user["username"], user.get("discriminator")))
+        except Exception as e:
+            if isinstance(e, (DiscordRESTError, aiohttp.ClientError, asyncio.TimeoutError)):
+                logging.warning(f"Could not fetch owner of guild {guild.id}: {e}")
+            else:
+                # e.g. a member payload without "user"; nothing awaits this task to see it
+                logging.exception(f"Unexpected error fetching owner of guild {guild.id}")
+            # Retry failures sooner than successful lookups
+            self._store(guild.id, owner_id, f"Unknown (ID: {owner_id})", ttl=min(self.ttl, 300))
+        finally:
+            self._pending.pop(guild.id, None)
+
+    def invalidate(self, guild_id):
+        self._cache.pop(guild_id, None)
+
+    def update_member(self, member):
+        """Refresh the cached name if member owns their guild."""
+        if member.guild.owner_id == member.id:
+            self._store(member.guild.id, member.id, format_owner(member))
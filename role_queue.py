@@ -0,0 +1,256 @@
+"""
+Durable queue of "give this user the verified role" jobs for the Flask app.
+
+The OIDC callback only enqueues a (guild, user) job and returns. A worker
+thread in each gunicorn process claims due jobs one guild at a time, assigns
+the role over REST and records the outcome in the same SQLite file, so jobs
+survive restarts and each job is handled by one worker at a time.
+"""
+import os
+import time
+import random
+import logging
+import threading
+
+from sqlite_util import LocalConnection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS role_jobs (
+    guild_id      TEXT NOT NULL,
+    user_id       TEXT NOT NULL,
+    status        TEXT NOT NULL,          -- pending, done or failed
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    not_before    REAL NOT NULL,          -- earliest time of the next attempt
+    claimed_until REAL NOT NULL DEFAULT 0,
+    updated_at    REAL NOT NULL,
+    last_error    TEXT,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_role_jobs_due ON role_jobs (status, not_before);
+"""
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+class RoleQueue:
+    """
+    Jobs keyed by (guild_id, user_id). Enqueueing a job that is already
+    pending is a no-op, so repeat clicks don't multiply work; finished or
+    failed jobs are re-queued.
+    """
+
+    def __init__(self, path, max_attempts=8, lease=60.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._connect = LocalConnection(path)
+        self._connect().executescript(SCHEMA)
+
+    def enqueue(self, guild_id, user_id):
+        """Queue a role assignment. Returns False if one is already pending."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO role_jobs (guild_id, user_id, status, not_before, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET status = excluded.status, attempts = 0, "
+            "not_before = excluded.not_before, claimed_until = 0, updated_at = excluded.updated_at, last_error = NULL "
+            "WHERE role_jobs.status != ?",
+            (str(guild_id), str(user_id), PENDING, now, now, PENDING)
+        )
+        return cursor.rowcount == 1
+
+    def claim_batch(self, limit=50):
+        """
+        Claim up to `limit` due jobs for a single guild (the one waiting longest).
+        Returns (guild_id, [user_id, ...]) or None if nothing is due. Claims
+        expire after `lease` seconds in case the worker dies.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT guild_id FROM role_jobs WHERE status = ? AND not_before <= ? AND claimed_until <= ? "
+                "ORDER BY not_before LIMIT 1",
+                (PENDING, now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            guild_id = row[0]
+            users = [r[0] for r in conn.execute(
+                "SELECT user_id FROM role_jobs WHERE guild_id = ? AND status = ? AND not_before <= ? "
+                "AND claimed_until <= ? ORDER BY not_before LIMIT ?",
+                (guild_id, PENDING, now, now, limit)
+            )]
+            conn.executemany(
+                "UPDATE role_jobs SET claimed_until = ? WHERE guild_id = ? AND user_id = ?",
+                [(now + self.lease, guild_id, user_id) for user_id in users]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return guild_id, users
+
+    def complete(self, guild_id, user_id):
+        self._connect().execute(
+            "UPDATE role_jobs SET status = ?, claimed_until = 0, updated_at = ?, last_error = NULL "
+            "WHERE guild_id = ? AND user_id = ?",
+            (DONE, time.time(), guild_id, user_id)
+        )
+
+    def fail(self, guild_id, user_id, error):
+        """Give up on a job that cannot succeed (e.g. missing permissions)."""
+        self._connect().execute(
+            "UPDATE role_jobs SET status = ?, attempts = attempts + 1, claimed_until = 0, updated_at = ?, "
+            "last_error = ? WHERE guild_id = ? AND user_id = ?",
+            (FAILED, time.time(), error, guild_id, user_id)
+        )
+
+    def retry(self, guild_id, user_id, delay, error, count_attempt=True):
+        """
+        Reschedule a job `delay` seconds from now. Counted attempts past
+        `max_attempts` mark the job failed; rate-limit deferrals pass
+        count_attempt=False.
+        """
+        now = time.time()
+        increment = 1 if count_attempt else 0
+        self._connect().execute(
+            "UPDATE role_jobs SET attempts = attempts + ?, "
+            "status = CASE WHEN attempts + ? >= ? THEN ? ELSE status END, "
+            "not_before = ?, claimed_until = 0, updated_at = ?, last_error = ? "
+            "WHERE guild_id = ? AND user_id = ?",
+            (increment, increment, self.max_attempts, FAILED, now + delay, now, error, guild_id, user_id)
+        )
+
+    def attempts(self, guild_id, user_id):
+        row = self._connect().execute(
+            "SELECT attempts FROM role_jobs WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def prune(self, older_than=7 * 86400):
+        """Delete finished jobs older than `older_than` seconds."""
+        self._connect().execute(
+            "DELETE FROM role_jobs WHERE status != ? AND updated_at < ?",
+            (PENDING, time.time() - older_than)
+        )
+
+    def counts(self):
+        """Number of jobs per status."""
+        return dict(self._connect().execute("SELECT status, COUNT(*) FROM role_jobs GROUP BY status"))
+
+
+def retry_after(response):
+    """Seconds to wait from a Discord 429, preferring the precise JSON body value."""
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+class RoleWorker:
+    """
+    Drains a RoleQueue on a daemon thread.
+
+    `assign(guild_id, user_id)` performs the REST call and returns the
+    requests.Response of the role PUT, or None if the role could not be
+    resolved. 2xx completes the job; 429 defers it (and the rest of the
+    guild's batch, or every guild for a global limit) by Retry-After without
+    counting an attempt; 5xx, network errors and unresolved roles back off
+    exponentially; any other 4xx fails the job. Waiting for exhausted
+    buckets before each request is left to the Discord REST client.
+    """
+
+    def __init__(self, queue, assign, poll_interval=1.0, batch_size=50,
+                 backoff_base=2.0, backoff_max=600.0):
+        self.queue = queue
+        self.assign = assign
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._pause_until = 0.0  # global rate limit
+
+    def start(self):
+        """Start the worker thread in this process (again after a fork)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="role-worker", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the worker after enqueueing so it doesn't wait for the next poll."""
+        self._wakeup.set()
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_prune > 3600:
+                    self.queue.prune()
+                    last_prune = time.monotonic()
+                batch = self.queue.claim_batch(self.batch_size)
+            except Exception as e:
+                logging.error(f"Role queue unavailable: {e}")
+                batch = None
+            if batch is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._process(*batch)
+
+    def _process(self, guild_id, user_ids):
+        started = time.monotonic()
+        for i, user_id in enumerate(user_ids):
+            if time.monotonic() - started > self.queue.lease / 2:
+                # Hand the rest back before our claim expires and another worker takes it
+                for deferred in user_ids[i:]:
+                    self.queue.retry(guild_id, deferred, 0, None, count_attempt=False)
+                return
+            wait = self._pause_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self.assign(guild_id, user_id)
+            except Exception as e:
+                self.queue.retry(guild_id, user_id, self.backoff(self.queue.attempts(guild_id, user_id)),
+                                 f"{type(e).__name__}: {e}")
+                continue
+
+            if response is None:
+                self.queue.retry(guild_id, user_id, self.backoff(self.queue.attempts(guild_id, user_id)),
+                                 "Could not resolve the verified role")
+            elif response.status_code in (200, 204):
+                self.queue.complete(guild_id, user_id)
+                logging.info(f"Assigned 'UChicago Verified' role to user {user_id} in guild {guild_id}")
+            elif response.status_code == 429:
+                delay = retry_after(response)
+                is_global = response.headers.get("X-RateLimit-Global", "").lower() == "true"
+                logging.warning(f"Rate limited assigning roles in guild {guild_id} "
+                                f"({'global' if is_global else 'route'}); retrying in {delay:.1f}s")
+                if is_global:
+                    self._pause_until = time.monotonic() + delay
+                # The rest of this guild's batch shares the bucket: defer it all
+                for deferred in user_ids[i:]:
+                    self.queue.retry(guild_id, deferred, delay, "Rate limited", count_attempt=False)
+                return
+            elif response.status_code >= 500:
+                self.queue.retry(guild_id, user_id, self.backoff(self.queue.attempts(guild_id, user_id)),
+                                 f"{response.status_code}: {response.text[:200]}")
+            else:
+                self.queue.fail(guild_id, user_id, f"{response.status_code}: {response.text[:200]}")
+                logging.error(f"Failed to assign role to user {user_id} in guild {guild_id}: "
+                              f"{response.status_code} - {response.text}")
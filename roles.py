@@ -0,0 +1,100 @@
+"""
+Per-guild cache of the "UChicago Verified" role ID for the Flask callback.
+
+Role IDs live in a small WAL-mode SQLite file so every gunicorn worker shares
+them. Looking up (and, if needed, creating) the role for a guild is guarded
+by a per-guild lease row: one worker talks to Discord while the others wait
+for its result, so concurrent verifications never create duplicate roles.
+"""
+import os
+import time
+import threading
+
+from sqlite_util import LocalConnection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS role_ids (
+    guild_id   TEXT PRIMARY KEY,
+    role_id    TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS role_leases (
+    guild_id   TEXT PRIMARY KEY,
+    owner      TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class RoleCache:
+    """
+    `get_or_create(guild_id, resolve)` returns the cached role ID, or calls
+    `resolve()` (find or create the role over REST; returns an ID or None)
+    while holding the guild's lease. IDs are kept for `ttl` seconds; a lease
+    expires after `lease_timeout` seconds in case its holder dies.
+    """
+
+    def __init__(self, path, ttl=3600, lease_timeout=15.0, poll_interval=0.1):
+        self.path = path
+        self.ttl = ttl
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self._connect = LocalConnection(path)
+        self._connect().executescript(SCHEMA)
+
+    def get(self, guild_id):
+        row = self._connect().execute(
+            "SELECT role_id FROM role_ids WHERE guild_id = ? AND expires_at > ?",
+            (str(guild_id), time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, guild_id, role_id):
+        self._connect().execute(
+            "INSERT INTO role_ids (guild_id, role_id, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET role_id = excluded.role_id, expires_at = excluded.expires_at",
+            (str(guild_id), str(role_id), time.time() + self.ttl)
+        )
+
+    def invalidate(self, guild_id):
+        """Forget a guild's role, e.g. after Discord reports it as unknown."""
+        self._connect().execute("DELETE FROM role_ids WHERE guild_id = ?", (str(guild_id),))
+
+    def _acquire(self, guild_id, owner):
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO role_leases (guild_id, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE role_leases.expires_at <= ?",
+            (str(guild_id), owner, now + self.lease_timeout, now)
+        )
+        return cursor.rowcount == 1
+
+    def _release(self, guild_id, owner):
+        self._connect().execute(
+            "DELETE FROM role_leases WHERE guild_id = ? AND owner = ?", (str(guild_id), owner)
+        )
+
+    def get_or_create(self, guild_id, resolve):
+        role_id = self.get(guild_id)
+        if role_id is not None:
+            return role_id
+
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        while not self._acquire(guild_id, owner):
+            # Another worker is resolving this guild; use its answer when it lands.
+            # If it fails or dies, its lease is released or expires and we take over.
+            time.sleep(self.poll_interval)
+            role_id = self.get(guild_id)
+            if role_id is not None:
+                return role_id
+        try:
+            role_id = self.get(guild_id)  # may have landed between our read and the lease
+            if role_id is None:
+                role_id = resolve()
+                if role_id is not None:
+                    role_id = str(role_id)
+                    self.set(guild_id, role_id)
+            return role_id
+        finally:
+            self._release(guild_id, owner)
@@ -0,0 +1,28 @@
+"""Connections to the WAL-mode SQLite files that processes use to share state."""
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """
+    Calling it returns a connection to `path` for the current thread. Each
+    thread gets its own connection, and so does each process: a forked child
+    (e.g. a gunicorn worker) sees a different pid and reconnects instead of
+    reusing its parent's. Connections are in autocommit mode; callers manage
+    transactions with explicit BEGIN/COMMIT.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
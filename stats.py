@@ -0,0 +1,577 @@
+import os
+import sys
+import time
+import json
+import logging
+import asyncio
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+from metrics import STATS_FLUSH, STATS_FLUSH_ERRORS
+from sqlite_util import LocalConnection
+from stats_cube import StatsCube
+
+STATS_TZ = pytz.timezone("America/Chicago")
+
+# Sentinels used by the SQLite backend for counts with no guild / no date
+# (legacy global counters imported from the JSON file).
+NO_GUILD = ""
+NO_DATE = ""
+
+
+def today_str():
+    """Current date in the bot's stats timezone, formatted as YYYY-MM-DD."""
+    return datetime.now(STATS_TZ).strftime('%Y-%m-%d')
+
+
+class RetentionPolicy:
+    """
+    How long per-guild stats keep their daily resolution. Days older than
+    `daily_days` are rolled into weekly buckets, and anything older than
+    `weekly_days` into monthly buckets. Totals are unaffected: counts only move
+    from finer buckets into coarser ones.
+
+    Weekly buckets never straddle a month (a week that does is split at the
+    month boundary), so weeks roll into months exactly. Buckets are keyed by
+    their first date, YYYY-MM-DD.
+    """
+
+    def __init__(self, daily_days=90, weekly_days=365):
+        if daily_days < 1 or weekly_days < daily_days:
+            raise ValueError("need 1 <= daily_days <= weekly_days")
+        self.daily_days = daily_days
+        self.weekly_days = weekly_days
+
+    def cutoffs(self, today=None):
+        """(day cutoff, month cutoff): dates before these leave daily / weekly resolution."""
+        today = today or datetime.now(STATS_TZ).date()
+        return ((today - timedelta(days=self.daily_days - 1)).isoformat(),
+                (today - timedelta(days=self.weekly_days - 1)).isoformat())
+
+
+def week_start(day):
+    """First date of the (month-clipped) weekly bucket containing day."""
+    d = date.fromisoformat(day)
+    return max(d - timedelta(days=d.weekday()), d.replace(day=1)).isoformat()
+
+
+def week_end(start):
+    """Last date of the weekly bucket starting at start."""
+    d = date.fromisoformat(start)
+    next_month = (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return min(d + timedelta(days=6 - d.weekday()), next_month - timedelta(days=1)).isoformat()
+
+
+def month_start(day):
+    return day[:8] + "01"
+
+
+def rollup_bucket(day, month_cutoff):
+    """('weekly' | 'monthly', bucket start) for a date leaving daily resolution."""
+    if day < month_cutoff:
+        return "monthly", month_start(day)
+    return "weekly", week_start(day)
+
+
+def load_stats(path):
+    """Load command statistics from JSON file."""
+    if Path(path).exists():
+        try:
+            with open(path, 'r') as f:
+                stats = json.load(f)
+            stats.setdefault("commands", {})
+            return stats
+        except Exception as e:
+            logging.error(f"Failed to load stats from {path}: {e}")
+    return {"commands": {}}
+
+
+def write_atomic(path, data):
+    """Write text to path via a temp file in the same directory + rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".stats-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehindStore:
+    """
+    Base class for stats backends that buffer writes in memory.
+
+    `record` is O(1) and never touches the disk. A background task started with
+    `start()` flushes pending changes every `flush_interval` seconds, or sooner
+    once `flush_every` events have accumulated. `close()` performs a final flush.
+
+    With a `retention` policy, the same task also compacts old daily buckets
+    (see RetentionPolicy) on start and every `compact_interval` seconds.
+
+    Subclasses implement `_record`, `_flush`, `_compact` and the read methods
+    used by the admin dashboard: `command_totals`, `top_commands`,
+    `guild_summaries` and `daily_totals`.
+    """
+
+    def __init__(self, flush_interval=30.0, flush_every=50, retention=None, compact_interval=6 * 3600):
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._next_compaction = 0.0
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.version = 0  # bumped on every record; lets readers detect changes cheaply
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+    def record(self, command_name, guild_id=None):
+        """Count one invocation of command_name (optionally scoped to a guild)."""
+        guild = str(guild_id) if guild_id else None
+        with self._lock:
+            self._record(command_name, guild, today_str())
+            self._pending += 1
+            self.version += 1
+            pending = self._pending
+
+        if pending >= self.flush_every and self._wakeup is not None:
+            self._wakeup.set()
+
+    def flush(self):
+        """Synchronously persist pending changes. Safe to call from a worker thread."""
+        start = time.perf_counter()
+        try:
+            flushed = self._flush()
+        except Exception as e:
+            STATS_FLUSH_ERRORS.inc()
+            logging.error(f"Failed to save stats: {e}")
+            return False
+        if flushed:
+            STATS_FLUSH.observe(time.perf_counter() - start)
+        return flushed
+
+    def compact(self, today=None):
+        """
+        Roll daily buckets past the retention policy into weekly/monthly ones.
+        Idempotent, and safe to run from a worker thread while commands are
+        being recorded. Returns the number of buckets rolled up.
+        """
+        if self.retention is None:
+            return 0
+        day_cutoff, month_cutoff = self.retention.cutoffs(today)
+        try:
+            moved = self._compact(day_cutoff, month_cutoff)
+        except Exception as e:
+            logging.error(f"Failed to compact stats: {e}")
+            return 0
+        if moved:
+            logging.info(f"Compacted {moved} stats buckets older than {day_cutoff}")
+        return moved
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
+            if self.retention is not None and time.monotonic() >= self._next_compaction:
+                self._next_compaction = time.monotonic() + self.compact_interval
+                await asyncio.to_thread(self.compact)
+
+    def start(self):
+        """Start the background flusher on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background flusher and write any pending changes."""
+        if self._task is not None:
+            # Wake the flusher and let it exit rather than cancelling it: on Python 3.11
+            # wait_for() can swallow a cancel that races with the wakeup, hanging close()
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+def _merge_counts(target, counts):
+    for command, count in counts.items():
+        target[command] = target.get(command, 0) + count
+
+
+class JSONStatsStore(WriteBehindStore):
+    """
+    Stats held as the nested command_stats.json dict, rewritten atomically on flush.
+
+    Each guild's entry is serialized only when it changed since the last flush,
+    so a flush holds the lock (and record() on the event loop waits) for the
+    guilds that were active rather than for the whole file.
+
+    The dashboard reads come from a StatsCube kept alongside the dict, with a
+    day axis as long as the daily retention (a year without a policy).
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._stats = load_stats(path)
+        self._fragments = {}  # guild ID -> JSON of its entry as of the last flush
+        self._dirty = set(self._stats.get("servers", {}))
+        self._cube = StatsCube.from_stats(self._stats, days=self.retention.daily_days if self.retention else 365,
+                                          end=datetime.now(STATS_TZ).date())
+
+    def _record(self, command_name, guild, day):
+        commands = self._stats["commands"]
+        commands[command_name] = commands.get(command_name, 0) + 1
+        if guild:
+            self._cube.add(guild, command_name, day)
+        else:
+            self._cube.add_unscoped(command_name)
+
+        if guild:
+            self._dirty.add(guild)
+            servers = self._stats.setdefault("servers", {})
+            server = servers.setdefault(guild, {"commands": {}, "daily": {}})
+            server_commands = server.setdefault("commands", {})
+            server_commands[command_name] = server_commands.get(command_name, 0) + 1
+            daily = server.setdefault("daily", {}).setdefault(day, {})
+            daily[command_name] = daily.get(command_name, 0) + 1
+
+    def _compact(self, day_cutoff, month_cutoff):
+        # Rolled-up buckets live in "weekly" / "monthly" maps next to "daily".
+        # One guild per lock hold so record() never waits for the whole pass.
+        moved = 0
+        with self._lock:
+            guild_ids = list(self._stats.get("servers", {}))
+        for guild_id in guild_ids:
+            with self._lock:
+                server = self._stats["servers"][guild_id]
+                moved_before = moved
+                daily = server.get("daily", {})
+                for day in [day for day in daily if day < day_cutoff]:
+                    period, start = rollup_bucket(day, month_cutoff)
+                    _merge_counts(server.setdefault(period, {}).setdefault(start, {}), daily.pop(day))
+                    moved += 1
+                weekly = server.get("weekly", {})
+                for start in [start for start in weekly if week_end(start) < month_cutoff]:
+                    _merge_counts(server.setdefault("monthly", {}).setdefault(month_start(start), {}),
+                                  weekly.pop(start))
+                    moved += 1
+                if moved > moved_before:
+                    self._dirty.add(guild_id)
+        if moved:
+            with self._lock:
+                self._pending += 1
+                self.version += 1
+        return moved
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            servers = self._stats.get("servers", {})
+            for guild in self._dirty:
+                self._fragments[guild] = json.dumps(servers[guild])
+            self._dirty.clear()
+            fragments = list(self._fragments.items())
+            rest = json.dumps({key: value for key, value in self._stats.items() if key != "servers"})
+            pending, self._pending = self._pending, 0
+        # Assemble the file outside the lock
+        entries = ", ".join(f"{json.dumps(guild)}: {fragment}" for guild, fragment in fragments)
+        data = f'{rest[:-1]}, "servers": {{{entries}}}}}' if rest != "{}" else f'{{"servers": {{{entries}}}}}'
+        try:
+            write_atomic(self.path, data)
+        except Exception:
+            with self._lock:
+                self._pending += pending
+            raise
+        return True
+
+    def snapshot(self):
+        """Live view of the stats dict, in the same shape as the JSON file. Do not mutate."""
+        return self._stats
+
+    def command_totals(self):
+        """Global usage count per command."""
+        with self._lock:
+            return dict(self._stats["commands"])
+
+    def top_commands(self, n=10):
+        """The n most used commands as (name, count), most used first."""
+        with self._lock:
+            return self._cube.top_commands(n)
+
+    def guild_summaries(self):
+        """Map of guild ID (str) to (total commands, top command, top command count)."""
+        with self._lock:
+            return self._cube.guild_summaries()
+
+    def daily_totals(self, days=30):
+        """List of (date, total commands) for the most recent `days` dates with activity."""
+        with self._lock:
+            return self._cube.daily_totals(days)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_counts (
+    guild_id TEXT NOT NULL,
+    date     TEXT NOT NULL,
+    command  TEXT NOT NULL,
+    count    INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, date, command)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_command_counts_date ON command_counts (date, guild_id);
+CREATE INDEX IF NOT EXISTS idx_command_counts_command ON command_counts (command);
+CREATE TABLE IF NOT EXISTS command_rollups (
+    guild_id TEXT NOT NULL,
+    period   TEXT NOT NULL,    -- 'weekly' or 'monthly' (see RetentionPolicy)
+    start    TEXT NOT NULL,    -- first date in the bucket
+    command  TEXT NOT NULL,
+    count    INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, period, start, command)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStatsStore(WriteBehindStore):
+    """
+    Stats held as (guild_id, date, command) -> count rows in a WAL-mode SQLite file.
+
+    Increments are buffered in memory and upserted in one transaction per flush
+    from a worker thread, so the event loop never waits on the database. Days
+    compacted away by the retention policy move to command_rollups.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._buffer = defaultdict(int)
+        self._connect = LocalConnection(path)
+        self._connect().executescript(SCHEMA)
+
+    def _record(self, command_name, guild, day):
+        self._buffer[(guild or NO_GUILD, day if guild else NO_DATE, command_name)] += 1
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            buffer, self._buffer = self._buffer, defaultdict(int)
+            pending, self._pending = self._pending, 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO command_counts (guild_id, date, command, count) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (guild_id, date, command) DO UPDATE SET count = count + excluded.count",
+                    [(g, d, c, n) for (g, d, c), n in buffer.items()]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception:
+            with self._lock:
+                for key, n in buffer.items():
+                    self._buffer[key] += n
+                self._pending += pending
+            raise
+        return True
+
+    def _compact(self, day_cutoff, month_cutoff):
+        # BEGIN IMMEDIATE: the select and deletes below see the same rows even
+        # if other processes flush into the file meanwhile
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rollups = defaultdict(int)
+            days = conn.execute(
+                "SELECT guild_id, date, command, count FROM command_counts WHERE date != ? AND date < ?",
+                (NO_DATE, day_cutoff)
+            ).fetchall()
+            for guild_id, day, command, count in days:
+                rollups[(guild_id, *rollup_bucket(day, month_cutoff), command)] += count
+            weeks = [row for row in conn.execute(
+                "SELECT guild_id, start, command, count FROM command_rollups "
+                "WHERE period = 'weekly' AND start < ?", (month_cutoff,)
+            ) if week_end(row[1]) < month_cutoff]
+            for guild_id, start, command, count in weeks:
+                rollups[(guild_id, "monthly", month_start(start), command)] += count
+            conn.execute("DELETE FROM command_counts WHERE date != ? AND date < ?", (NO_DATE, day_cutoff))
+            conn.executemany(
+                "DELETE FROM command_rollups WHERE guild_id = ? AND period = 'weekly' AND start = ? AND command = ?",
+                [(guild_id, start, command) for guild_id, start, command, _ in weeks]
+            )
+            conn.executemany(
+                "INSERT INTO command_rollups (guild_id, period, start, command, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, period, start, command) DO UPDATE SET count = count + excluded.count",
+                [(*key, n) for key, n in rollups.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        moved = len({(g, d) for g, d, _, _ in days}) + len({(g, s) for g, s, _, _ in weeks})
+        if moved:
+            with self._lock:
+                self.version += 1
+        return moved
+
+    def _query(self, sql, params=()):
+        # Flush first so the dashboard sees every recorded command.
+        self.flush()
+        return self._connect().execute(sql, params).fetchall()
+
+    def command_totals(self):
+        """Global usage count per command."""
+        return dict(self._query(
+            "SELECT command, SUM(count) FROM ("
+            "SELECT command, count FROM command_counts UNION ALL SELECT command, count FROM command_rollups"
+            ") GROUP BY command"
+        ))
+
+    def top_commands(self, n=10):
+        """The n most used commands as (name, count), most used first."""
+        return sorted(self.command_totals().items(), key=lambda x: x[1], reverse=True)[:n]
+
+    def guild_summaries(self):
+        """Map of guild ID (str) to (total commands, top command, top command count)."""
+        rows = self._query(
+            "SELECT guild_id, command, SUM(count) FROM ("
+            "SELECT guild_id, command, count FROM command_counts "
+            "UNION ALL SELECT guild_id, command, count FROM command_rollups"
+            ") WHERE guild_id != ? GROUP BY guild_id, command",
+            (NO_GUILD,)
+        )
+        summaries = {}
+        for guild_id, command, count in rows:
+            total, top_name, top_count = summaries.get(guild_id, (0, "None", 0))
+            if count > top_count:
+                top_name, top_count = command, count
+            summaries[guild_id] = (total + count, top_name, top_count)
+        return summaries
+
+    def daily_totals(self, days=30):
+        """List of (date, total commands) for the most recent `days` dates with activity."""
+        rows = self._query(
+            "SELECT date, SUM(count) FROM command_counts "
+            "WHERE date != ? GROUP BY date ORDER BY date DESC LIMIT ?",
+            (NO_DATE, days)
+        )
+        return rows[::-1]
+
+    def import_json(self, json_path):
+        """
+        One-shot import of a command_stats.json file. Counts that the JSON only
+        records in aggregate (legacy global counters, per-server totals without a
+        daily breakdown) are stored under the NO_GUILD / NO_DATE sentinels so that
+        totals stay exact; weekly and monthly buckets go to command_rollups.
+        Returns False if an import has already been done.
+        """
+        stats = load_stats(json_path)
+        rows = defaultdict(int)
+        rollups = defaultdict(int)
+        server_sums = defaultdict(int)
+        for guild_id, guild_data in stats.get("servers", {}).items():
+            daily_sums = defaultdict(int)
+            for day, commands in guild_data.get("daily", {}).items():
+                for command, count in commands.items():
+                    rows[(guild_id, day, command)] += count
+                    daily_sums[command] += count
+            for period in ("weekly", "monthly"):
+                for start, commands in guild_data.get(period, {}).items():
+                    for command, count in commands.items():
+                        rollups[(guild_id, period, start, command)] += count
+                        daily_sums[command] += count
+            for command, count in guild_data.get("commands", {}).items():
+                if count > daily_sums[command]:
+                    rows[(guild_id, NO_DATE, command)] += count - daily_sums[command]
+                server_sums[command] += count
+        for command, count in stats.get("commands", {}).items():
+            if count > server_sums[command]:
+                rows[(NO_GUILD, NO_DATE, command)] += count - server_sums[command]
+
+        # BEGIN IMMEDIATE: of several processes starting on the same file,
+        # only the first to take the write lock imports
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'imported_json'").fetchone():
+                conn.execute("COMMIT")
+                return False
+            conn.executemany(
+                "INSERT INTO command_counts (guild_id, date, command, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, date, command) DO UPDATE SET count = count + excluded.count",
+                [(g, d, c, n) for (g, d, c), n in rows.items()]
+            )
+            conn.executemany(
+                "INSERT INTO command_rollups (guild_id, period, start, command, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, period, start, command) DO UPDATE SET count = count + excluded.count",
+                [(*key, n) for key, n in rollups.items()]
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('imported_json', ?)",
+                (os.path.abspath(json_path),)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logging.info(f"Imported {len(rows)} stats rows from {json_path}")
+        return True
+
+
+def make_stats_store(json_path, flush_interval=30.0, flush_every=50, retention=None, compact_interval=6 * 3600):
+    """Build the stats backend selected by the STATS_BACKEND env var ("json" or "sqlite")."""
+    backend = os.getenv("STATS_BACKEND", "json").lower()
+    options = dict(flush_interval=flush_interval, flush_every=flush_every,
+                   retention=retention, compact_interval=compact_interval)
+    if backend == "sqlite":
+        store = SQLiteStatsStore(os.getenv("STATS_DB_PATH", "command_stats.db"), **options)
+        if Path(json_path).exists():
+            store.import_json(json_path)
+        return store
+    return JSONStatsStore(json_path, **options)
+
+
+if __name__ == "__main__":
+    # Usage: python stats.py import command_stats.json command_stats.db
+    #        python stats.py compact <command_stats.json | command_stats.db> [daily_days] [weekly_days]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 4 and sys.argv[1] == "import":
+        store = SQLiteStatsStore(sys.argv[3])
+        if not store.import_json(sys.argv[2]):
+            print("Stats have already been imported into this database.")
+    elif 3 <= len(sys.argv) <= 5 and sys.argv[1] == "compact":
+        retention = RetentionPolicy(*map(int, sys.argv[3:]))
+        path = sys.argv[2]
+        store = JSONStatsStore(path, retention=retention) if path.endswith(".json") \
+            else SQLiteStatsStore(path, retention=retention)
+        print(f"Rolled up {store.compact()} buckets.")
+        store.flush()
+    else:
+        print("Usage: python stats.py import <command_stats.json> <command_stats.db>\n"
+              "       python stats.py compact <stats file> [daily_days] [weekly_days]")
+        sys.exit(1)
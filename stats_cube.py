@@ -0,0 +1,185 @@
+"""
+Command counts held as NumPy arrays, so the admin dashboard's aggregations
+are reductions rather than walks over nested dicts.
+
+All-time counts (including days that fell off the day axis, rolled-up buckets
+and legacy totals) are kept in a dense guild × command array, `totals`, with
+guild IDs and command names interned to row and column indexes; per-guild and
+per-command aggregations reduce over it. `first_use` ranks each guild's
+commands in the order the guild first used them, so a tie for a guild's top
+command goes to the same command as max() over its commands dict. Both have room for half again as many
+guilds and commands as the stats started with and doubles when full, which
+copies a few MB at most.
+
+The day axis only feeds the global daily chart, so it holds one total per day
+rather than a guild × command slice per day: `day_totals` is a ring buffer over
+the `days` most recent dates, where `base` is the slot of the oldest one and
+moving to a new date zeroes the slots that fall off.
+"""
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+
+class StatsCube:
+    def __init__(self, days=365, end=None, guilds=16, commands=16):
+        self.days = days
+        self.end = (end or date.today()).toordinal()  # ordinal of the last day on the day axis
+        self.base = 0  # ring slot of the first day on the day axis
+        self.guild_ids = []
+        self.guild_index = {}
+        self.commands = []
+        self.command_index = {}
+        self.totals = np.zeros((guilds, commands), dtype=np.int64)
+        self.first_use = np.zeros((guilds, commands), dtype=np.int32)
+        self.day_totals = np.zeros(days, dtype=np.int64)
+        self.unscoped = {}  # command -> count not attributed to any guild
+        self._day_cache = (None, None)
+
+    @classmethod
+    def from_stats(cls, stats, days=365, end=None):
+        """Build from the command_stats.json dict (see JSONStatsStore)."""
+        servers = stats.get("servers", {})
+        names = set(stats.get("commands", {}))
+        for server in servers.values():
+            names.update(server.get("commands", {}))
+        cube = cls(days, end, guilds=_capacity(len(servers)), commands=_capacity(len(names)))
+        per_day = defaultdict(int)  # YYYY-MM-DD -> count across guilds
+        for guild_id, server in servers.items():
+            g = cube._guild(guild_id)
+            for rank, (command, total) in enumerate(server.get("commands", {}).items()):
+                c = cube._command(command)
+                cube.totals[g, c] = total
+                cube.first_use[g, c] = rank
+            for day, commands in server.get("daily", {}).items():
+                per_day[day] += sum(commands.values())
+        ordinals = {date.fromisoformat(day).toordinal(): count for day, count in per_day.items()}
+        if ordinals:
+            cube.end = max(cube.end, max(ordinals))
+        for ordinal, count in ordinals.items():
+            offset = cube.days - 1 - (cube.end - ordinal)
+            if offset >= 0:
+                cube.day_totals[offset] += count
+        server_sums = cube.command_totals()
+        for command, total in stats.get("commands", {}).items():
+            if total > server_sums.get(command, 0):
+                cube.unscoped[command] = total - server_sums.get(command, 0)
+        return cube
+
+    @property
+    def nbytes(self):
+        return self.totals.nbytes + self.first_use.nbytes + self.day_totals.nbytes
+
+    def _guild(self, guild_id):
+        g = self.guild_index.get(guild_id)
+        if g is None:
+            g = self.guild_index[guild_id] = len(self.guild_ids)
+            self.guild_ids.append(guild_id)
+            if g >= self.totals.shape[0]:
+                self._grow(max(16, 2 * g), self.totals.shape[1])
+        return g
+
+    def _command(self, command):
+        c = self.command_index.get(command)
+        if c is None:
+            c = self.command_index[command] = len(self.commands)
+            self.commands.append(command)
+            if c >= self.totals.shape[1]:
+                self._grow(self.totals.shape[0], max(16, 2 * c))
+        return c
+
+    def _grow(self, guilds, commands):
+        # Capacity doubles, so interning new guilds and commands is amortized O(1)
+        totals = np.zeros((guilds, commands), dtype=np.int64)
+        first_use = np.zeros((guilds, commands), dtype=np.int32)
+        g, c = self.totals.shape
+        totals[:g, :c] = self.totals
+        first_use[:g, :c] = self.first_use
+        self.totals, self.first_use = totals, first_use
+
+    def _ordinal(self, day):
+        cached_day, ordinal = self._day_cache
+        if day != cached_day:
+            ordinal = date.fromisoformat(day).toordinal()
+            self._day_cache = (day, ordinal)
+        return ordinal
+
+    def advance(self, end):
+        """Slide the day axis so it ends at ordinal `end`; days that fall off remain in `totals`."""
+        shift = end - self.end
+        if shift <= 0:
+            return
+        if shift >= self.days:
+            self.day_totals[:] = 0
+            self.base = 0
+        else:
+            # The oldest `shift` slots are reused for the new dates
+            for i in range(shift):
+                self.day_totals[(self.base + i) % self.days] = 0
+            self.base = (self.base + shift) % self.days
+        self.end = end
+
+    def add(self, guild, command, day, count=1):
+        """Count `count` uses of command in guild (ID as str) on day (YYYY-MM-DD)."""
+        g, c = self._guild(guild), self._command(command)
+        ordinal = self._ordinal(day)
+        if ordinal > self.end:
+            self.advance(ordinal)
+        offset = self.days - 1 - (self.end - ordinal)
+        if offset >= 0:
+            self.day_totals[(self.base + offset) % self.days] += count
+        if not self.totals[g, c]:
+            self.first_use[g, c] = np.count_nonzero(self.totals[g])
+        self.totals[g, c] += count
+
+    def add_unscoped(self, command, count=1):
+        self.unscoped[command] = self.unscoped.get(command, 0) + count
+
+    def guild_command_totals(self):
+        """(guilds, commands) array of all-time counts."""
+        return self.totals[:len(self.guild_ids), :len(self.commands)]
+
+    def command_totals(self):
+        """Global usage count per command."""
+        totals = self.guild_command_totals().sum(axis=0)
+        result = dict(zip(self.commands, totals.tolist()))
+        for command, count in self.unscoped.items():
+            result[command] = result.get(command, 0) + count
+        return result
+
+    def top_commands(self, n=10):
+        """The n most used commands as (name, count), most used first."""
+        totals = self.command_totals()
+        names = list(totals)
+        counts = np.fromiter(totals.values(), dtype=np.int64, count=len(names))
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [(names[i], int(counts[i])) for i in order]
+
+    def guild_summaries(self):
+        """Map of guild ID to (total commands, top command, top command count)."""
+        totals = self.guild_command_totals()
+        if not totals.size:
+            return {guild_id: (0, "None", 0) for guild_id in self.guild_ids}
+        guild_totals = totals.sum(axis=1).tolist()
+        leader_counts = totals.max(axis=1)
+        # Of the commands tied for the most uses, the one the guild used first
+        first_use = self.first_use[:len(self.guild_ids), :len(self.commands)]
+        ranks = np.where(totals == leader_counts[:, None], first_use, np.iinfo(np.int32).max)
+        leaders = ranks.argmin(axis=1)
+        leader_counts = leader_counts.tolist()
+        return {
+            guild_id: (total, self.commands[leader] if top else "None", top)
+            for guild_id, total, leader, top in zip(self.guild_ids, guild_totals, leaders.tolist(), leader_counts)
+        }
+
+    def daily_totals(self, days=30):
+        """List of (date, total commands) for the most recent `days` dates with activity on the day axis."""
+        per_day = np.roll(self.day_totals, -self.base)  # oldest day first
+        first = self.end - self.days + 1
+        return [(date.fromordinal(first + int(i)).isoformat(), int(per_day[i]))
+                for i in np.flatnonzero(per_day)[-days:]]
+
+
+def _capacity(n):
+    return max(16, n + n // 2)
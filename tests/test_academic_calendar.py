@@ -0,0 +1,45 @@
+"""academic_calendar.csv must keep the quarter boundaries bot.py used to hard-code."""
+import os
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+from academic_calendar import BREAK, CALENDAR_TZ, load_calendar
+from conftest import ROOT
+
+CALENDAR = load_calendar(os.path.join(ROOT, "academic_calendar.csv"))
+
+# (quarter, (first month, day), (last month, day)) hard-coded in bot.py before the CSV
+OLD_WINDOWS = [
+    ("Winter", (1, 5), (3, 14)),
+    ("Spring", (3, 23), (6, 6)),
+    ("Summer", (6, 16), (9, 12)),
+    ("Autumn", (9, 29), (12, 13)),
+]
+YEARS = range(2024, 2031)
+OLD_BOUNDARIES = [
+    (quarter, (year, *first), (year, *last))
+    for year in YEARS for quarter, first, last in OLD_WINDOWS
+]
+
+
+def test_every_row_is_hardcoded_until_registrar_dates():
+    with open(os.path.join(ROOT, "academic_calendar.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert {row["Source"] for row in rows} == {"hardcoded"}
+    assert len(rows) == len(OLD_BOUNDARIES)
+
+
+@pytest.mark.parametrize("quarter, first, last", OLD_BOUNDARIES)
+def test_old_hardcoded_boundaries(quarter, first, last):
+    start = datetime(*first, tzinfo=CALENDAR_TZ)
+    end = datetime(*last, 23, 59, 59, tzinfo=CALENDAR_TZ)
+
+    position = CALENDAR.lookup(start)
+    assert (position.period.name, position.day) == (quarter, 1)
+    assert CALENDAR.lookup(end).period.name == quarter
+    # A break follows or precedes every quarter except at the ends of the calendar
+    for outside in (start - timedelta(seconds=1), end + timedelta(seconds=1)):
+        position = CALENDAR.lookup(outside)
+        assert position is None or position.period.name == BREAK
@@ -0,0 +1,48 @@
+"""The compact scav index must find exactly the items a scan over the CSV rows finds."""
+import os
+
+import pytest
+
+from conftest import ROOT
+from corpora import load_scav, tokenize
+
+SCAV = load_scav(os.path.join(ROOT, "scav.csv"))
+
+
+def scan(keyword=None, year=None, min_points=None, max_points=None):
+    low = float("-inf") if min_points is None else min_points
+    high = float("inf") if max_points is None else max_points
+    ids = set()
+    for i in range(len(SCAV)):
+        item = SCAV[i]
+        if keyword and not set(tokenize(keyword)) <= set(tokenize(item.description)):
+            continue
+        if year is not None and item.year != year:
+            continue
+        if (min_points is not None or max_points is not None) and (
+                item.min_points is None or item.min_points > high or item.max_points < low):
+            continue
+        ids.add(i)
+    return ids
+
+
+@pytest.mark.parametrize("filters", [
+    {"keyword": "cat"},
+    {"keyword": "Duct tape"},
+    {"keyword": "it's"},
+    {"keyword": "zzzznotaword"},
+    {"keyword": "aardvark"},
+    {"year": 2010, "keyword": "the"},
+    {"min_points": 5, "max_points": 10},
+    {"max_points": 1},
+    {"year": 1998, "min_points": 20, "keyword": "a"},
+])
+def test_search_matches_a_scan(filters):
+    assert SCAV.search(**filters) == scan(**filters)
+
+
+def test_items_round_trip():
+    item = SCAV[0]
+    assert (item.number, item.points) == (SCAV.numbers[0], SCAV.points[0])
+    assert SCAV.pick(keyword="zzzznotaword") is None
+    assert SCAV.pick(year=2010).year == 2010
@@ -0,0 +1,38 @@
+"""Old images/{day}.png countdown links must keep resolving to a rendered image."""
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from conftest import ROOT
+from countdown import CountdownImages
+
+
+def test_legacy_png_url_redirects_to_rendered_image(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)  # template and font paths are relative to the repo
+
+    async def test():
+        images = CountdownImages(cache_dir=str(tmp_path / "cache"), workers=1, prewarm=0)
+        app = web.Application()
+        images.add_routes(app)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                url = f"http://127.0.0.1:{port}/images/12.png"
+                async with session.get(url, allow_redirects=False) as response:
+                    assert response.status == 301
+                    assert response.headers["Location"] == "../countdown/12.png"
+                async with session.get(url) as response:
+                    assert response.status == 200
+                    assert response.url.path == "/countdown/12.png"
+                    assert response.content_type == "image/png"
+                    assert (await response.read()).startswith(b"\x89PNG")
+        finally:
+            images.close()
+            await runner.cleanup()
+
+    asyncio.run(test())
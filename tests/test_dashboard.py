@@ -0,0 +1,25 @@
+"""If-None-Match must match the admin page's ETag exactly, not as a substring."""
+import pytest
+
+from dashboard import etag_matches
+
+ETAG = '"0123456789abcdef"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    (ETAG, True),
+    (f"W/{ETAG}", True),
+    (f'"other", {ETAG}', True),
+    (f'"other",W/{ETAG} , "more"', True),
+    ("*", True),
+    ('"0123456789abcdef0"', False),
+    ('"x0123456789abcdef"', False),
+    (f'"prefix{ETAG[1:]}', False),
+    ('"other"', False),
+    (f'{ETAG}x', False),
+    (f'"a{ETAG}"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, ETAG) is expected
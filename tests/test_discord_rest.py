@@ -0,0 +1,54 @@
+"""AsyncDiscordREST must turn non-JSON error pages into DiscordRESTError."""
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import discord_rest
+from discord_rest import AsyncDiscordREST, DiscordRESTError, RateLimitState
+from owners import OwnerCache
+
+BAD_GATEWAY = "<html><head><title>502 Bad Gateway</title></head><body>cloudflare</body></html>"
+
+
+async def bad_gateway(request):
+    return web.Response(status=502, text=BAD_GATEWAY, content_type="text/html")
+
+
+async def with_client(tmp_path, monkeypatch, test):
+    app = web.Application()
+    app.router.add_get("/api/v10/guilds/{guild_id}/members/{user_id}", bad_gateway)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(discord_rest, "API_BASE", f"http://127.0.0.1:{port}/api/v10")
+    try:
+        async with aiohttp.ClientSession() as session:
+            rest = AsyncDiscordREST("test", RateLimitState(str(tmp_path / "ratelimits.db")), session)
+            await test(rest)
+    finally:
+        await runner.cleanup()
+
+
+def test_html_502_raises_discord_rest_error(tmp_path, monkeypatch):
+    async def test(rest):
+        with pytest.raises(DiscordRESTError) as excinfo:
+            await rest.request("GET", "/guilds/1/members/2")
+        assert excinfo.value.status == 502
+        assert "Bad Gateway" in excinfo.value.data
+
+    asyncio.run(with_client(tmp_path, monkeypatch, test))
+
+
+def test_owner_lookup_falls_back_on_html_502(tmp_path, monkeypatch):
+    async def test(rest):
+        cache = OwnerCache(rest)
+        guild = SimpleNamespace(id=1, owner_id=2, owner=None)
+        await cache._resolve(guild)
+        assert cache.get(guild) == "Unknown (ID: 2)"
+
+    asyncio.run(with_client(tmp_path, monkeypatch, test))
@@ -0,0 +1,28 @@
+"""OwnerCache must cache a fallback name whatever goes wrong while resolving an owner."""
+import asyncio
+from types import SimpleNamespace
+
+from owners import OwnerCache
+
+
+class FakeREST:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def request(self, method, path):
+        self.calls += 1
+        return self.response
+
+
+def test_malformed_member_payload_caches_the_fallback():
+    async def test():
+        rest = FakeREST({"nick": "no user object"})
+        cache = OwnerCache(rest)
+        guild = SimpleNamespace(id=1, owner_id=2, owner=None)
+        assert cache.get(guild) is None
+        await asyncio.gather(*cache._pending.values())
+        assert cache.get(guild) == "Unknown (ID: 2)"
+        assert rest.calls == 1 and not cache._pending
+
+    asyncio.run(test())
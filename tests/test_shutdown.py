@@ -0,0 +1,64 @@
+"""bot.py must flush buffered command stats when it is stopped with SIGTERM."""
+import os
+import sys
+import json
+import signal
+import socket
+import subprocess
+
+from conftest import ROOT
+
+# Files bot.py opens relative to the working directory
+DATA_FILES = ["shadydealer.csv", "scav.csv", "academic_calendar.csv", "countdownimages", "static", "templates"]
+
+# Runs bot.main() with bot.start() replaced by a wait for bot.close(), so no Discord connection is needed
+SCRIPT = """
+import asyncio
+import bot
+
+async def start(token):
+    print("ready", flush=True)
+    while not bot.bot.is_closed():
+        await asyncio.sleep(0.05)
+
+bot.bot.start = start
+for _ in range(3):
+    bot.track_command("scav", 1234)
+bot.track_command("cat")
+asyncio.run(bot.main("test"))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_sigterm_flushes_pending_stats(tmp_path):
+    for name in DATA_FILES:
+        os.symlink(os.path.join(ROOT, name), tmp_path / name)
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               DISCORD_BOT_TOKEN="test",
+               STATS_BACKEND="json",
+               STATS_FLUSH_INTERVAL="3600",
+               COUNTDOWN_CACHE_DIR=str(tmp_path / "countdown_cache"),
+               CAT_POOL_DIR=str(tmp_path / "catpool"),
+               DISCORD_RATELIMIT_PATH=str(tmp_path / "discord_ratelimits.db"),
+               WEB_HOST="127.0.0.1",
+               WEB_PORT=str(free_port()))
+    process = subprocess.Popen([sys.executable, "-c", SCRIPT], cwd=tmp_path, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        for line in process.stdout:  # startup banner first
+            if line.strip() == "ready":
+                break
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        process.kill()
+
+    stats = json.loads((tmp_path / "command_stats.json").read_text())
+    assert stats["commands"] == {"scav": 3, "cat": 1}
+    assert stats["servers"]["1234"]["commands"] == {"scav": 3}
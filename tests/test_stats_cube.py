@@ -0,0 +1,83 @@
+"""StatsCube's ring-buffer day axis must agree with a plain dict of counts as dates roll over."""
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+from stats_cube import StatsCube
+
+START = date(2026, 10, 18)
+DAYS = 7
+
+
+def expected_daily_totals(counts, end, days=30):
+    first = end - timedelta(days=DAYS - 1)
+    totals = defaultdict(int)
+    for (_guild, _command, day), count in counts.items():
+        if day >= first.isoformat():
+            totals[day] += count
+    return [(day, totals[day]) for day in sorted(totals)[-days:]]
+
+
+def test_dates_roll_over_the_ring():
+    rng = random.Random(0)
+    cube = StatsCube(DAYS, START, guilds=2, commands=2)
+    day_totals = cube.day_totals
+    counts = defaultdict(int)
+    day = START
+    # Three weeks, so the ring wraps several times, with a few multi-day gaps
+    for step in range(21):
+        for _ in range(rng.randint(1, 5)):
+            guild, command = rng.choice("12"), rng.choice(["scav", "cat"])
+            cube.add(guild, command, day.isoformat())
+            counts[(guild, command, day.isoformat())] += 1
+        assert cube.daily_totals() == expected_daily_totals(counts, day)
+        day += timedelta(days=rng.choice([1, 1, 1, 3]))
+    # Crossing dates reused the ring's slots instead of reallocating the array
+    assert cube.day_totals is day_totals
+
+    command_totals = defaultdict(int)
+    for (_guild, command, _day), count in counts.items():
+        command_totals[command] += count
+    assert cube.command_totals() == command_totals
+
+
+def test_late_counts_for_an_earlier_date():
+    cube = StatsCube(DAYS, START)
+    cube.add("1", "scav", "2026-10-18")
+    cube.add("1", "scav", "2026-10-19")
+    cube.add("1", "cat", "2026-10-18")  # recorded after midnight for the day before
+    cube.add("1", "cat", "2026-10-01")  # before the day axis: only in the totals
+    assert cube.daily_totals() == [("2026-10-18", 2), ("2026-10-19", 1)]
+    assert cube.guild_summaries() == {"1": (4, "scav", 2)}
+
+
+def test_gap_longer_than_the_day_axis():
+    cube = StatsCube(DAYS, START)
+    cube.add("1", "scav", "2026-10-18")
+    cube.add("1", "scav", "2026-11-18")
+    assert cube.daily_totals() == [("2026-11-18", 1)]
+    assert cube.command_totals() == {"scav": 2}
+
+
+def test_from_stats_then_new_dates():
+    stats = {
+        "commands": {"scav": 4, "cat": 1},
+        "servers": {
+            "1": {"commands": {"scav": 3, "cat": 1},
+                  "daily": {"2026-10-12": {"scav": 2}, "2026-10-18": {"scav": 1, "cat": 1}}},
+            "2": {"commands": {"scav": 1}, "daily": {"2026-10-15": {"scav": 1}}},
+        },
+    }
+    cube = StatsCube.from_stats(stats, days=DAYS, end=START)
+    cube.add("2", "cat", "2026-10-19")
+    cube.add("3", "scav", "2026-10-20")
+    assert cube.daily_totals() == [("2026-10-15", 1), ("2026-10-18", 2), ("2026-10-19", 1), ("2026-10-20", 1)]
+    assert cube.guild_summaries() == {"1": (4, "scav", 3), "2": (2, "scav", 1), "3": (1, "scav", 1)}
+
+
+def test_ties_go_to_the_command_the_guild_used_first():
+    stats = {"commands": {}, "servers": {"1": {"commands": {"scav": 2, "cat": 2}, "daily": {}}}}
+    cube = StatsCube.from_stats(stats, days=DAYS, end=START)
+    cube.add("2", "cat", "2026-10-18")  # "scav" has the lower column, but guild 2 used "cat" first
+    cube.add("2", "scav", "2026-10-18")
+    assert cube.guild_summaries() == {"1": (4, "scav", 2), "2": (2, "cat", 1)}
@@ -0,0 +1,34 @@
+"""SQLiteStatsStore.import_json must import a command_stats.json only once per database."""
+import json
+import threading
+
+from stats import SQLiteStatsStore
+
+STATS = {
+    "commands": {"scav": 5, "cat": 1},
+    "servers": {"1": {"commands": {"scav": 4, "cat": 1}, "daily": {"2026-10-18": {"scav": 3, "cat": 1}}}},
+}
+
+
+def test_concurrent_imports_count_once(tmp_path):
+    json_path = tmp_path / "command_stats.json"
+    json_path.write_text(json.dumps(STATS))
+    db_path = str(tmp_path / "command_stats.db")
+    # One store per "process" starting on the same file
+    stores = [SQLiteStatsStore(db_path) for _ in range(4)]
+    barrier = threading.Barrier(len(stores))
+    results = []
+
+    def start(store):
+        barrier.wait()
+        results.append(store.import_json(str(json_path)))
+
+    threads = [threading.Thread(target=start, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, False, False, True]
+    assert stores[0].command_totals() == {"scav": 5, "cat": 1}
+    assert stores[0].daily_totals() == [("2026-10-18", 4)]